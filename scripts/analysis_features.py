@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""Base analítica (``analysis_df``) e extratos do dashboard a partir do Gold anual.
+
+Reproduz, sem o notebook, o preparo usado na análise exploratória e na
+modelagem: complemento SNIS, imputação por mediana do município, déficits,
+``score_priorizacao`` (pesos 40/20/15/15/10 por padrão) e categorias de
+prioridade. Também gera o acompanhamento das metas ODS. Pesos, limiares e metas
+são configuráveis pela linha de comando.
+
+Os extratos ``painel_prioridade.csv`` e ``ods_tracker.csv`` só são regravados
+quando o conteúdo muda. O hash ignora a coluna ``gerado_em`` e fica em
+``_manifest.json`` no diretório de exportação, para que o Looker não receba
+arquivos "novos" com os mesmos dados.
+
+Os notebooks chamam :func:`load_analysis_df`, que guarda o ``analysis_df`` em
+``data/gold/cache/``. A chave do cache combina o hash dos insumos (Gold, SNIS v2,
+registro de municípios) com a configuração de features (pesos, limiares,
+versão). Enquanto nada disso mudar, os dois notebooks leem o mesmo Parquet em
+vez de recalcular o preparo.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from temporal_features import add_temporal_features, parse_specs
+
+DEFAULT_GOLD = Path("data/gold/gold_features_ano.parquet")
+DEFAULT_SNIS_V2 = Path("data/gold/snis_rmb_indicadores_v2.parquet")
+DEFAULT_MUNICIPIOS = Path("config/rmb_municipios.csv")
+DEFAULT_EXPORT_DIR = Path("dashboard/material_para_dashboard")
+MANIFEST_NAME = "_manifest.json"
+DEFAULT_CACHE_DIR = Path("data/gold/cache")
+
+# Incrementar quando o preparo do analysis_df mudar (invalida o cache)
+FEATURES_VERSION = 2
+
+# Indicadores de serviço completados pelo SNIS v2 quando faltam no Gold
+SERVICE_FALLBACK_COLS = (
+    "idx_atend_agua_total",
+    "idx_atend_agua_urbano",
+    "idx_coleta_esgoto",
+    "idx_tratamento_esgoto",
+    "idx_hidrometracao",
+    "idx_perdas_distribuicao",
+    "idx_perdas_lineares",
+    "idx_perdas_por_ligacao",
+    "tarifa_media_agua",
+)
+
+# Imputação: mediana do município e, na falta, mediana geral
+COLUMNS_TO_FILL = (
+    "idx_atend_agua_total",
+    "idx_tratamento_esgoto",
+    "idx_coleta_esgoto",
+    "idx_perdas_distribuicao",
+    "pct_conformes_global",
+    "despesa_saude_pc",
+    "pct_despesa_investimentos_saude",
+    "chuva_total_mm",
+    "temp_media_c",
+    "populacao",
+    "internacoes_hidricas_10k",
+    "internacoes_total_10k",
+)
+
+PERCENT_COLS = (
+    "idx_atend_agua_total",
+    "idx_tratamento_esgoto",
+    "idx_coleta_esgoto",
+    "pct_conformes_global",
+)
+
+# Componente do score → peso (somam 1)
+SCORE_WEIGHTS: Dict[str, float] = {
+    "internacoes_hidricas_10k": 0.40,
+    "deficit_tratamento": 0.20,
+    "alerta_qualidade": 0.15,
+    "deficit_atendimento": 0.15,
+    "perdas_excesso": 0.10,
+}
+PRIORITY_BINS: Tuple[float, float] = (0.33, 0.66)
+PRIORITY_LABELS = ("Estável", "Atenção", "Crítico")
+
+# Features temporais do analysis_df (sintaxe de temporal_features: coluna:operação[n])
+TEMPORAL_FEATURES = ("chuva_total_mm:lag1",)
+
+# Indicador do ODS tracker → ("max" | "min", meta)
+ODS_TARGETS: Dict[str, Tuple[str, float]] = {
+    "taxa_hidricas_10k_rmb": ("max", 30),
+    "pct_conformes_global_media": ("min", 95),
+    "idx_atend_agua_total_media": ("min", 95),
+    "idx_tratamento_esgoto_media": ("min", 80),
+}
+
+PAINEL_COLS = (
+    "cod_mun",
+    "municipio",
+    "ano",
+    "populacao",
+    "internacoes_hidricas",
+    "internacoes_hidricas_10k",
+    "internacoes_total_10k",
+    "idx_atend_agua_total",
+    "idx_tratamento_esgoto",
+    "idx_coleta_esgoto",
+    "pct_conformes_global",
+    "idx_perdas_distribuicao",
+    "despesa_saude_pc",
+    "pct_despesa_investimentos_saude",
+    "chuva_total_mm",
+    "temp_media_c",
+    "deficit_atendimento",
+    "deficit_tratamento",
+    "alerta_qualidade",
+    "perdas_excesso",
+    "score_priorizacao",
+    "prioridade_categoria",
+)
+
+
+def load_registry(path: Path = DEFAULT_MUNICIPIOS) -> pd.DataFrame:
+    """Municípios monitorados (``is_rmb == 1``) com ``cod_mun`` em texto de 7 dígitos."""
+    registry = pd.read_csv(path).query("is_rmb == 1")
+    return pd.DataFrame(
+        {
+            "cod_mun": registry["ibge_code"].astype(str).str.zfill(7),
+            "municipio_cfg": registry["name"].str.upper(),
+        }
+    )
+
+
+def load_gold(gold_path: Path = DEFAULT_GOLD, snis_path: Optional[Path] = DEFAULT_SNIS_V2) -> pd.DataFrame:
+    """Gold anual com os indicadores de serviço ausentes completados pelo SNIS v2."""
+    if not gold_path.exists():
+        raise FileNotFoundError(f"Dataset Gold não encontrado em {gold_path}")
+    gold = pd.read_parquet(gold_path)
+    gold["cod_mun"] = gold["cod_mun"].astype(str).str.zfill(7)
+    gold["municipio"] = gold["municipio"].str.upper()
+
+    if snis_path is None or not snis_path.exists():
+        return gold
+    snis = pd.read_parquet(snis_path)
+    snis["cod_mun"] = snis["cod_mun"].astype(str).str.zfill(7)
+    available = [col for col in SERVICE_FALLBACK_COLS if col in snis.columns]
+    gold = gold.merge(snis[["cod_mun", "ano", *available]], on=["cod_mun", "ano"], how="left", suffixes=("", "_snis"))
+    for col in available:
+        # coluna ausente do Gold entra do merge sem sufixo e já vem completa
+        snis_col = f"{col}_snis"
+        if snis_col in gold.columns:
+            gold[col] = gold[col].fillna(gold[snis_col])
+            gold = gold.drop(columns=snis_col)
+    return gold
+
+
+def minmax_norm(series: pd.Series) -> pd.Series:
+    series = series.fillna(series.median())
+    delta = series.max() - series.min()
+    if delta == 0 or np.isclose(delta, 0):
+        return pd.Series(0.0, index=series.index)
+    return (series - series.min()) / delta
+
+
+def add_priority_score(
+    df: pd.DataFrame,
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+) -> pd.DataFrame:
+    """``score_priorizacao`` = soma ponderada dos componentes normalizados (min-max) + categoria."""
+    score = pd.Series(0.0, index=df.index)
+    for col, weight in weights.items():
+        score = score + weight * minmax_norm(df[col])
+    df["score_priorizacao"] = score
+    df["prioridade_categoria"] = pd.cut(score, bins=[-np.inf, *bins, np.inf], labels=list(PRIORITY_LABELS))
+    return df
+
+
+def critical_rate_threshold(
+    df: pd.DataFrame,
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+    rate_col: str = "internacoes_hidricas_10k",
+) -> pd.Series:
+    """Taxa acima da qual a linha vira Crítico, com os demais componentes do score fixos.
+
+    Inverte ``add_priority_score`` para a taxa (mesma normalização min-max sobre
+    ``df``). Fica ``NaN`` se a taxa não pesa no score ou não varia.
+    """
+    weight = weights.get(rate_col, 0.0)
+    rate = df[rate_col].fillna(df[rate_col].median())
+    span = rate.max() - rate.min()
+    if weight <= 0 or np.isclose(span, 0) or np.isnan(span):
+        return pd.Series(np.nan, index=df.index)
+    rest = pd.Series(0.0, index=df.index)
+    for col, w in weights.items():
+        if col != rate_col:
+            rest = rest + w * minmax_norm(df[col])
+    return rate.min() + (bins[-1] - rest) / weight * span
+
+
+def prepare_analysis_df(
+    gold: pd.DataFrame,
+    registry: pd.DataFrame,
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+    temporal: Sequence[str] = TEMPORAL_FEATURES,
+) -> pd.DataFrame:
+    """Imputação, recortes percentuais, déficits, features temporais e score de priorização."""
+    df = gold.reset_index(drop=True).merge(registry, on="cod_mun", how="left")
+    df["municipio"] = df["municipio_cfg"].fillna(df["municipio"]).str.upper()
+    df = df.drop(columns=["municipio_cfg"])
+    df["ano"] = df["ano"].astype(int)
+    df = df.sort_values(["cod_mun", "ano"]).reset_index(drop=True)
+
+    fill = [col for col in COLUMNS_TO_FILL if col in df.columns]
+    if fill:
+        df[fill] = df[fill].fillna(df.groupby("cod_mun")[fill].transform("median"))
+        df[fill] = df[fill].fillna(df[fill].median())
+    clip = [col for col in PERCENT_COLS if col in df.columns]
+    df[clip] = df[clip].clip(lower=0, upper=100)
+
+    df["deficit_atendimento"] = (100 - df["idx_atend_agua_total"]).clip(lower=0, upper=100)
+    df["deficit_tratamento"] = (100 - df["idx_tratamento_esgoto"]).clip(lower=0, upper=100)
+    df["alerta_qualidade"] = (100 - df["pct_conformes_global"]).clip(lower=0, upper=100)
+    df["perdas_excesso"] = df["idx_perdas_distribuicao"].clip(lower=0)
+    df = add_temporal_features(df, temporal)
+    return add_priority_score(df, weights, bins)
+
+
+def build_analysis_df(
+    gold_path: Path = DEFAULT_GOLD,
+    snis_path: Optional[Path] = DEFAULT_SNIS_V2,
+    municipios_path: Path = DEFAULT_MUNICIPIOS,
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+    temporal: Sequence[str] = TEMPORAL_FEATURES,
+) -> pd.DataFrame:
+    return prepare_analysis_df(load_gold(gold_path, snis_path), load_registry(municipios_path), weights, bins, temporal)
+
+
+# --- cache do analysis_df ---
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def feature_config(
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+    temporal: Sequence[str] = TEMPORAL_FEATURES,
+) -> Dict[str, object]:
+    return {
+        "versao": FEATURES_VERSION,
+        "pesos": dict(sorted(weights.items())),
+        "limiares": [float(value) for value in bins],
+        "imputacao": list(COLUMNS_TO_FILL),
+        "percentuais": list(PERCENT_COLS),
+        "fallback_snis": list(SERVICE_FALLBACK_COLS),
+        "temporais": [repr(feature) for feature in parse_specs(temporal)],
+    }
+
+
+def cache_key(
+    gold_path: Path,
+    snis_path: Optional[Path],
+    municipios_path: Path,
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+    temporal: Sequence[str] = TEMPORAL_FEATURES,
+) -> str:
+    """Impressão digital dos insumos (conteúdo dos arquivos) + configuração de features."""
+    inputs = {
+        "gold": _sha256_file(gold_path),
+        "snis": _sha256_file(snis_path) if snis_path is not None and snis_path.exists() else None,
+        "municipios": _sha256_file(municipios_path),
+    }
+    payload = json.dumps({"insumos": inputs, "config": feature_config(weights, bins, temporal)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_analysis_df(
+    gold_path: Path = DEFAULT_GOLD,
+    snis_path: Optional[Path] = DEFAULT_SNIS_V2,
+    municipios_path: Path = DEFAULT_MUNICIPIOS,
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+    temporal: Sequence[str] = TEMPORAL_FEATURES,
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """``analysis_df`` lido do cache quando a chave confere; senão recalcula e grava.
+
+    ``cache_dir=None`` desativa o cache; ``refresh=True`` força o recálculo.
+    Versões antigas do cache são removidas a cada gravação.
+    """
+    if cache_dir is None:
+        return build_analysis_df(gold_path, snis_path, municipios_path, weights, bins, temporal)
+    if not gold_path.exists():
+        raise FileNotFoundError(f"Dataset Gold não encontrado em {gold_path}")
+
+    key = cache_key(gold_path, snis_path, municipios_path, weights, bins, temporal)
+    target = cache_dir / f"analysis_df_{key[:16]}.parquet"
+    if target.exists() and not refresh:
+        return pd.read_parquet(target)
+
+    analysis_df = build_analysis_df(gold_path, snis_path, municipios_path, weights, bins, temporal)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name("." + target.name + ".tmp")
+    analysis_df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    for stale in cache_dir.glob("analysis_df_*.parquet"):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+    return analysis_df
+
+
+# --- extratos do dashboard ---
+def build_painel_prioridade(analysis_df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        analysis_df[list(PAINEL_COLS)]
+        .sort_values(["ano", "score_priorizacao"], ascending=[False, False])
+        .reset_index(drop=True)
+    )
+
+
+def build_ods_tracker(
+    analysis_df: pd.DataFrame,
+    targets: Dict[str, Tuple[str, float]] = ODS_TARGETS,
+) -> pd.DataFrame:
+    ods = (
+        analysis_df.groupby("ano")
+        .agg(
+            populacao_total=("populacao", "sum"),
+            internacoes_hidricas_total=("internacoes_hidricas", "sum"),
+            internacoes_total=("internacoes_total", "sum"),
+            idx_atend_agua_total_media=("idx_atend_agua_total", "mean"),
+            idx_tratamento_esgoto_media=("idx_tratamento_esgoto", "mean"),
+            pct_conformes_global_media=("pct_conformes_global", "mean"),
+            pct_despesa_investimentos_media=("pct_despesa_investimentos_saude", "mean"),
+            chuva_total_mm_media=("chuva_total_mm", "mean"),
+        )
+        .reset_index()
+    )
+    ods["taxa_hidricas_10k_rmb"] = ods["internacoes_hidricas_total"] / ods["populacao_total"] * 10000
+    for col, (goal_type, goal) in targets.items():
+        value = ods[col]
+        ok = value <= goal if goal_type == "max" else value >= goal
+        ods[f"status_{col}"] = np.select([value.isna(), ok], ["Sem dado", "OK"], default="Alerta")
+    return ods
+
+
+def content_hash(df: pd.DataFrame) -> str:
+    """Hash do CSV do extrato (sem ``gerado_em``): muda apenas quando os dados mudam."""
+    payload = df.drop(columns=["gerado_em"], errors="ignore").to_csv(index=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_manifest(export_dir: Path) -> Dict[str, str]:
+    path = export_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    return dict(json.loads(path.read_text(encoding="utf-8")))
+
+
+def write_manifest(export_dir: Path, hashes: Dict[str, str]) -> None:
+    path = export_dir / MANIFEST_NAME
+    tmp = path.with_name("." + path.name + ".tmp")
+    tmp.write_text(json.dumps(dict(sorted(hashes.items())), indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_extracts(
+    extracts: Dict[str, pd.DataFrame],
+    export_dir: Path = DEFAULT_EXPORT_DIR,
+    force: bool = False,
+) -> List[str]:
+    """Grava ``<nome>.csv`` (com ``gerado_em``) apenas quando o hash do conteúdo mudou."""
+    export_dir.mkdir(parents=True, exist_ok=True)
+    hashes = load_manifest(export_dir)
+    timestamp = datetime.now(timezone.utc).isoformat()
+    written: List[str] = []
+    for name, df in extracts.items():
+        digest = content_hash(df)
+        target = export_dir / f"{name}.csv"
+        if not force and hashes.get(name) == digest and target.exists():
+            continue
+        tmp = target.with_name("." + target.name + ".tmp")
+        df.assign(gerado_em=timestamp).to_csv(tmp, index=False)
+        os.replace(tmp, target)
+        hashes[name] = digest
+        written.append(name)
+    write_manifest(export_dir, hashes)
+    return written
+
+
+def parse_weights(text: Optional[str]) -> Dict[str, float]:
+    """``internacoes_hidricas_10k=0.5,deficit_tratamento=0.5`` → pesos (padrão: SCORE_WEIGHTS)."""
+    if not text:
+        return dict(SCORE_WEIGHTS)
+    weights: Dict[str, float] = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() not in SCORE_WEIGHTS:
+            raise SystemExit(f"Componente de score desconhecido: {name.strip()} (use {', '.join(SCORE_WEIGHTS)})")
+        weights[name.strip()] = float(value)
+    if not np.isclose(sum(weights.values()), 1.0):
+        raise SystemExit(f"Os pesos devem somar 1 (soma atual: {sum(weights.values()):.3f})")
+    return weights
+
+
+def parse_bins(text: Optional[str]) -> Tuple[float, float]:
+    """``0.33,0.66`` → limiares Estável/Atenção/Crítico (padrão: PRIORITY_BINS)."""
+    if not text:
+        return PRIORITY_BINS
+    try:
+        bins = tuple(float(value) for value in text.split(","))
+    except ValueError:
+        bins = ()
+    if len(bins) != 2 or not bins[0] < bins[1]:
+        raise SystemExit("--limiares deve ter dois valores crescentes, ex.: 0.33,0.66")
+    return bins
+
+
+def parse_targets(text: Optional[str]) -> Dict[str, Tuple[str, float]]:
+    """``taxa_hidricas_10k_rmb=max:25,idx_atend_agua_total_media=min:99`` sobrescreve metas de ODS_TARGETS."""
+    targets = dict(ODS_TARGETS)
+    if not text:
+        return targets
+    for item in text.split(","):
+        name, _, spec = item.partition("=")
+        goal_type, _, value = spec.partition(":")
+        if name.strip() not in ODS_TARGETS or goal_type not in ("max", "min"):
+            raise SystemExit(f"Meta inválida: {item} (indicadores: {', '.join(ODS_TARGETS)}; tipos: max, min)")
+        targets[name.strip()] = (goal_type, float(value))
+    return targets
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD, help="Parquet do Gold anual")
+    parser.add_argument("--snis", type=Path, default=DEFAULT_SNIS_V2, help="SNIS v2 usado para completar indicadores de serviço")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios")
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_EXPORT_DIR, help="Diretório dos extratos do dashboard")
+    parser.add_argument("--pesos", default=None, help="Pesos do score, ex.: internacoes_hidricas_10k=0.4,deficit_tratamento=0.2,...")
+    parser.add_argument(
+        "--limiares",
+        default=",".join(str(value) for value in PRIORITY_BINS),
+        help="Limiares Estável/Atenção/Crítico do score (padrão: 0.33,0.66)",
+    )
+    parser.add_argument(
+        "--temporais",
+        default=",".join(TEMPORAL_FEATURES),
+        help="Features temporais do analysis_df, ex.: chuva_total_mm:lag1,internacoes_hidricas_10k:media3",
+    )
+    parser.add_argument("--metas", default=None, help="Metas ODS, ex.: taxa_hidricas_10k_rmb=max:30")
+    parser.add_argument("--forcar", action="store_true", help="Regrava os extratos mesmo sem mudança de conteúdo")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Cache do analysis_df (Parquet)")
+    parser.add_argument("--sem-cache", action="store_true", help="Recalcula o analysis_df sem ler nem gravar o cache")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    bins = parse_bins(args.limiares)
+
+    cache_dir = None if args.sem_cache else args.cache_dir
+    temporal = [item.strip() for item in args.temporais.split(",") if item.strip()]
+    try:
+        parse_specs(temporal)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    analysis_df = load_analysis_df(
+        args.gold, args.snis, args.municipios, parse_weights(args.pesos), bins, temporal, cache_dir=cache_dir
+    )
+    extracts = {
+        "painel_prioridade": build_painel_prioridade(analysis_df),
+        "ods_tracker": build_ods_tracker(analysis_df, parse_targets(args.metas)),
+    }
+    written = write_extracts(extracts, args.out_dir, args.forcar)
+    for name in extracts:
+        status = "atualizado" if name in written else "sem mudança"
+        print(f"[OK] {name}.csv ({status}) → {args.out_dir / (name + '.csv')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Conversão vetorizada de números no formato brasileiro (SNIS, SISAGUA, INMET).
+
+Trabalha sobre colunas inteiras (``pandas.Series``, arrays Arrow ou listas): cada
+valor distinto é convertido uma única vez e o resultado é espalhado de volta
+por índice. Trata separador de milhar, vírgula decimal, traços, sentinelas como
+``"-"``/``"NA"`` (ou outras, ex.: ``"-9999"`` do INMET) e notações mistas
+(``1.234,5`` e ``1,234.5``).
+
+Por padrão só espaços (inclusive NBSP), ``R$`` e ``%`` são removidos. Sobras como
+``"<0,5"`` (abaixo do limite de detecção) ou ``"10 a 20"`` (faixas) ficam como
+inválidas, e não viram números diferentes. ``strip_non_numeric=True`` descarta
+qualquer caractere fora de dígitos/sinais/separadores, como o ``to_float_br``
+original do SNIS.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Textos tratados como ausentes (comparação sem caixa, após strip)
+DEFAULT_SENTINELS = frozenset(
+    {"", "-", "--", "---", ".", ",", "na", "n/a", "nan", "null", "none", "sem informacao", "sem informação"}
+)
+
+# "auto": com um único ponto e sem vírgula o ponto é decimal (1.5); com vários, milhar (1.234.567)
+# "thousands": ponto é sempre separador de milhar (convenção do SISAGUA)
+DOT_POLICIES = ("auto", "thousands")
+
+# Removidos sempre: espaços (inclusive NBSP), símbolo de real e de porcentagem
+SAFE_STRIP = "[\\s\u00a0]+|R\\$|%"
+# Com strip_non_numeric=True: tudo que não for dígito, sinal ou separador
+AGGRESSIVE_STRIP = r"[^0-9,.\-]+"
+
+
+def _as_series(values: pd.Series | pa.Array | pa.ChunkedArray | Iterable) -> pd.Series:
+    if isinstance(values, pd.Series):
+        return values
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return values.to_pandas()
+    return pd.Series(list(values), dtype=object)
+
+
+def _parse_distinct(texts: pd.Series, dot_policy: str, strip_non_numeric: bool = False) -> pd.Series:
+    """Converte textos para float; o que sobrar além de dígitos, sinais e separadores vira ``NaN``."""
+    pattern = AGGRESSIVE_STRIP if strip_non_numeric else SAFE_STRIP
+    cleaned = texts.str.replace("−", "-", regex=False).str.replace(pattern, "", regex=True)
+
+    last_comma = cleaned.str.rfind(",")
+    last_dot = cleaned.str.rfind(".")
+    has_comma = last_comma >= 0
+    has_dot = last_dot >= 0
+    many_dots = cleaned.str.count(r"\.") > 1
+
+    # vírgula decimal: vírgula é o último separador (ou o único)
+    comma_decimal = has_comma & (~has_dot | (last_comma > last_dot))
+    # ponto decimal com vírgula de milhar (1,234.5)
+    dot_decimal_mixed = has_comma & has_dot & (last_dot > last_comma)
+    if dot_policy == "thousands":
+        dots_thousands = has_dot & ~has_comma
+    else:
+        dots_thousands = has_dot & ~has_comma & many_dots
+
+    out = cleaned.copy()
+    out[comma_decimal] = cleaned[comma_decimal].str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    out[dot_decimal_mixed] = cleaned[dot_decimal_mixed].str.replace(",", "", regex=False)
+    out[dots_thousands] = cleaned[dots_thousands].str.replace(".", "", regex=False)
+    return pd.to_numeric(out, errors="coerce").astype(float)
+
+
+def parse_br_numbers(
+    values: pd.Series | pa.Array | pa.ChunkedArray | Iterable,
+    dot_policy: str = "auto",
+    sentinels: Iterable[str] = DEFAULT_SENTINELS,
+    strip_non_numeric: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Converte uma coluna de textos numéricos.
+
+    Retorna ``(valores, invalidos)``: ``valores`` é um ``float64`` com ``NaN`` para
+    ausentes/sentinelas/inválidos e ``invalidos`` marca as células preenchidas que
+    não puderam ser convertidas.
+    """
+    if dot_policy not in DOT_POLICIES:
+        raise ValueError(f"dot_policy inválida: {dot_policy} (use {', '.join(DOT_POLICIES)})")
+
+    series = _as_series(values)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    n = len(series)
+    if len(uniques) == 0:
+        return np.full(n, np.nan), np.zeros(n, dtype=bool)
+
+    distinct = pd.Series(np.asarray(uniques, dtype=object))
+    parsed = np.full(len(distinct), np.nan)
+    invalid = np.zeros(len(distinct), dtype=bool)
+
+    is_number = distinct.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool)).to_numpy(bool)
+    if is_number.any():
+        parsed[is_number] = distinct[is_number].astype(float).to_numpy()
+
+    texts = distinct[~is_number].astype(str).str.strip()
+    if len(texts):
+        lowered = texts.str.lower()
+        sentinel_set = {item.lower() for item in sentinels}
+        is_sentinel = lowered.isin(sentinel_set).to_numpy()
+        values_txt = texts[~is_sentinel]
+        converted = _parse_distinct(values_txt, dot_policy, strip_non_numeric).to_numpy()
+        idx_text = np.flatnonzero(~is_number)
+        idx_values = idx_text[~is_sentinel]
+        parsed[idx_values] = converted
+        invalid[idx_values] = np.isnan(converted)
+
+    result = np.where(codes >= 0, parsed[codes], np.nan)
+    invalid_mask = np.where(codes >= 0, invalid[codes], False)
+    return result, invalid_mask
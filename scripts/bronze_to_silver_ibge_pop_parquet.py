@@ -2,10 +2,11 @@
 """
 Converte os dados de população do IBGE (Bronze) para Parquet (Silver).
 
-Lê múltiplos arquivos CSV do diretório de entrada, cada um contendo
-estimativas de população para um ano específico. Consolida todos os anos
-em um único DataFrame, seleciona e renomeia as colunas relevantes,
-converte os tipos de dados e salva o resultado como um único arquivo Parquet.
+Lê o Parquet tipado gerado por ``sidra_population_download.py`` numa única
+varredura (apenas as colunas usadas). Diretórios antigos, com um CSV por ano,
+continuam aceitos: os arquivos são consolidados, as colunas relevantes
+selecionadas e renomeadas, os tipos convertidos e o resultado salvo como um
+único arquivo Parquet.
 """
 
 import argparse
@@ -13,17 +14,46 @@ from pathlib import Path
 
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
+from ibge_keys import PANDAS_KEY_TYPES, key_field
+
+BRONZE_PARQUET = "sidra6579_populacao.parquet"
+SILVER_SCHEMA = pa.schema([key_field("cod_mun"), key_field("ano"), ("populacao", pa.int32())])
+
+
+def read_bronze_parquet(path: Path) -> pa.Table:
+    """Lê só código, ano e valor do Bronze tipado e descarta linhas sem população."""
+    table = pq.read_table(path, columns=["municipio_codigo", "ano", "valor"])
+    table = table.filter(pc.is_valid(table["valor"]))
+    table = table.rename_columns(SILVER_SCHEMA.names)
+    return table.cast(SILVER_SCHEMA)
+
+
+def write_silver(table: pa.Table, output_path: Path) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, output_path)
+    anos = sorted(pc.unique(table["ano"]).to_pylist())
+    print(f"\n[OK] Dados de população convertidos com sucesso para {output_path}")
+    print(f"Total de registros processados: {table.num_rows}")
+    print(f"Anos processados: {anos}")
+
 
 def process_population_data(input_dir: Path, output_path: Path):
     """
-    Processa os arquivos CSV de população e os salva em formato Parquet.
+    Processa o Bronze de população (Parquet único ou CSVs por ano) e o salva em formato Parquet.
 
     Args:
-        input_dir: Diretório contendo os arquivos CSV brutos.
+        input_dir: Diretório com ``sidra6579_populacao.parquet`` ou os CSVs brutos por ano.
         output_path: Caminho para salvar o arquivo Parquet de saída.
     """
+    bronze = input_dir / BRONZE_PARQUET
+    if bronze.exists():
+        print(f"Processando {bronze.name}...")
+        write_silver(read_bronze_parquet(bronze), output_path)
+        return
+
     all_files = list(input_dir.glob("sidra6579_pop_*.csv"))
     if not all_files:
         raise SystemExit(f"Nenhum arquivo CSV de população encontrado em {input_dir}")
@@ -58,21 +88,13 @@ def process_population_data(input_dir: Path, output_path: Path):
 
     # Converte os tipos de dados para otimização
     final_df = final_df.astype({
-        "cod_mun": "int32",
-        "ano": "int32",
+        "cod_mun": PANDAS_KEY_TYPES["cod_mun"],
+        "ano": PANDAS_KEY_TYPES["ano"],
         "populacao": "int32"
     })
 
-    # Garante que o diretório de saída exista
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
     # Escreve o arquivo Parquet
-    table = pa.Table.from_pandas(final_df)
-    pq.write_table(table, output_path)
-
-    print(f"\n[OK] Dados de população convertidos com sucesso para {output_path}")
-    print(f"Total de registros processados: {len(final_df)}")
-    print(f"Anos processados: {sorted(final_df['ano'].unique().tolist())}")
+    write_silver(pa.Table.from_pandas(final_df, schema=SILVER_SCHEMA, preserve_index=False), output_path)
 
 
 def main():
@@ -13,12 +13,14 @@ import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+from ibge_keys import enforce_key_dtypes, key_field
+
 PARQUET_SCHEMA = pa.schema(
     [
-        ("cod_mun", pa.string()),
+        key_field("cod_mun"),
         ("municipio", pa.string()),
-        ("ano", pa.int32()),
-        ("mes", pa.int32()),
+        key_field("ano"),
+        key_field("mes"),
         ("internacoes_total", pa.int64()),
         ("internacoes_hidricas", pa.int64()),
         ("dias_perm_total", pa.float64()),
@@ -195,9 +197,7 @@ def process_directory(
     for col in ["internacoes_total", "internacoes_hidricas"]:
         final_df[col] = final_df[col].astype("int64")
 
-    final_df["ano"] = final_df["ano"].astype("int32")
-    final_df["mes"] = final_df["mes"].astype("int32")
-    final_df["cod_mun"] = final_df["cod_mun"].astype(str)
+    final_df = enforce_key_dtypes(final_df)
 
     write_partitioned(final_df, out_dir)
     print(
@@ -1,18 +1,28 @@
 #!/usr/bin/env python3
-"""Converte os indicadores consolidados do SIOPS (Bronze) para parquet Silver."""
+"""Converte os indicadores e as despesas por subfunção do SIOPS (Bronze) para Parquet Silver particionado por ano."""
 
 from __future__ import annotations
 
 import argparse
+import shutil
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from ibge_keys import KEY_TYPES, PANDAS_KEY_TYPES
+from siops_fetch import ENDPOINT_INDICADORES, ENDPOINT_SUBFUNCAO, STORE_SCHEMAS, VALOR_COLS, read_store
 
 DEFAULT_INPUT = Path("data/bronze/siops/siops_indicadores_rmb_2018_2025.csv")
+DEFAULT_INPUT_SUBFUNCAO = Path("data/bronze/siops/siops_subfuncao_rmb_2018_2025.csv")
 DEFAULT_MUNICIPIOS = Path("config/rmb_municipios.csv")
-DEFAULT_OUTPUT = Path("data/silver/siops/indicadores.parquet")
+DEFAULT_OUTPUT = Path("data/silver/siops/indicadores")
+DEFAULT_OUTPUT_SUBFUNCAO = Path("data/silver/siops/subfuncao")
 
 # Mapeia código do indicador → (nome da coluna, fator de escala)
 # fator = 1.0 → valor per capita; fator = 100.0 → percentual
@@ -29,17 +39,25 @@ INDICATOR_CONFIG: Dict[str, Tuple[str, float]] = {
     "3.2": ("pct_receita_propria_asps", 100.0),
 }
 
+# Tipos explícitos das colunas Bronze (CSV consolidado ou store de checkpoints)
+BRONZE_TYPES: Dict[str, Dict[str, pa.DataType]] = {
+    endpoint: {field.name: field.type for field in schema}
+    for endpoint, schema in STORE_SCHEMAS.items()
+}
+# O CSV legado grava o número do indicador como float (ex.: 2.1)
+BRONZE_TYPES[ENDPOINT_INDICADORES]["numero_indicador"] = pa.float64()
+
 
-def load_municipios(path: Path) -> Dict[str, Tuple[str, str]]:
+def load_municipios(path: Path, somente_rmb: bool = True) -> Dict[str, Tuple[str, str]]:
     df = pd.read_csv(path, dtype={"ibge_code": "string"})
-    df = df[df["is_rmb"] == 1]
-    df["ibge_code"] = df["ibge_code"].str.zfill(7)
+    if somente_rmb:
+        df = df[df["is_rmb"] == 1]
+    codes7 = df["ibge_code"].str.zfill(7)
+    names = df["name"].str.upper()
     mapping: Dict[str, Tuple[str, str]] = {}
-    for _, row in df.iterrows():
-        code7 = row["ibge_code"]
-        code6 = code7[:-1]
-        mapping[code6] = (code7, row["name"].upper())
-        mapping[code7] = (code7, row["name"].upper())
+    for code7, name in zip(codes7, names):
+        mapping[code7[:-1]] = (code7, name)
+        mapping[code7] = (code7, name)
     return mapping
 
 
@@ -48,72 +66,167 @@ def normalize_indicator_code(value: float) -> str:
     return code
 
 
-def build_siops_silver(input_path: Path, municipios_path: Path) -> pd.DataFrame:
-    df = pd.read_csv(input_path)
-    df["codigo"] = df["numero_indicador"].map(normalize_indicator_code)
-    df = df[df["codigo"].isin(INDICATOR_CONFIG)]
-
-    df["cod_mun"] = df["cod_mun"].astype(str).str.zfill(6)
-    df["ano"] = df["ano"].astype(int)
-
-    df["valor_calc"] = df["numerador"] / df["denominador"]
-    df.loc[df["denominador"].isna() | (df["denominador"] == 0), "valor_calc"] = np.nan
-
-    scale = df["codigo"].map({code: scale for code, (_, scale) in INDICATOR_CONFIG.items()})
-    df["valor_calc"] = df["valor_calc"] * scale
-
-    pivot = (
-        df.pivot_table(
-            index=["cod_mun", "ano"],
-            columns="codigo",
-            values="valor_calc",
-            aggfunc="first",
-        )
-        .rename(columns={code: col for code, (col, _) in INDICATOR_CONFIG.items()})
-        .reset_index()
-        .sort_values(["cod_mun", "ano"])
+def read_bronze(input_path: Path, endpoint: str) -> pa.Table:
+    """Lê o CSV Bronze consolidado ou, se for um diretório, o store de checkpoints do ``siops_fetch``."""
+    if input_path.is_dir():
+        return read_store(str(input_path), endpoint)
+    types = BRONZE_TYPES[endpoint]
+    return pacsv.read_csv(
+        input_path,
+        convert_options=pacsv.ConvertOptions(
+            column_types=types,
+            include_columns=list(types),
+            include_missing_columns=True,
+            strings_can_be_null=True,
+        ),
     )
 
-    # Reordena colunas para deixar métricas em ordem crescente do código
-    ordered_cols = ["cod_mun", "ano"] + [cfg[0] for cfg in INDICATOR_CONFIG.values()]
-    pivot = pivot[ordered_cols]
 
-    metric_cols = [cfg[0] for cfg in INDICATOR_CONFIG.values()]
-    pivot[metric_cols] = pivot[metric_cols].round(2)
+def encode_municipios(column: pa.ChunkedArray, municipios: Dict[str, Tuple[str, str]]) -> Tuple[np.ndarray, List[Tuple[str, str]]]:
+    """Mapeia ``cod_mun`` (6 ou 7 dígitos) para índices numa lista ordenada de (código IBGE-7, nome).
 
-    municipios = load_municipios(municipios_path)
-    mapped = pivot["cod_mun"].map(municipios)
-    if mapped.isna().any():
-        missing = pivot.loc[mapped.isna(), "cod_mun"].unique()
+    O dicionário é resolvido apenas sobre os valores distintos; o custo por linha é um ``take``.
+    """
+    encoded = pc.dictionary_encode(pc.utf8_trim_whitespace(column.cast(pa.string()))).combine_chunks()
+    distinct = [str(value).zfill(6) if value is not None else "" for value in encoded.dictionary.to_pylist()]
+    missing = sorted({value for value in distinct if value not in municipios})
+    if missing:
         raise ValueError(f"Códigos sem mapeamento de município: {missing}")
+    targets = sorted({municipios[value] for value in distinct})
+    position = {target: idx for idx, target in enumerate(targets)}
+    lookup = np.array([position[municipios[value]] for value in distinct], dtype=np.int32)
+    indices = encoded.indices.to_numpy(zero_copy_only=False)
+    return lookup[indices], targets
 
-    pivot["cod_mun"] = mapped.map(lambda x: x[0])
-    pivot["municipio"] = mapped.map(lambda x: x[1])
 
-    cols = ["cod_mun", "municipio", "ano"] + [c for c in pivot.columns if c not in {"cod_mun", "municipio", "ano"}]
-    pivot = pivot[cols]
-
-    return pivot.reset_index(drop=True)
-
-
-def save_parquet(df: pd.DataFrame, output_path: Path) -> None:
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(output_path, index=False, compression="snappy")
+def build_siops_silver(input_path: Path, municipios_path: Path, somente_rmb: bool = True) -> pd.DataFrame:
+    table = read_bronze(input_path, ENDPOINT_INDICADORES)
+    codes = list(INDICATOR_CONFIG)
+    metric_cols = [cfg[0] for cfg in INDICATOR_CONFIG.values()]
+    scales = np.array([cfg[1] for cfg in INDICATOR_CONFIG.values()])
+
+    # Código do indicador → posição na configuração (-1 = fora do escopo), resolvido por valor distinto
+    numero = pc.dictionary_encode(table["numero_indicador"].cast(pa.float64())).combine_chunks()
+    labels = [normalize_indicator_code(value) for value in numero.dictionary.to_pylist()]
+    lookup = np.array([codes.index(label) if label in INDICATOR_CONFIG else -1 for label in labels] + [-1], dtype=np.int64)
+    pos = lookup[pc.fill_null(numero.indices, len(labels)).to_numpy(zero_copy_only=False)]
+    keep = pos >= 0
+    table = table.filter(pa.array(keep))
+    pos = pos[keep]
+
+    mun_idx, targets = encode_municipios(table["cod_mun"], load_municipios(municipios_path, somente_rmb))
+    ano = table["ano"].cast(pa.int32()).to_numpy(zero_copy_only=False).astype(np.int64)
+
+    numerador = table["numerador"].to_numpy(zero_copy_only=False).astype(float)
+    denominador = table["denominador"].to_numpy(zero_copy_only=False).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valor = np.where(np.isnan(denominador) | (denominador == 0), np.nan, numerador / denominador)
+    valor = valor * scales[pos]
+
+    # Agrupamento (município, ano): chaves inteiras ordenadas = ordem (cod_mun, ano)
+    group_key = mun_idx.astype(np.int64) * 10_000 + ano
+    groups, inverse = np.unique(group_key, return_inverse=True)
+
+    # "first" do pivot: primeira ocorrência não nula de cada célula (grupo, indicador)
+    n_ind = len(codes)
+    has_value = ~np.isnan(valor)
+    cells = inverse[has_value] * n_ind + pos[has_value]
+    cells_unique, first = np.unique(cells, return_index=True)
+    matrix = np.full((len(groups), n_ind), np.nan)
+    matrix.reshape(-1)[cells_unique] = valor[has_value][first]
+
+    present = ~np.all(np.isnan(matrix), axis=1)
+    groups, matrix = groups[present], np.round(matrix[present], 2)
+
+    group_mun = (groups // 10_000).astype(np.int64)
+    pivot = pd.DataFrame(matrix, columns=metric_cols)
+    cod7 = np.array([int(target[0]) for target in targets], dtype=PANDAS_KEY_TYPES["cod_mun"])
+    pivot.insert(0, "cod_mun", cod7[group_mun])
+    pivot.insert(1, "municipio", [targets[i][1] for i in group_mun])
+    pivot.insert(2, "ano", (groups % 10_000).astype(PANDAS_KEY_TYPES["ano"]))
+    return pivot
+
+
+def build_subfuncao_silver(input_path: Path, municipios_path: Path, somente_rmb: bool = True) -> pa.Table:
+    """Despesas por subfunção em formato longo: uma linha por (chaves, coluna valorN) não nula."""
+    table = read_bronze(input_path, ENDPOINT_SUBFUNCAO)
+    mun_idx, targets = encode_municipios(table["cod_mun"], load_municipios(municipios_path, somente_rmb))
+
+    valores = np.column_stack(
+        [table[col].cast(pa.float64()).to_numpy(zero_copy_only=False).astype(float) for col in VALOR_COLS]
+    ) if table.num_rows else np.empty((0, len(VALOR_COLS)))
+    row_idx, col_idx = np.nonzero(~np.isnan(valores))
+
+    cod7 = pa.array([int(t[0]) for t in targets], KEY_TYPES["cod_mun"])
+    nomes = pa.array([t[1] for t in targets], pa.string())
+    mun_take = pa.array(mun_idx[row_idx])
+    take = pa.array(row_idx)
+    return pa.table(
+        {
+            "cod_mun": cod7.take(mun_take),
+            "municipio": nomes.take(mun_take),
+            "ano": table["ano"].cast(KEY_TYPES["ano"]).take(take),
+            "periodo": table["periodo"].cast(pa.int32()).take(take),
+            "quadro": table["quadro"].cast(pa.string()).take(take),
+            "grupo": table["grupo"].cast(pa.string()).take(take),
+            "ordem": table["ordem"].cast(pa.string()).take(take),
+            "descricao": table["descricao"].cast(pa.string()).take(take),
+            "coluna": pa.array((col_idx + 1).astype(np.int8)),
+            "valor": pa.array(valores[row_idx, col_idx]),
+        }
+    ).sort_by([("cod_mun", "ascending"), ("ano", "ascending"), ("periodo", "ascending")])
+
+
+def write_partitioned(table: pa.Table, out_dir: Path) -> None:
+    """Um arquivo por ano em ``ano=YYYY/data.parquet`` (mesmo layout do SIH/SISAGUA)."""
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    anos = table["ano"].to_numpy(zero_copy_only=False)
+    for ano in np.unique(anos):
+        partition_dir = out_dir / f"ano={int(ano)}"
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        part = table.filter(pa.array(anos == ano))
+        pq.write_table(part, partition_dir / "data.parquet", compression="snappy")
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT, help="CSV de indicadores SIOPS já consolidado")
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT, help="CSV de indicadores SIOPS já consolidado ou diretório de checkpoints do siops_fetch")
+    parser.add_argument(
+        "--input-subfuncao",
+        type=Path,
+        default=None,
+        help="CSV Bronze de despesas por subfunção (padrão: o mesmo store de --input, ou o CSV consolidado)",
+    )
     parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="CSV com códigos IBGE da RMB")
-    parser.add_argument("--out", type=Path, default=DEFAULT_OUTPUT, help="Parquet de saída na camada Silver")
+    parser.add_argument("--todos-municipios", action="store_true", help="Usa todos os municípios do CSV, não só is_rmb=1")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUTPUT, help="Diretório Silver dos indicadores (particionado por ano)")
+    parser.add_argument("--out-subfuncao", type=Path, default=DEFAULT_OUTPUT_SUBFUNCAO, help="Diretório Silver das despesas por subfunção")
     return parser.parse_args()
 
 
+def resolve_subfuncao_input(args: argparse.Namespace) -> Optional[Path]:
+    if args.input_subfuncao is not None:
+        return args.input_subfuncao
+    if args.input.is_dir():
+        return args.input
+    return DEFAULT_INPUT_SUBFUNCAO if DEFAULT_INPUT_SUBFUNCAO.exists() else None
+
+
 def main() -> None:
     args = parse_args()
-    df = build_siops_silver(args.input, args.municipios)
-    save_parquet(df, args.out)
-    print(f"[OK] SIOPS Silver gerado: {len(df)} linhas → {args.out}")
+    somente_rmb = not args.todos_municipios
+    df = build_siops_silver(args.input, args.municipios, somente_rmb)
+    write_partitioned(pa.Table.from_pandas(df, preserve_index=False), args.out)
+    print(f"[OK] SIOPS Silver (indicadores) gerado: {len(df)} linhas → {args.out}")
+
+    sub_input = resolve_subfuncao_input(args)
+    if sub_input is None:
+        print("[WARN] Bronze de despesas por subfunção não encontrado; etapa ignorada.")
+        return
+    sub = build_subfuncao_silver(sub_input, args.municipios, somente_rmb)
+    write_partitioned(sub, args.out_subfuncao)
+    print(f"[OK] SIOPS Silver (subfunção) gerado: {sub.num_rows} linhas → {args.out_subfuncao}")
 
 
 if __name__ == "__main__":
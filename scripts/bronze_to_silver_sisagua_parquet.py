@@ -4,13 +4,11 @@
 from __future__ import annotations
 
 import argparse
-import csv
-import io
 import re
 import sys
 import unicodedata
 import zipfile
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
 
@@ -18,6 +16,9 @@ import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+from br_numeric import parse_br_numbers
+from ibge_keys import enforce_keys
+
 
 # Limite superior por parâmetro segundo Portaria GM/MS nº 888/2021
 SINGLE_BOUND_THRESHOLDS = {
@@ -71,6 +72,39 @@ class SisaguaRecord:
     fonte_arquivo: str
 
 
+RECORD_COLUMNS = [field.name for field in fields(SisaguaRecord)]
+
+# Colunas dos CSVs do SISAGUA → nomes internos
+SOURCE_COLUMNS = {
+    "UF": "uf",
+    "Código IBGE": "cod_raw",
+    "Município": "municipio_sisagua",
+    "Valor": "valor_raw",
+    "Ano de referência": "ano_raw",
+    "Mês de referência": "mes_raw",
+    "Parâmetro": "parametro_original",
+    "Campo": "campo_original",
+    "Ponto de Monitoramento": "ponto_monitoramento",
+    "Tipo da Forma de Abastecimento": "forma_abastecimento_tipo",
+    "Nome da Forma de Abastecimento": "forma_abastecimento_nome",
+    "Código Forma de abastecimento": "forma_abastecimento_codigo",
+    "Nome da ETA / UTA": "eta_uta_nome",
+    "Sigla da Instituição": "instituicao_sigla",
+    "Nome da Instituição": "instituicao_nome",
+}
+OPTIONAL_TEXT_COLUMNS = [
+    "ponto_monitoramento",
+    "forma_abastecimento_tipo",
+    "forma_abastecimento_nome",
+    "forma_abastecimento_codigo",
+    "eta_uta_nome",
+    "instituicao_sigla",
+    "instituicao_nome",
+]
+
+CSV_CHUNKSIZE = 250_000
+
+
 def load_municipios(path: Path) -> Dict[str, str]:
     df = pd.read_csv(path, dtype={"ibge_code": "string"})
     df = df[df["is_rmb"] == 1]
@@ -122,29 +156,16 @@ def normalize_parameter(name: str) -> str:
 
 
 def parse_float(raw: str) -> Optional[float]:
-    if raw is None:
-        return None
-    if isinstance(raw, (int, float)):
-        return float(raw)
-    txt = str(raw).strip()
-    if not txt:
-        return None
-    txt_lower = txt.lower()
-    if txt_lower in {"na", "nan", "null", "none", "sem informacao"}:
-        return None
-    txt = txt.replace(".", "").replace(",", ".")
-    try:
-        value = float(txt)
-    except ValueError:
-        return None
-    return value
+    value, _ = parse_br_numbers([raw], dot_policy="thousands")
+    return None if pd.isna(value[0]) else float(value[0])
 
 
 def extract_numbers(text: str) -> List[float]:
-    numbers = []
-    for match in re.findall(r"\d+(?:[\.,]\d+)?", text):
-        numbers.append(float(match.replace(".", "").replace(",", ".")))
-    return numbers
+    matches = re.findall(r"\d+(?:[\.,]\d+)?", text)
+    if not matches:
+        return []
+    values, _ = parse_br_numbers(matches, dot_policy="thousands")
+    return values.tolist()
 
 
 def clean_ibge_code(raw: Optional[str]) -> Optional[str]:
@@ -163,6 +184,15 @@ def clean_ibge_code(raw: Optional[str]) -> Optional[str]:
     return digits.zfill(6)
 
 
+def clean_ibge_codes(series: pd.Series) -> pd.Series:
+    """Versão vetorizada de ``clean_ibge_code``."""
+    digits = series.fillna("").astype(str).str.replace(r"[^0-9]", "", regex=True)
+    length = digits.str.len()
+    cleaned = digits.where(length < 7, digits.str[:7])
+    cleaned = cleaned.where(length >= 6, digits.str.zfill(6))
+    return cleaned.where(length > 0)
+
+
 def classify_campo(parametro: str, campo: str) -> Optional[str]:
     campo_lower = campo.lower()
     campo_norm = to_ascii(campo_lower)
@@ -244,93 +274,114 @@ def classify_campo(parametro: str, campo: str) -> Optional[str]:
     return None
 
 
-def process_source(
-    source_path: Path,
-    municipios: Dict[str, str],
-) -> List[SisaguaRecord]:
-    records: List[SisaguaRecord] = []
-    dataset_name = (
-        "demais_parametros" if "demais" in source_path.name else "parametros_basicos"
+def read_source_chunks(source_path: Path) -> Iterable[pd.DataFrame]:
+    """Lê os CSVs (soltos ou dentro de ZIP) em blocos, apenas com as colunas usadas."""
+    options = dict(
+        sep=";",
+        encoding="latin1",
+        dtype=str,
+        keep_default_na=False,
+        usecols=lambda col: col in SOURCE_COLUMNS,
+        chunksize=CSV_CHUNKSIZE,
+        on_bad_lines="warn",
     )
-
-    def iter_rows(handle: Iterable[Dict[str, str]]) -> None:
-        nonlocal records
-        for row in handle:
-            uf = (row.get("UF") or "").strip()
-            cod = clean_ibge_code(row.get("Código IBGE"))
-            if uf != "PA" or cod not in municipios:
-                continue
-
-            valor = parse_float(row.get("Valor"))
-            if valor is None:
-                continue
-
-            ano = row.get("Ano de referência")
-            mes = row.get("Mês de referência")
-            try:
-                ano_int = int(float(str(ano).strip()))
-                mes_int = int(float(str(mes).strip()))
-            except (TypeError, ValueError):
-                continue
-
-            parametro_original = (row.get("Parâmetro") or "").strip()
-            campo_original = (row.get("Campo") or "").strip()
-            if not parametro_original or not campo_original:
-                continue
-
-            parametro = normalize_parameter(parametro_original)
-            campo_slug = slugify(campo_original)
-            classificacao = classify_campo(parametro, campo_original) or "nao_classificado"
-
-            records.append(
-                SisaguaRecord(
-                    cod_mun=cod,
-                    municipio_alvo=municipios[cod],
-                    municipio_sisagua=(row.get("Município") or "").strip(),
-                    uf=uf,
-                    ano=ano_int,
-                    mes=mes_int,
-                    parametro=parametro,
-                    parametro_original=parametro_original,
-                    campo_slug=campo_slug,
-                    campo_original=campo_original,
-                    classificacao=classificacao,
-                    valor=valor,
-                    dataset=dataset_name,
-                    ponto_monitoramento=(row.get("Ponto de Monitoramento") or "").strip() or None,
-                    forma_abastecimento_tipo=(row.get("Tipo da Forma de Abastecimento") or "").strip() or None,
-                    forma_abastecimento_nome=(row.get("Nome da Forma de Abastecimento") or "").strip() or None,
-                    forma_abastecimento_codigo=(row.get("Código Forma de abastecimento") or "").strip() or None,
-                    eta_uta_nome=(row.get("Nome da ETA / UTA") or "").strip() or None,
-                    instituicao_sigla=(row.get("Sigla da Instituição") or "").strip() or None,
-                    instituicao_nome=(row.get("Nome da Instituição") or "").strip() or None,
-                    fonte_arquivo=source_path.name,
-                )
-            )
-
     if source_path.suffix.lower() == ".zip":
         with zipfile.ZipFile(source_path) as zf:
             members = [m for m in zf.namelist() if m.lower().endswith(".csv")]
             if not members:
                 print(f"[WARN] Nenhum CSV encontrado em {source_path.name}", file=sys.stderr)
-                return records
+                return
             for member in members:
+                # latin1 é a codificação usual dos dados do governo (identificada no arquivo de 2020)
                 with zf.open(member) as raw:
-                    # Força a decodificação para latin1, que é comum em dados do governo brasileiro
-                    # e foi identificado como a codificação do arquivo de 2020.
-                    reader = csv.DictReader(io.TextIOWrapper(raw, encoding="latin1"), delimiter=";")
-                    iter_rows(reader)
+                    yield from pd.read_csv(raw, **options)
     else:
-        # Garante que arquivos CSV abertos diretamente também usem a codificação latin1.
-        with source_path.open("r", encoding="latin1", errors="replace") as raw:
-            reader = csv.DictReader(raw, delimiter=";")
-            iter_rows(reader)
+        with source_path.open("rb") as raw:
+            yield from pd.read_csv(raw, **options)
+
+
+def process_chunk(
+    chunk: pd.DataFrame,
+    municipios: Dict[str, str],
+    dataset_name: str,
+    fonte_arquivo: str,
+) -> pd.DataFrame:
+    chunk = chunk.rename(columns=SOURCE_COLUMNS).reindex(columns=list(SOURCE_COLUMNS.values()))
+    chunk = chunk.fillna("")
+
+    uf = chunk["uf"].str.strip()
+    cod = clean_ibge_codes(chunk["cod_raw"])
+    mask = (uf == "PA") & cod.isin(list(municipios))
+    chunk, uf, cod = chunk[mask], uf[mask], cod[mask]
+    if chunk.empty:
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+
+    valor, _ = parse_br_numbers(chunk["valor_raw"], dot_policy="thousands")
+    ano = pd.to_numeric(chunk["ano_raw"].str.strip(), errors="coerce")
+    mes = pd.to_numeric(chunk["mes_raw"].str.strip(), errors="coerce")
+    parametro_original = chunk["parametro_original"].str.strip()
+    campo_original = chunk["campo_original"].str.strip()
+    keep = (
+        ~pd.isna(valor)
+        & ano.notna().to_numpy()
+        & mes.notna().to_numpy()
+        & (parametro_original != "").to_numpy()
+        & (campo_original != "").to_numpy()
+    )
+    if not keep.any():
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+
+    out = pd.DataFrame(
+        {
+            "cod_mun": cod[keep].to_numpy(),
+            "uf": uf[keep].to_numpy(),
+            "municipio_sisagua": chunk["municipio_sisagua"].str.strip()[keep].to_numpy(),
+            "ano": ano[keep].astype(int).to_numpy(),
+            "mes": mes[keep].astype(int).to_numpy(),
+            "parametro_original": parametro_original[keep].to_numpy(),
+            "campo_original": campo_original[keep].to_numpy(),
+            "valor": valor[keep],
+        }
+    )
+    out["municipio_alvo"] = out["cod_mun"].map(municipios)
+
+    # normalização/classificação apenas para os pares (parâmetro, campo) distintos
+    pairs = out[["parametro_original", "campo_original"]].drop_duplicates()
+    pairs["parametro"] = pairs["parametro_original"].map(normalize_parameter)
+    pairs["campo_slug"] = pairs["campo_original"].map(slugify)
+    pairs["classificacao"] = [
+        classify_campo(parametro, campo) or "nao_classificado"
+        for parametro, campo in zip(pairs["parametro"], pairs["campo_original"])
+    ]
+    out = out.merge(pairs, on=["parametro_original", "campo_original"], how="left")
+
+    for col in OPTIONAL_TEXT_COLUMNS:
+        text = chunk[col].str.strip()[keep].to_numpy(dtype=object)
+        text[text == ""] = None
+        out[col] = text
+    out["dataset"] = dataset_name
+    out["fonte_arquivo"] = fonte_arquivo
+    return out[RECORD_COLUMNS]
 
-    return records
+
+def process_source(
+    source_path: Path,
+    municipios: Dict[str, str],
+) -> pd.DataFrame:
+    dataset_name = (
+        "demais_parametros" if "demais" in source_path.name else "parametros_basicos"
+    )
+    frames = [
+        process_chunk(chunk, municipios, dataset_name, source_path.name)
+        for chunk in read_source_chunks(source_path)
+    ]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
 
 
-def aggregate_records(records: List[SisaguaRecord]) -> pd.DataFrame:
-    df = pd.DataFrame([r.__dict__ for r in records])
+def aggregate_records(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         raise SystemExit("Nenhum registro SISAGUA encontrado para os municípios da RMB.")
 
@@ -421,7 +472,8 @@ def aggregate_records(records: List[SisaguaRecord]) -> pd.DataFrame:
 
 def write_partitioned(df: pd.DataFrame, out_dir: Path) -> None:
     out_dir.mkdir(parents=True, exist_ok=True)
-    table = pa.Table.from_pandas(df)
+    # cod_mun int32 IBGE-7; ano/mes viram diretórios (lidos com hive_partitioning)
+    table = enforce_keys(pa.Table.from_pandas(df))
     pq.write_to_dataset(
         table,
         root_path=str(out_dir),
@@ -445,22 +497,22 @@ def main() -> int:
     if not municipios:
         raise SystemExit("CSV de municípios vazio ou sem flag is_rmb=1.")
 
-    all_records: List[SisaguaRecord] = []
+    all_records: List[pd.DataFrame] = []
     for source in iter_sisagua_sources(input_dir):
         print(f"[SISAGUA] Processando {source.name} ...")
         records = process_source(source, municipios)
         print(f"  -> {len(records)} registros relevantes")
-        all_records.extend(records)
+        if not records.empty:
+            all_records.append(records)
 
     if not all_records:
         raise SystemExit("Nenhum registro SISAGUA processado. Verifique os filtros.")
 
+    debug_df_raw = pd.concat(all_records, ignore_index=True)
     print("\\n[DEBUG] Anos encontrados nos registros brutos antes da agregação:")
-    debug_df_raw = pd.DataFrame([r.__dict__ for r in all_records])
-    if not debug_df_raw.empty:
-        print(sorted(debug_df_raw["ano"].unique()))
+    print(sorted(debug_df_raw["ano"].unique()))
 
-    df = aggregate_records(all_records)
+    df = aggregate_records(debug_df_raw)
 
     print("\\n[DEBUG] Anos encontrados no DataFrame final antes da escrita:")
     if not df.empty:
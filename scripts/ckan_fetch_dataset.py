@@ -12,10 +12,13 @@ from urllib.parse import urljoin
 import requests
 from tqdm import tqdm
 
+from http_cache import DAY, HttpCache, add_cache_arguments, cache_from_args
 
-def list_resources(base_url: str, dataset_slug: str):
-    api = urljoin(base_url, f"/api/3/action/package_show?id={dataset_slug}")
-    response = requests.get(api, timeout=60)
+
+def list_resources(base_url: str, dataset_slug: str, cache: HttpCache | None = None):
+    api = urljoin(base_url, "/api/3/action/package_show")
+    cache = cache or HttpCache()
+    response = cache.get(api, params={"id": dataset_slug}, ttl=DAY, timeout=60)
     response.raise_for_status()
     data = response.json()
     if not data.get("success"):
@@ -48,10 +51,11 @@ def main():
     parser.add_argument("--slug", required=True, help="Slug do dataset (ex.: sisagua-controle-mensal-demais-parametros)")
     parser.add_argument("--out", required=True, help="Diretório de saída")
     parser.add_argument("--formats", default="CSV,ZIP,JSON,XML", help="Formatos de recursos para baixar (separados por vírgula)")
+    add_cache_arguments(parser)
     args = parser.parse_args()
 
     allowed = {item.strip().upper() for item in args.formats.split(",")}
-    resources = list_resources(args.base, args.slug)
+    resources = list_resources(args.base, args.slug, cache_from_args(args))
 
     downloaded = []
     for resource in resources:
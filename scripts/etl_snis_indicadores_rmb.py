@@ -4,12 +4,27 @@ Atualiza as referências de caminhos conforme a árvore em ``data/bronze/snis``.
 """
 from __future__ import annotations
 
+import argparse
+import hashlib
+import os
 import re
+import shutil
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+import openpyxl
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from br_numeric import parse_br_numbers
+from ibge_keys import ibge_check_digit, key_field, to_ibge7
 
 BASE_SNIS = Path("data/bronze/snis")
 
@@ -52,6 +67,20 @@ PLANILHAS_POR_ANO: Dict[int, List[Path]] = {
 }
 
 OUT_DIR = Path("data/gold")
+SILVER_DIR = Path("data/silver/snis")
+CACHE_DIR = Path("data/cache/snis")
+DEFAULT_MUNICIPIOS = Path("config/rmb_municipios.csv")
+
+# Saídas: Silver tipado (lido pelo Gold) + cópias v2 mantidas para os notebooks
+SILVER_FILE = SILVER_DIR / "indicadores.parquet"
+GOLD_V2_CSV = OUT_DIR / "snis_rmb_indicadores_v2.csv"
+GOLD_V2_PARQUET = OUT_DIR / "snis_rmb_indicadores_v2.parquet"
+
+# Incrementar sempre que a leitura/normalização das planilhas mudar (invalida o cache)
+PARSER_VERSION = 2
+
+# Linhas inspecionadas no topo de cada aba para achar cabeçalho e linha de códigos
+HEADER_SCAN_ROWS = 30
 
 RMB_MUNS = {
     "BELÉM",
@@ -74,6 +103,16 @@ def fix_str(value: object) -> str:
     return text.strip()
 
 
+def fix_str_series(series: pd.Series) -> pd.Series:
+    """Aplica ``fix_str`` uma vez por valor distinto (as planilhas repetem muito os rótulos)."""
+    distinct = series.dropna().unique()
+    mapping = {value: fix_str(value) for value in distinct if isinstance(value, str)}
+    if not mapping:
+        return series
+    fixed = series.map(mapping)
+    return fixed.where(fixed.notna(), series)
+
+
 def strip_accents(text: str) -> str:
     normalized = unicodedata.normalize("NFKD", text)
     return "".join(ch for ch in normalized if not unicodedata.combining(ch))
@@ -88,27 +127,8 @@ def strip_upper(text: str) -> str:
     return strip_accents(text).upper()
 
 
-def to_float_br(value: object) -> float | None:
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    text = str(value)
-    text = re.sub(r"[^0-9,.-]+", "", text).strip()
-    if not text or text in {"-", "."}:
-        return None
-    if "," in text and "." in text:
-        text = text.replace(".", "").replace(",", ".")
-    elif "," in text:
-        text = text.replace(".", "").replace(",", ".")
-    else:
-        text = text.replace(",", ".")
-    try:
-        return float(text)
-    except ValueError:
-        return None
-
-
 def find_header_row(raw: pd.DataFrame) -> int | None:
-    for idx in range(min(30, len(raw))):
+    for idx in range(min(HEADER_SCAN_ROWS, len(raw))):
         row = raw.iloc[idx].fillna("").map(lambda x: sanitize_label(fix_str(x)))
         if any("municipio" in cell for cell in row) and any(
             key in row.tolist() for key in ["codigo_do_municipio", "codigo_ibge", "cod_ibge"]
@@ -149,7 +169,9 @@ def build_columns(raw: pd.DataFrame, header_idx: int, code_idx: int | None) -> L
     return columns
 
 
-def read_excel_normalized(path: Path) -> Iterable[pd.DataFrame]:
+def parse_workbook(path: Path, row_filter: Optional["RowFilter"] = None) -> List[pd.DataFrame]:
+    if path.suffix.lower() == ".xlsx":
+        return stream_xlsx_tables(path, row_filter or RMB_ROW_FILTER)
     try:
         workbook = pd.ExcelFile(path)
     except Exception:
@@ -173,12 +195,107 @@ def read_excel_normalized(path: Path) -> Iterable[pd.DataFrame]:
         if data.empty:
             continue
         for col in data.columns:
-            if data[col].dtype == object:
-                data[col] = data[col].map(lambda x: fix_str(x) if isinstance(x, str) else x)
+            if data[col].dtype == object or pd.api.types.is_string_dtype(data[col]):
+                data[col] = fix_str_series(data[col])
         tables.append(data)
     return tables
 
 
+@lru_cache(maxsize=None)
+def _file_sha256(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def workbook_hash(path: Path) -> str:
+    stat = path.stat()
+    return _file_sha256(str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+
+def cache_entry(path: Path, cache_dir: Path, row_filter: Optional["RowFilter"] = None) -> Path:
+    """Diretório de cache da planilha: conteúdo (hash) + versão do parser (+ projeção, nos .xlsx)."""
+    name = f"{path.stem}-{workbook_hash(path)[:24]}-v{PARSER_VERSION}"
+    if path.suffix.lower() == ".xlsx":
+        name += f"-p{projection_fingerprint(row_filter or RMB_ROW_FILTER)}"
+    return cache_dir / name
+
+
+def is_cached(entry: Path) -> bool:
+    """Entrada completa (marcador ``_SUCCESS``), sem ler os Parquets."""
+    return (entry / "_SUCCESS").exists()
+
+
+def load_cached(entry: Path) -> Optional[List[pd.DataFrame]]:
+    if not is_cached(entry):
+        return None
+    return [pd.read_parquet(part) for part in sorted(entry.glob("sheet_*.parquet"))]
+
+
+def store_cached(entry: Path, tables: List[pd.DataFrame]) -> None:
+    tmp = entry.with_name("." + entry.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for idx, table in enumerate(tables):
+        table.reset_index(drop=True).to_parquet(tmp / f"sheet_{idx:03d}.parquet", index=False)
+    (tmp / "_SUCCESS").touch()
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+
+
+def parse_to_cache(path: Path, cache_dir: Path, row_filter: Optional["RowFilter"] = None) -> Path:
+    """Executado nos processos do pool: lê a planilha e grava as abas normalizadas em parquet."""
+    entry = cache_entry(path, cache_dir, row_filter)
+    store_cached(entry, parse_workbook(path, row_filter))
+    return entry
+
+
+def read_excel_normalized(
+    path: Path,
+    cache_dir: Optional[Path] = CACHE_DIR,
+    row_filter: Optional["RowFilter"] = None,
+) -> Iterable[pd.DataFrame]:
+    if cache_dir is None:
+        return parse_workbook(path, row_filter)
+    entry = cache_entry(path, cache_dir, row_filter)
+    cached = load_cached(entry)
+    if cached is not None:
+        return cached
+    tables = parse_workbook(path, row_filter)
+    store_cached(entry, tables)
+    return tables
+
+
+def warm_cache(
+    paths: Iterable[Path],
+    cache_dir: Path,
+    workers: int,
+    row_filter: Optional["RowFilter"] = None,
+) -> None:
+    """Lê em paralelo (um processo por planilha) apenas as planilhas ausentes do cache.
+
+    Planilhas repetidas (mesma entrada de cache: mesmo conteúdo e projeção) são
+    lidas uma única vez.
+    """
+    pending: Dict[Path, Path] = {}
+    for path in paths:
+        if path.exists():
+            pending.setdefault(cache_entry(path, cache_dir, row_filter), path)
+    missing = [path for entry, path in pending.items() if not is_cached(entry)]
+    if not missing:
+        return
+    print(f"[SNIS] Lendo {len(missing)} planilhas fora do cache com {workers} processos...")
+    if workers <= 1 or len(missing) == 1:
+        for path in missing:
+            parse_to_cache(path, cache_dir, row_filter)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+        n = len(missing)
+        list(pool.map(parse_to_cache, missing, [cache_dir] * n, [row_filter] * n))
+
+
 COL_ALIASES: Dict[str, Tuple[str, ...]] = {
     "cod_mun": (
         "codigo_do_municipio",
@@ -243,6 +360,49 @@ IND_PAT: Dict[str, Tuple[str, ...]] = {
 
 RMB_MUNS_SAN = {strip_upper(name) for name in RMB_MUNS}
 
+PCT_COLS = (
+    "idx_atend_agua_total",
+    "idx_atend_agua_urbano",
+    "idx_coleta_esgoto",
+    "idx_tratamento_esgoto",
+    "idx_esgoto_tratado_ref_agua",
+    "idx_hidrometracao",
+    "idx_perdas_distribuicao",
+)
+
+# Correções de escala: coluna → (limite, divisor). Valores acima do limite são
+# divididos pelo divisor (percentuais lidos sem a vírgula; grandezas físicas com
+# ponto de milhar interpretado como decimal ausente).
+SCALE_RULES: Dict[str, Tuple[float, float]] = {
+    **{col: (100.0, 100.0) for col in PCT_COLS},
+    "idx_perdas_lineares": (1000.0, 100.0),
+    "idx_perdas_por_ligacao": (1000.0, 100.0),
+}
+
+KEY_COLS = ["cod_mun", "municipio", "ano"]
+
+ESCOPOS = ("rmb", "registro", "todos")
+
+
+@dataclass(frozen=True)
+class RowFilter:
+    """Filtro antecipado de linhas na leitura streaming (``None`` = não filtra por aquele campo)."""
+
+    ufs: Optional[frozenset] = None
+    names: Optional[frozenset] = None
+
+
+@dataclass(frozen=True)
+class Escopo:
+    """Municípios extraídos: códigos de 6 dígitos aceitos (``None`` = todos) e filtro da leitura."""
+
+    nome: str
+    codes6: Optional[frozenset]
+    row_filter: RowFilter
+
+
+RMB_ROW_FILTER = RowFilter(ufs=frozenset({"PA"}), names=frozenset(RMB_MUNS_SAN))
+
 
 def locate_column(normalized_map: Dict[str, str], aliases: Tuple[str, ...]) -> str | None:
     for alias in aliases:
@@ -252,62 +412,157 @@ def locate_column(normalized_map: Dict[str, str], aliases: Tuple[str, ...]) -> s
     return None
 
 
-def extract_indicators(table: pd.DataFrame) -> pd.DataFrame:
-    if table.empty:
-        return pd.DataFrame()
+def matches_indicator(normalized: str, patterns: Tuple[str, ...]) -> bool:
+    return normalized in patterns or any(pattern in normalized for pattern in patterns)
+
 
-    normalized_map = {col: sanitize_label(col) for col in table.columns}
+def locate_indicator_column(normalized_map: Dict[str, str], patterns: Tuple[str, ...]) -> str | None:
+    return next(
+        (column for column, normalized in normalized_map.items() if matches_indicator(normalized, patterns)),
+        None,
+    )
 
+
+# --- leitura projetada/streaming das planilhas .xlsx (SINISA) ---
+def projection_fingerprint(row_filter: RowFilter = RMB_ROW_FILTER) -> str:
+    """Identifica colunas e filtro de linhas usados na leitura projetada (entra na chave do cache)."""
+    if row_filter == RMB_ROW_FILTER:
+        # mesma chave do filtro histórico (só RMB): caches já gravados continuam válidos
+        filtro: Tuple = (sorted(RMB_MUNS_SAN),)
+    else:
+        filtro = tuple(None if values is None else sorted(values) for values in (row_filter.ufs, row_filter.names))
+    spec = repr((sorted(COL_ALIASES.items()), sorted(IND_PAT.items()), *filtro))
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()[:12]
+
+
+def cell_to_str(value: object) -> str | None:
+    """Converte a célula como ``read_excel(dtype=str)`` faria (floats inteiros sem ``.0``)."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def projected_columns(columns: List[str]) -> Tuple[List[int], int | None, int | None]:
+    """Posições das colunas usadas por ``extract_indicators`` + posições de UF e município."""
+    normalized_map = {col: sanitize_label(col) for col in columns}
+    wanted = set()
+    located = {key: locate_column(normalized_map, aliases) for key, aliases in COL_ALIASES.items()}
+    wanted.update(col for col in located.values() if col)
+    for patterns in IND_PAT.values():
+        wanted.update(
+            column for column, normalized in normalized_map.items() if matches_indicator(normalized, patterns)
+        )
+    positions = [pos for pos, col in enumerate(columns) if col in wanted]
+    uf_pos = columns.index(located["uf"]) if located["uf"] else None
+    name_pos = columns.index(located["municipio"]) if located["municipio"] else None
+    return positions, uf_pos, name_pos
+
+
+def keep_row(row: Tuple, uf_pos: int | None, name_pos: int | None, row_filter: RowFilter = RMB_ROW_FILTER) -> bool:
+    """Filtro antecipado: UF no escopo (ou, sem coluna de UF, município no escopo)."""
+    if uf_pos is not None:
+        if row_filter.ufs is None:
+            return True
+        value = row[uf_pos] if uf_pos < len(row) else None
+        return value is not None and strip_upper(fix_str(cell_to_str(value))) in row_filter.ufs
+    if name_pos is not None and row_filter.names is not None:
+        value = row[name_pos] if name_pos < len(row) else None
+        return value is not None and strip_upper(fix_str(cell_to_str(value))) in row_filter.names
+    return True
+
+
+def stream_xlsx_tables(path: Path, row_filter: RowFilter = RMB_ROW_FILTER) -> List[pd.DataFrame]:
+    """Lê as abas em modo read-only: só o topo para detectar cabeçalho, depois apenas colunas/linhas úteis."""
+    try:
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    except Exception:
+        return []
+
+    tables: List[pd.DataFrame] = []
+    try:
+        for sheet in workbook.worksheets:
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(values_only=True)
+            top = [row for _, row in zip(range(HEADER_SCAN_ROWS), rows)]
+            if not top:
+                continue
+            raw = pd.DataFrame([[cell_to_str(value) for value in row] for row in top])
+            header_idx = find_header_row(raw)
+            if header_idx is None:
+                continue
+            code_idx = find_code_row(raw, header_idx)
+            start_idx = (code_idx if code_idx is not None else header_idx) + 1
+            columns = build_columns(raw, header_idx, code_idx)
+            positions, uf_pos, name_pos = projected_columns(columns)
+
+            records = []
+            for row in chain(top[start_idx:], rows):
+                if not keep_row(row, uf_pos, name_pos, row_filter):
+                    continue
+                records.append([cell_to_str(row[pos]) if pos < len(row) else None for pos in positions])
+
+            data = pd.DataFrame(records, columns=[columns[pos] for pos in positions], dtype=object)
+            data = data.dropna(how="all")
+            if data.empty:
+                continue
+            for col in data.columns:
+                data[col] = fix_str_series(data[col])
+            tables.append(data)
+    finally:
+        workbook.close()
+    return tables
+
+
+@lru_cache(maxsize=None)
+def resolve_layout(columns: Tuple[str, ...]) -> Optional[Tuple[str, str, Tuple[Tuple[str, str], ...]]]:
+    """Colunas de código, município e indicadores de um layout de cabeçalho (resolvido uma vez por layout)."""
+    normalized_map = {col: sanitize_label(col) for col in columns}
     code_col = locate_column(normalized_map, COL_ALIASES["cod_mun"])
     name_col = locate_column(normalized_map, COL_ALIASES["municipio"])
-    uf_col = locate_column(normalized_map, COL_ALIASES["uf"])
-
     if code_col is None or name_col is None:
-        return pd.DataFrame()
+        return None
+    indicators = []
+    for target, patterns in IND_PAT.items():
+        match = locate_indicator_column(normalized_map, patterns)
+        if match:
+            indicators.append((target, match))
+    return code_col, name_col, tuple(indicators)
 
-    frame = table.copy()
-    for col in [code_col, name_col, uf_col]:
-        if col and frame[col].dtype == object:
-            frame[col] = frame[col].map(lambda x: fix_str(x) if isinstance(x, str) else x)
 
-    if uf_col:
-        frame = frame[frame[uf_col].map(lambda x: strip_upper(str(x)) == "PA")]
-    frame["__mun_norm"] = frame[name_col].map(lambda x: strip_upper(str(x)))
-    frame = frame[frame["__mun_norm"].isin(RMB_MUNS_SAN)]
-    if frame.empty:
+def extract_indicators(table: pd.DataFrame, escopo: Optional[Escopo] = None) -> pd.DataFrame:
+    if table.empty:
         return pd.DataFrame()
-
-    cod_series = (
-        frame[code_col]
-        .astype(str)
-        .str.extract(r"(\d{6,7})", expand=False)
-        .str.strip()
-    )
+    layout = resolve_layout(tuple(table.columns))
+    if layout is None:
+        return pd.DataFrame()
+    code_col, name_col, indicators = layout
+    codes6 = (escopo or rmb_escopo()).codes6
+
+    cod_series = table[code_col].astype("string").str.extract(r"(\d{6,7})", expand=False)
+    mask = cod_series.notna()
+    if codes6 is not None:
+        mask &= cod_series.str[:6].isin(codes6)
+    mask = mask.fillna(False).to_numpy(dtype=bool)
+    if not mask.any():
+        return pd.DataFrame()
+    frame = table[mask]
 
     dataset = pd.DataFrame({
-        "cod_mun": cod_series,
+        "cod_mun": cod_series[mask].astype(object),
         "municipio": frame[name_col],
     })
-
-    dataset = dataset.dropna(subset=["cod_mun"])
-
-    for target, patterns in IND_PAT.items():
-        match = next(
-            (
-                column
-                for column, normalized in normalized_map.items()
-                if normalized in patterns or any(pattern in normalized for pattern in patterns)
-            ),
-            None,
-        )
-        if match:
-            dataset[target] = frame[match].map(to_float_br)
+    for target, match in indicators:
+        # mesma limpeza agressiva do to_float_br original (unidades e rótulos colados ao número)
+        dataset[target], _ = parse_br_numbers(frame[match], strip_non_numeric=True)
 
     dataset = dataset.groupby(["cod_mun", "municipio"], as_index=False).max(numeric_only=True)
     return dataset
 
 
 def choose_one_prestador(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Uma linha por município: o prestador com maior soma dos índices de cobertura."""
     frames = [f for f in frames if not f.empty]
     if not frames:
         return pd.DataFrame()
@@ -320,20 +575,44 @@ def choose_one_prestador(frames: List[pd.DataFrame]) -> pd.DataFrame:
     if score_cols:
         score = base[score_cols].fillna(0).sum(axis=1)
     else:
-        score = pd.Series(0, index=base.index)
-    base = base.assign(_score=score)
-    base = base.sort_values(["municipio", "_score"], ascending=[True, False])
-    base = base.drop_duplicates(subset=["cod_mun"], keep="first")
-    return base.drop(columns="_score", errors="ignore")
-
-
-def collect_year(year: int, paths: Iterable[Path]) -> Tuple[List[pd.DataFrame], pd.DataFrame]:
+        score = pd.Series(0.0, index=base.index)
+    best = score.groupby(base["cod_mun"], sort=False).idxmax()
+    return base.loc[np.sort(best.to_numpy())].sort_values("municipio", kind="stable")
+
+
+def rmb_escopo(municipios_path: Path = DEFAULT_MUNICIPIOS) -> Escopo:
+    return build_escopo("rmb", municipios_path)
+
+
+@lru_cache(maxsize=None)
+def build_escopo(nome: str, municipios_path: Path = DEFAULT_MUNICIPIOS) -> Escopo:
+    """``rmb``: os seis municípios históricos; ``registro``: todo o registro; ``todos``: sem filtro."""
+    if nome not in ESCOPOS:
+        raise ValueError(f"Escopo inválido: {nome} (use {', '.join(ESCOPOS)})")
+    if nome == "todos":
+        return Escopo(nome, None, RowFilter())
+    registry = pd.read_csv(municipios_path, dtype={"ibge_code": "string", "uf": "string"})
+    if nome == "rmb":
+        names = registry["name"].map(lambda name: strip_upper(str(name)).strip())
+        codes = registry.loc[names.isin(RMB_MUNS_SAN).to_numpy(), "ibge_code"]
+        return Escopo(nome, frozenset(codes.str.zfill(7).str[:6]), RMB_ROW_FILTER)
+    ufs = frozenset(registry["uf"].dropna().map(lambda uf: strip_upper(uf).strip()))
+    return Escopo(nome, frozenset(registry["ibge_code"].str.zfill(7).str[:6]), RowFilter(ufs=ufs or None))
+
+
+def collect_year(
+    year: int,
+    paths: Iterable[Path],
+    cache_dir: Optional[Path] = CACHE_DIR,
+    escopo: Optional[Escopo] = None,
+) -> Tuple[List[pd.DataFrame], pd.DataFrame]:
+    escopo = escopo or rmb_escopo()
     raw_frames: List[pd.DataFrame] = []
     for path in paths:
         if not path.exists():
             continue
-        for table in read_excel_normalized(path):
-            extracted = extract_indicators(table)
+        for table in read_excel_normalized(path, cache_dir, escopo.row_filter):
+            extracted = extract_indicators(table, escopo)
             if extracted.empty:
                 continue
             enriched = extracted.assign(fonte_planilha=path.stem, ano=year)
@@ -344,34 +623,144 @@ def collect_year(year: int, paths: Iterable[Path]) -> Tuple[List[pd.DataFrame],
     return raw_frames, curated
 
 
+def load_registry_codes(path: Path = DEFAULT_MUNICIPIOS) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Do registro de municípios: (nome normalizado → IBGE-7, código 6/7 dígitos → IBGE-7)."""
+    registry = pd.read_csv(path, dtype={"ibge_code": "string"})
+    codes7 = registry["ibge_code"].str.strip().str.zfill(7)
+    by_name = {strip_upper(str(name)).strip(): code for name, code in zip(registry["name"], codes7)}
+    by_code = {**{code[:6]: code for code in codes7}, **{code: code for code in codes7}}
+    return by_name, by_code
+
+
+def fix_cod_mun(df: pd.DataFrame, by_name: Dict[str, str], by_code: Dict[str, str]) -> pd.Series:
+    """Código IBGE de 7 dígitos: registro → dígitos lidos (com DV calculado) → nome do município."""
+    digits = df["cod_mun"].astype("string").str.replace(r"\D", "", regex=True).fillna("")
+    from_code = digits.map(by_code)
+
+    fallback = digits.str[:7].where(digits.str.len() >= 7)
+    six = digits[digits.str.len() == 6]
+    if not six.empty:
+        fallback[six.index] = six + ibge_check_digit(six)
+
+    # o nome só resolve linhas sem código utilizável (evita homônimos de outras UFs)
+    names = df["municipio"].astype("string").fillna("")
+    from_name = names.map({name: by_name.get(strip_upper(name).strip()) for name in names.unique()})
+    return from_code.fillna(fallback).fillna(from_name).astype("string")
+
+
+def apply_scale_rules(df: pd.DataFrame, rules: Dict[str, Tuple[float, float]] = SCALE_RULES) -> pd.DataFrame:
+    df = df.copy()
+    for col, (limite, divisor) in rules.items():
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce").astype(float)
+        df[col] = values.where(~(values > limite), values / divisor)
+    return df
+
+
+def silver_schema(columns: Iterable[str]) -> pa.Schema:
+    """Chaves tipadas; indicadores como float64 e metadados textuais como string."""
+    fields = [key_field("cod_mun"), pa.field("municipio", pa.string()), key_field("ano")]
+    for col in columns:
+        if col in KEY_COLS:
+            continue
+        fields.append(pa.field(col, pa.float64() if col in IND_PAT else pa.string()))
+    return pa.schema(fields)
+
+
+def build_silver(
+    curated: pd.DataFrame,
+    municipios_path: Path = DEFAULT_MUNICIPIOS,
+    rules: Dict[str, Tuple[float, float]] = SCALE_RULES,
+) -> pa.Table:
+    """Aplica a correção de códigos IBGE e as regras de escala e devolve a tabela Silver tipada."""
+    by_name, by_code = load_registry_codes(municipios_path)
+    df = curated.copy()
+    # contrato de chaves: IBGE-7 int32 (nulo quando nem registro, dígitos ou nome resolvem)
+    df["cod_mun"] = to_ibge7(fix_cod_mun(df, by_name, by_code)).to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get)
+    df = apply_scale_rules(df, rules)
+    ordem = KEY_COLS + [col for col in df.columns if col not in KEY_COLS]
+    df = df[ordem].sort_values(["municipio", "ano"], kind="stable")
+    schema = silver_schema(ordem)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def silver_path(escopo: str = "rmb") -> Path:
+    """O Silver da RMB é o lido pelo Gold; os demais escopos ganham arquivo próprio."""
+    return SILVER_FILE if escopo == "rmb" else SILVER_DIR / f"indicadores_{escopo}.parquet"
+
+
+def write_outputs(table: pa.Table, escopo: str = "rmb") -> None:
+    target = silver_path(escopo)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name("." + target.name + ".tmp")
+    pq.write_table(table, tmp, compression="snappy")
+    os.replace(tmp, target)
+    if escopo != "rmb":
+        print(f"[OK] SNIS Silver ({escopo}): {table.num_rows} linhas → {target}")
+        return
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(target, GOLD_V2_PARQUET)
+    table.to_pandas().to_csv(GOLD_V2_CSV, index=False)
+    print(f"[OK] SNIS Silver: {table.num_rows} linhas → {target} (cópias v2 em {OUT_DIR})")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR, help="Cache parquet das planilhas já normalizadas")
+    parser.add_argument("--sem-cache", action="store_true", help="Relê todas as planilhas sem usar o cache")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios (nome → código IBGE)")
+    parser.add_argument(
+        "--escopo",
+        choices=ESCOPOS,
+        default="rmb",
+        help="rmb: seis municípios históricos; registro: todos do --municipios; todos: todos os municípios do país",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processos para ler planilhas fora do cache",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
+    cache_dir = None if args.sem_cache else args.cache_dir
+    escopo = build_escopo(args.escopo, args.municipios)
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+    if cache_dir is not None:
+        warm_cache(
+            [path for paths in PLANILHAS_POR_ANO.values() for path in paths],
+            cache_dir,
+            args.workers,
+            escopo.row_filter,
+        )
+
     raw_parts: List[pd.DataFrame] = []
     curated_parts: List[pd.DataFrame] = []
 
     for ano, arquivos in PLANILHAS_POR_ANO.items():
-        ano_raw, ano_curated = collect_year(ano, arquivos)
+        ano_raw, ano_curated = collect_year(ano, arquivos, cache_dir, escopo)
         raw_parts.extend(ano_raw)
         if not ano_curated.empty:
             curated_parts.append(ano_curated)
 
+    prefixo = f"snis_{escopo.nome}_indicadores"
     if raw_parts:
         raw = pd.concat(raw_parts, ignore_index=True)
-        raw.to_csv(OUT_DIR / "snis_rmb_indicadores_raw.csv", index=False)
+        raw.to_csv(OUT_DIR / f"{prefixo}_raw.csv", index=False)
 
     if curated_parts:
         curated = pd.concat(curated_parts, ignore_index=True)
-        curated.to_csv(OUT_DIR / "snis_rmb_indicadores.csv", index=False)
-        try:
-            curated.to_parquet(OUT_DIR / "snis_rmb_indicadores.parquet", index=False)
-        except Exception:
-            pass
+        # versão antes das correções, mantida para auditoria
+        curated.to_csv(OUT_DIR / f"{prefixo}.csv", index=False)
+        write_outputs(build_silver(curated, args.municipios), escopo.nome)
 
-    print("ETL concluído para", sorted(PLANILHAS_POR_ANO))
+    print(f"ETL concluído ({escopo.nome}) para", sorted(PLANILHAS_POR_ANO))
 
 
 if __name__ == "__main__":
     main()
-
-
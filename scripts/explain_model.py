@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Contribuições por feature de cada previsão (``modelagem_contribuicoes.csv``).
+
+Explica por que um município × ano tem a taxa prevista que tem. A previsão é
+decomposta em uma base (média de treino do modelo) mais uma contribuição aditiva
+por feature:
+
+- Random Forest: decomposição pelo caminho de decisão (Saabas). Em cada nó
+  atravessado, a variação do valor médio entre pai e filho é creditada à feature
+  usada no corte do pai. A base é a média dos valores das raízes. Como o caminho
+  é determinado pela folha, a contribuição acumulada de cada folha é calculada
+  uma vez (matriz esparsa nós × features). As contribuições de todas as linhas
+  saem de um único produto esparso entre as folhas alcançadas (linhas × nós de
+  todas as árvores) e essa matriz;
+- modelos lineares: ``coef * x`` padronizado, com o intercepto como base.
+
+``base + soma das contribuições = taxa_prevista``. A tabela sai em formato longo
+(``cod_mun``, ``municipio``, ``ano``, ``feature``, ``valor_feature``,
+``contribuicao``), com uma linha ``feature = "(base)"`` por município × ano. Com
+``--cenarios``, as linhas perturbadas de ``scenario_engine`` também são explicadas
+e vão para ``modelagem_contribuicoes_cenarios.csv``.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from analysis_features import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_EXPORT_DIR,
+    DEFAULT_GOLD,
+    DEFAULT_MUNICIPIOS,
+    DEFAULT_SNIS_V2,
+    load_analysis_df,
+    write_extracts,
+)
+from forest_intervals import CHUNK_ROWS, CompactModel, FlatForest
+from scenario_engine import BOUNDED_PREFIXES, SCENARIO_KEYS, parse_steps, scenario_grid, stack_scenarios
+from silver_to_gold_features import parse_anos
+from train_models import DEFAULT_MODEL_PATH
+
+BASE_LABEL = "(base)"
+
+
+def node_contributions(forest: FlatForest, n_features: int) -> sparse.csr_matrix:
+    """Matriz nós × features: ``valor[filho] - valor[pai]`` na coluna da feature do corte do pai."""
+    internal = np.flatnonzero(forest.feature >= 0)
+    children = np.concatenate([forest.left[internal], forest.right[internal]])
+    parents = np.concatenate([internal, internal])
+    deltas = forest.value[children] - forest.value[parents]
+    return sparse.csr_matrix(
+        (deltas, (children, forest.feature[parents])), shape=(len(forest.value), n_features)
+    )
+
+
+def leaf_contributions(forest: FlatForest, n_features: int) -> sparse.csr_matrix:
+    """Matriz nós × features com a soma das contribuições do caminho raiz → nó."""
+    n_nodes = len(forest.value)
+    internal = np.flatnonzero(forest.feature >= 0)
+    parent = np.full(n_nodes, -1, dtype=np.intp)
+    parent[forest.left[internal]] = internal
+    parent[forest.right[internal]] = internal
+
+    # ancestrais por saltos de ponteiro: nível k liga cada nó ao seu k-ésimo ancestral
+    nodes, ancestors = [np.arange(n_nodes)], [np.arange(n_nodes)]
+    current = parent.copy()
+    while (current >= 0).any():
+        valid = np.flatnonzero(current >= 0)
+        nodes.append(valid)
+        ancestors.append(current[valid])
+        current = np.where(current >= 0, parent[np.maximum(current, 0)], -1)
+    rows, cols = np.concatenate(nodes), np.concatenate(ancestors)
+    path = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_nodes, n_nodes))
+    return (path @ node_contributions(forest, n_features)).tocsr()
+
+
+def contributions(model: CompactModel, X: np.ndarray) -> Tuple[float, np.ndarray]:
+    """``(base, matriz linhas × features)``; base + soma da linha = previsão."""
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    if model.kind == "linear":
+        return model.intercept, model.transform(X) * model.coef
+    if model.kind != "floresta":
+        raise ValueError("Contribuições disponíveis apenas para Random Forest e modelos lineares.")
+
+    forest = model.forest
+    per_leaf = leaf_contributions(forest, len(model.features))
+    n_trees = len(forest.roots)
+    out = np.empty((len(X), len(model.features)))
+    for start in range(0, len(X), CHUNK_ROWS):
+        leaves = forest.apply(model.transform(X[start : start + CHUNK_ROWS]))
+        reached = sparse.csr_matrix(
+            (np.ones(leaves.size), leaves.ravel(), np.arange(0, leaves.size + 1, n_trees)),
+            shape=(len(leaves), len(forest.value)),
+        )
+        out[start : start + len(leaves)] = (reached @ per_leaf).toarray()
+    return float(forest.value[forest.roots].mean()), out / n_trees
+
+
+def contributions_long(
+    keys: pd.DataFrame, features: Sequence[str], X: np.ndarray, base: float, contrib: np.ndarray
+) -> pd.DataFrame:
+    """Formato longo: uma linha por chave × feature, mais a linha ``(base)``."""
+    n_rows, n_feat = contrib.shape
+    keys = keys.reset_index(drop=True)
+    long = keys.iloc[np.repeat(np.arange(n_rows), n_feat + 1)].reset_index(drop=True)
+    long["feature"] = np.tile([BASE_LABEL, *features], n_rows)
+    long["valor_feature"] = np.column_stack([np.full(n_rows, np.nan), X]).ravel()
+    long["contribuicao"] = np.column_stack([np.full(n_rows, base), contrib]).ravel()
+    return long
+
+
+def explain_rows(pipeline, frame: pd.DataFrame, features: Sequence[str]) -> pd.DataFrame:
+    """Contribuições de cada linha de ``frame`` (chaves ``cod_mun``/``municipio``/``ano``)."""
+    X = frame[list(features)].to_numpy(dtype=float)
+    base, contrib = contributions(CompactModel(pipeline, features), X)
+    keys = frame[[col for col in SCENARIO_KEYS if col in frame.columns]]
+    return contributions_long(keys, features, X, base, contrib)
+
+
+def explain_scenarios(
+    pipeline, base_df: pd.DataFrame, features: Sequence[str], steps: Dict[str, Sequence[float]]
+) -> pd.DataFrame:
+    """Contribuições das linhas perturbadas (mesma grade e regra de ``scenario_engine``)."""
+    features = list(features)
+    names, deltas = scenario_grid(steps, features)
+    if not names:
+        raise ValueError("Nenhuma feature da grade de cenários está no modelo.")
+    columns = np.array([features.index(name) for name in names])
+    bounded = np.array([name.startswith(BOUNDED_PREFIXES) for name in names])
+    stacked = stack_scenarios(base_df[features].to_numpy(dtype=float), columns, deltas, bounded)[1:]
+
+    X = stacked.reshape(-1, len(features))
+    base, contrib = contributions(CompactModel(pipeline, features), X)
+    n_rows = len(base_df)
+    keys = base_df[[col for col in SCENARIO_KEYS if col in base_df.columns]].reset_index(drop=True)
+    keys = keys.iloc[np.tile(np.arange(n_rows), len(deltas))].reset_index(drop=True)
+    keys["feature_cenario"] = np.repeat(names, n_rows)
+    keys["delta_aplicado"] = np.repeat(deltas, n_rows)
+    return contributions_long(keys, features, X, base, contrib)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD, help="Parquet do Gold anual")
+    parser.add_argument("--snis", type=Path, default=DEFAULT_SNIS_V2, help="SNIS v2 usado para completar indicadores de serviço")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Cache do analysis_df (Parquet)")
+    parser.add_argument("--modelo", type=Path, default=DEFAULT_MODEL_PATH, help="Pipeline salvo por train_models.py")
+    parser.add_argument(
+        "--anos", default=None, help="Anos explicados (ex.: 2025 ou 2018-2025; padrão: todos; cenários: último ano)"
+    )
+    parser.add_argument(
+        "--cenarios",
+        default=None,
+        help="Também explica as linhas perturbadas desta grade (sintaxe de scenario_engine; 'padrao' = passos do notebook)",
+    )
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_EXPORT_DIR, help="Diretório dos CSVs do dashboard")
+    parser.add_argument("--forcar", action="store_true", help="Regrava os CSVs mesmo sem mudança de conteúdo")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.modelo.exists():
+        raise SystemExit(f"Modelo não encontrado em {args.modelo}; rode scripts/train_models.py antes.")
+    bundle = joblib.load(args.modelo)
+    pipeline, features = bundle["pipeline"], bundle["features"]
+
+    analysis_df = load_analysis_df(args.gold, args.snis, args.municipios, cache_dir=args.cache_dir)
+    anos = parse_anos(args.anos)
+    frame = analysis_df[analysis_df["ano"].isin(anos)] if anos else analysis_df
+    if frame.empty:
+        raise SystemExit(f"Sem linhas no analysis_df para os anos {anos}")
+
+    extracts: Dict[str, pd.DataFrame] = {}
+    try:
+        extracts["modelagem_contribuicoes"] = explain_rows(pipeline, frame, features)
+        if args.cenarios:
+            steps = parse_steps(None if args.cenarios == "padrao" else args.cenarios)
+            # mesma base de scenario_engine: anos pedidos ou, sem --anos, o último ano
+            scenario_base = frame if anos else frame[frame["ano"] == frame["ano"].max()]
+            extracts["modelagem_contribuicoes_cenarios"] = explain_scenarios(pipeline, scenario_base, features, steps)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
+    top = extracts["modelagem_contribuicoes"]
+    top = top[top["feature"] != BASE_LABEL]
+    top = top.assign(abs_contrib=top["contribuicao"].abs()).groupby("feature")["abs_contrib"].mean()
+    print("Contribuição absoluta média por feature:")
+    print(top.sort_values(ascending=False).head(10).to_string())
+
+    written = write_extracts(extracts, args.out_dir, args.forcar)
+    for name, df in extracts.items():
+        status = "atualizado" if name in written else "sem mudança"
+        print(f"[OK] {name}.csv ({len(df)} linhas, {status}) → {args.out_dir / (name + '.csv')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Modelo compacto e intervalos de previsão por árvore da Random Forest.
+
+A floresta do pipeline salvo é achatada em arrays únicos (feature, limiar, filhos,
+valor). A previsão de **cada árvore** para todas as linhas sai de uma única
+passada numpy, nível por nível de profundidade. A partir dessa matriz
+linhas × árvores calculamos:
+
+- quantis da previsão (``taxa_p05``, ``taxa_p95`` por padrão);
+- ``prob_critico``: fração das árvores cuja taxa prevista ultrapassa o limiar
+  Crítico da linha (ver ``analysis_features.critical_rate_threshold``).
+
+Modelos que não são florestas (Regressão Linear, Lasso) não têm previsões por
+árvore. Para eles, as colunas de intervalo saem vazias (``NaN``).
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILES = (0.05, 0.95)
+# linhas por passada na floresta (limita a matriz linhas × árvores em memória)
+CHUNK_ROWS = 4096
+# a partir deste lote, as folhas vêm do ``tree_.apply`` compilado de cada árvore;
+# abaixo, o percurso em numpy sai mais barato que uma chamada por árvore
+APPLY_MIN_ROWS = 64
+
+
+class FlatForest:
+    """Árvores de uma floresta sklearn concatenadas em arrays únicos.
+
+    Percorre todas as árvores de todas as linhas ao mesmo tempo (um passo numpy por
+    nível de profundidade). Reproduz o ``predict`` do sklearn, que compara as
+    features em ``float32``. Em lotes grandes, a folha de cada árvore vem do
+    ``tree_.apply`` compilado do sklearn e os valores saem dos mesmos arrays.
+    """
+
+    def __init__(self, estimators: Sequence[object]) -> None:
+        self.trees = [estimator.tree_ for estimator in estimators]
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            leaf = tree.children_left < 0
+            features.append(np.where(leaf, -1, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(leaf, 0, tree.children_left) + offset)
+            rights.append(np.where(leaf, 0, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+            depth = max(depth, tree.max_depth)
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.depth = depth
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Matriz linhas × árvores com o índice (nos arrays achatados) da folha alcançada."""
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) >= APPLY_MIN_ROWS:
+            X = np.ascontiguousarray(X)
+            return np.column_stack([tree.apply(X) for tree in self.trees]) + self.roots
+        X = X.astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            feature = self.feature[node]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, np.maximum(feature, 0)] <= self.threshold[node]
+            node = np.where(internal, np.where(go_left, self.left[node], self.right[node]), node)
+        return node
+
+    def predict_trees(self, X: np.ndarray) -> np.ndarray:
+        """Matriz linhas × árvores com a previsão de cada árvore."""
+        return self.value[self.apply(X)]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.predict_trees(X).mean(axis=1)
+
+
+class CompactModel:
+    """Pipeline ``preprocess`` (mediana + escala) + modelo reduzido a arrays numpy."""
+
+    def __init__(self, pipeline, features: Sequence[str]) -> None:
+        self.pipeline = pipeline
+        self.features = list(features)
+        self.kind = "pipeline"
+        try:
+            numeric = pipeline.named_steps["preprocess"].named_transformers_["num"]
+            imputer, scaler = numeric.named_steps["imputer"], numeric.named_steps["scaler"]
+            self.fill = np.asarray(imputer.statistics_, dtype=float)
+            self.mean = np.asarray(scaler.mean_, dtype=float) if scaler.with_mean else np.zeros(len(self.features))
+            self.scale = np.asarray(scaler.scale_, dtype=float) if scaler.with_std else np.ones(len(self.features))
+        except (AttributeError, KeyError):
+            return
+        model = pipeline.named_steps["model"]
+        if hasattr(model, "estimators_") and all(hasattr(est, "tree_") for est in model.estimators_):
+            self.forest = FlatForest(model.estimators_)
+            self.kind = "floresta"
+        elif hasattr(model, "coef_"):
+            self.coef = np.ravel(model.coef_).astype(float)
+            self.intercept = float(np.ravel(model.intercept_)[0]) if np.ndim(model.intercept_) else float(model.intercept_)
+            self.kind = "linear"
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.where(np.isnan(X), self.fill, X)
+        return (X - self.mean) / self.scale
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if self.kind == "floresta":
+            return self.forest.predict(self.transform(X))
+        if self.kind == "linear":
+            return self.transform(X) @ self.coef + self.intercept
+        return np.asarray(self.pipeline.predict(pd.DataFrame(X, columns=self.features)), dtype=float)
+
+    def predict_trees(self, X: np.ndarray) -> Optional[np.ndarray]:
+        """Previsões por árvore (linhas × árvores) ou ``None`` se o modelo não é uma floresta."""
+        if self.kind != "floresta":
+            return None
+        return self.forest.predict_trees(self.transform(np.atleast_2d(np.asarray(X, dtype=float))))
+
+
+def quantile_columns(quantiles: Sequence[float], prefix: str = "taxa") -> List[str]:
+    """``0.05`` → ``taxa_p05``; ``0.025`` → ``taxa_p2_5``."""
+    names = []
+    for q in quantiles:
+        label = f"{q * 100:g}"
+        names.append(f"{prefix}_p{label.zfill(2) if '.' not in label else label.replace('.', '_')}")
+    return names
+
+
+def forest_intervals(
+    model: CompactModel,
+    X: np.ndarray,
+    thresholds: Optional[np.ndarray] = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    prefix: str = "taxa",
+    prob_col: str = "prob_critico",
+    mean_col: Optional[str] = None,
+) -> pd.DataFrame:
+    """Quantis das previsões por árvore e probabilidade de passar do limiar Crítico.
+
+    ``thresholds`` tem um limiar por linha (``NaN`` = sem limiar). As linhas são
+    processadas em blocos de ``CHUNK_ROWS``. Com ``mean_col``, a média das árvores
+    (a previsão pontual da floresta) sai da mesma passada, nessa coluna.
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    columns = [*quantile_columns(quantiles, prefix), prob_col] + ([mean_col] if mean_col else [])
+    out = np.full((len(X), len(columns)), np.nan)
+    n_q = len(quantiles)
+    limits = np.full(len(X), np.nan) if thresholds is None else np.asarray(thresholds, dtype=float)
+    if model.kind == "floresta":
+        for start in range(0, len(X), CHUNK_ROWS):
+            block = slice(start, start + CHUNK_ROWS)
+            per_tree = model.predict_trees(X[block])
+            out[block, :n_q] = np.quantile(per_tree, quantiles, axis=1).T
+            crossed = (per_tree > limits[block, None]).mean(axis=1)
+            out[block, n_q] = np.where(np.isnan(limits[block]), np.nan, crossed)
+            if mean_col:
+                out[block, n_q + 1] = per_tree.mean(axis=1)
+    return pd.DataFrame(out, columns=columns)
+
+
+def parse_quantiles(text: Optional[str]) -> Tuple[float, ...]:
+    if not text:
+        return DEFAULT_QUANTILES
+    try:
+        values = tuple(float(item) for item in text.split(",") if item.strip())
+    except ValueError:
+        raise SystemExit(f"Quantis inválidos: {text!r} (use ex.: 0.05,0.95)")
+    if not values or any(not 0 < q < 1 for q in values):
+        raise SystemExit(f"Quantis devem estar entre 0 e 1: {text!r}")
+    return tuple(sorted(values))
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""Gold em várias granularidades (mês, trimestre, ano e temporada chuvosa/seca) a partir de uma passada por fonte.
+
+Cada fonte Silver com resolução sub-anual (SIH e SISAGUA mensais, INMET horário)
+é lida uma única vez e reduzida a agregados parciais por mês, guardando apenas
+medidas decomponíveis (somas, contagens, máximos e mínimos). Trimestre, ano e
+temporada são obtidos reagrupando esses parciais, sem reler o Silver; médias e
+percentuais só são calculados no final de cada granularidade.
+
+A temporada chuvosa da Amazônia oriental vai de dezembro a maio: dezembro conta
+para a temporada do ano seguinte (chuvosa 2021 = dez/2020 a mai/2021). A chave
+é ``temporada`` (e não "estação") para não colidir com as estações do INMET.
+Com ``--anos``, o ano anterior ao primeiro também é lido, para que a primeira
+temporada chuvosa tenha o seu dezembro. Toda granularidade traz ``n_meses``
+(meses com dado no período); temporadas com menos de 6 meses (o começo e o fim
+da série) ficam de fora, pois somariam apenas parte da temporada.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from ibge_keys import PANDAS_KEY_TYPES, hive_partitioning
+from silver_to_gold_features import (
+    CLIMA_COLUMNS,
+    DEFAULT_MUNICIPIOS,
+    INMET_PARTITIONING,
+    SIH_SUM_COLS,
+    SISAGUA_SUM_COLS,
+    STATION_TO_MUNICIPALITIES,
+    Municipio,
+    add_derived_columns,
+    load_municipios,
+    load_populacao,
+    nan_to_null,
+    parse_anos,
+    read_source,
+    restrict_mapping,
+    sisagua_wide,
+    source_filter,
+)
+
+DEFAULT_OUT_DIR = Path("data/gold/rollups")
+
+RAINY_MONTHS = {12, 1, 2, 3, 4, 5}
+# meses de uma temporada completa (chuvosa: dez–mai; seca: jun–nov)
+SEASON_MONTHS = 6
+
+# Granularidade → colunas que identificam o período
+GRANULARIDADES: Dict[str, List[str]] = {
+    "mes": ["ano", "mes"],
+    "trimestre": ["ano", "trimestre"],
+    "ano": ["ano"],
+    "temporada": ["ano_temporada", "temporada"],
+}
+
+# Medidas parciais do INMET e como se combinam entre períodos
+INMET_PARTIALS = {
+    "chuva_sum": "sum",
+    "chuva_n": "sum",
+    "temp_sum": "sum",
+    "temp_n": "sum",
+    "temp_max": "max",
+    "temp_min": "min",
+    "umid_sum": "sum",
+    "umid_n": "sum",
+    "vento_sum": "sum",
+    "vento_n": "sum",
+    "dias_calor_extremo": "sum",
+}
+
+
+# --- parciais mensais (uma leitura por fonte) ---
+def sih_partials(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    table = read_source(
+        "data/silver/sih", ["cod_mun", "ano", "mes", *SIH_SUM_COLS], mapping, anos, hive_partitioning("ano", "mes")
+    )
+    agg = table.group_by(["cod_mun", "ano", "mes"]).aggregate([(col, "sum") for col in SIH_SUM_COLS])
+    return agg.rename_columns([name.removesuffix("_sum") for name in agg.column_names]).to_pandas()
+
+
+def sisagua_partials(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    """Por (município, ano, mês, parâmetro): somas das amostras e soma/contagem do percentil 95."""
+    table = read_source(
+        "data/silver/sisagua",
+        ["cod_mun", "ano", "mes", "parametro", *SISAGUA_SUM_COLS, "percentil_95"],
+        mapping,
+        anos,
+        hive_partitioning("ano", "mes"),
+    )
+    for col in SISAGUA_SUM_COLS:
+        table = table.set_column(table.schema.get_field_index(col), col, pc.fill_null(nan_to_null(table[col]), 0.0))
+    table = table.set_column(table.schema.get_field_index("percentil_95"), "percentil_95", nan_to_null(table["percentil_95"]))
+    agg = table.group_by(["cod_mun", "ano", "mes", "parametro"]).aggregate(
+        [(col, "sum") for col in SISAGUA_SUM_COLS] + [("percentil_95", "sum"), ("percentil_95", "count")]
+    )
+    names = {"percentil_95_sum": "p95_sum", "percentil_95_count": "p95_n"}
+    return agg.rename_columns([names.get(name, name.removesuffix("_sum")) for name in agg.column_names]).to_pandas()
+
+
+def inmet_partials(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    """Por (estação, ano, mês): somas/contagens das médias, extremos e dias com máxima ≥ 32 ºC."""
+    dataset = ds.dataset("data/silver/inmet", format="parquet", partitioning=INMET_PARTITIONING)
+    estacoes = sorted(
+        station for station, codes in STATION_TO_MUNICIPALITIES.items() if any(code in mapping for code in codes)
+    )
+    expr = ds.field("estacao").isin(estacoes)
+    year_filter = source_filter(dataset, mapping, anos, cod_col=None)
+    if year_filter is not None:
+        expr = expr & year_filter
+    columns = ["estacao", "ano", "timestamp_utc", "chuva_mm", "temp_c", "umid_rel_pct", "vento_vel_ms"]
+    table = dataset.to_table(columns=columns, filter=expr)
+    table = table.filter(pc.and_(pc.is_valid(table["estacao"]), pc.is_valid(table["ano"])))
+
+    data = table["timestamp_utc"].cast(pa.timestamp("s")).cast(pa.date32())
+    table = pa.table(
+        {
+            "estacao": table["estacao"].cast(pa.string()),
+            "ano": table["ano"],
+            "mes": pc.month(data).cast(pa.int8()),
+            "data": data,
+            "chuva": pc.fill_null(nan_to_null(table["chuva_mm"]), 0.0),
+            "temp": nan_to_null(table["temp_c"]),
+            "umid": nan_to_null(table["umid_rel_pct"]),
+            "vento": nan_to_null(table["vento_vel_ms"]),
+        }
+    )
+
+    keys = ["estacao", "ano", "mes"]
+    monthly = table.group_by(keys).aggregate(
+        [
+            ("chuva", "sum"),
+            ("chuva", "count"),
+            ("temp", "sum"),
+            ("temp", "count"),
+            ("temp", "max"),
+            ("temp", "min"),
+            ("umid", "sum"),
+            ("umid", "count"),
+            ("vento", "sum"),
+            ("vento", "count"),
+        ]
+    )
+    monthly = monthly.rename_columns([name.replace("_count", "_n") for name in monthly.column_names]).to_pandas()
+
+    daily_max = table.group_by([*keys, "data"]).aggregate([("temp", "max")])
+    hot = daily_max.filter(pc.greater_equal(daily_max["temp_max"], 32))
+    heat = hot.group_by(keys).aggregate([("data", "count")]).to_pandas()
+    heat = heat.rename(columns={"data_count": "dias_calor_extremo"})
+    monthly = monthly.merge(heat, on=keys, how="left")
+    monthly["dias_calor_extremo"] = monthly["dias_calor_extremo"].fillna(0).astype(int)
+    return monthly
+
+
+def stations_to_municipios(mapping: Dict[int, Municipio]) -> pd.DataFrame:
+    pairs = [
+        (station, mapping[code].code)
+        for station, codes in STATION_TO_MUNICIPALITIES.items()
+        for code in codes
+        if code in mapping
+    ]
+    return pd.DataFrame(pairs, columns=["estacao", "cod_mun"]).astype({"cod_mun": PANDAS_KEY_TYPES["cod_mun"]})
+
+
+# --- rollups ---
+def add_period_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Chaves de todas as granularidades a partir de (ano, mes)."""
+    df = df.astype({"ano": PANDAS_KEY_TYPES["ano"], "mes": PANDAS_KEY_TYPES["mes"]})
+    mes = df["mes"]
+    df["trimestre"] = ((mes - 1) // 3 + 1).astype(PANDAS_KEY_TYPES["mes"])
+    chuvosa = mes.isin(RAINY_MONTHS)
+    df["temporada"] = np.where(chuvosa, "chuvosa", "seca")
+    df["ano_temporada"] = (df["ano"] + ((mes == 12) & chuvosa)).astype(PANDAS_KEY_TYPES["ano"])
+    return df
+
+
+def rollup(df: pd.DataFrame, keys: Sequence[str], how: Dict[str, str]) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns=[*keys, *how])
+    return df.groupby(list(keys), as_index=False).agg(how)
+
+
+def finalize_sisagua(partials: pd.DataFrame, period: List[str]) -> pd.DataFrame:
+    keys = ["cod_mun", *period]
+    how = {**{col: "sum" for col in SISAGUA_SUM_COLS}, "p95_sum": "sum", "p95_n": "sum"}
+    grouped = rollup(partials, [*keys, "parametro"], how)
+    grouped["percentil_95"] = grouped["p95_sum"] / grouped["p95_n"].where(grouped["p95_n"] > 0)
+    grouped = grouped.drop(columns=["p95_sum", "p95_n"]).sort_values([*keys, "parametro"]).reset_index(drop=True)
+    return sisagua_wide(grouped, keys)
+
+
+def finalize_inmet(partials: pd.DataFrame, period: List[str], mapping: Dict[int, Municipio]) -> pd.DataFrame:
+    station = rollup(partials, ["estacao", *period], INMET_PARTIALS)
+
+    def ratio(num: str, den: str) -> pd.Series:
+        return station[num] / station[den].where(station[den] > 0)
+
+    out = pd.DataFrame({"estacao": station["estacao"]})
+    for col in period:
+        out[col] = station[col]
+    out["chuva_total_mm"] = station["chuva_sum"]
+    out["chuva_media_mm"] = ratio("chuva_sum", "chuva_n")
+    out["temp_media_c"] = ratio("temp_sum", "temp_n")
+    out["temp_max_c"] = station["temp_max"]
+    out["temp_min_c"] = station["temp_min"]
+    out["umid_rel_media_pct"] = ratio("umid_sum", "umid_n")
+    out["vento_vel_media_ms"] = ratio("vento_sum", "vento_n")
+    out["dias_calor_extremo"] = station["dias_calor_extremo"].astype(int)
+    out = out.merge(stations_to_municipios(mapping), on="estacao", how="inner").drop(columns="estacao")
+    return out[["cod_mun", *period, *CLIMA_COLUMNS]]
+
+
+def months_covered(frames: Sequence[pd.DataFrame], keys: Sequence[str]) -> pd.DataFrame:
+    """``n_meses``: meses distintos com dado de alguma fonte em cada (município, período)."""
+    columns = list(dict.fromkeys(["cod_mun", "ano", "mes", *keys]))
+    months = pd.concat([frame[columns] for frame in frames], ignore_index=True)
+    months = months.drop_duplicates(["cod_mun", "ano", "mes"])
+    return months.groupby(list(keys), as_index=False).size().rename(columns={"size": "n_meses"})
+
+
+def population_for(populacao: pd.DataFrame, granularidade: str) -> pd.DataFrame:
+    """População anual; na temporada usa o ano da temporada (o da maior parte dos meses)."""
+    if granularidade == "temporada":
+        return populacao.rename(columns={"ano": "ano_temporada"})
+    return populacao
+
+
+def build_rollups(
+    granularidades: Sequence[str],
+    anos: Optional[Sequence[int]] = None,
+    municipios: Optional[Sequence[str]] = None,
+    municipios_path: Path = DEFAULT_MUNICIPIOS,
+) -> Dict[str, pd.DataFrame]:
+    mapping = restrict_mapping(load_municipios(municipios_path), municipios)
+    # a temporada chuvosa do primeiro ano começa no dezembro do ano anterior
+    source_anos = anos
+    if anos and "temporada" in granularidades:
+        source_anos = sorted({*anos, min(anos) - 1})
+
+    # Uma leitura por fonte: parciais mensais com todas as chaves de período
+    sih_all = add_period_columns(sih_partials(mapping, source_anos))
+    sisagua_all = add_period_columns(sisagua_partials(mapping, source_anos))
+    inmet_all = add_period_columns(inmet_partials(mapping, source_anos))
+    populacao = load_populacao(mapping, anos)
+    inmet_mun = inmet_all.merge(stations_to_municipios(mapping), on="estacao", how="inner")
+
+    names = {code.code: code.name for code in mapping.values()}
+    tables: Dict[str, pd.DataFrame] = {}
+    for granularidade in granularidades:
+        period = GRANULARIDADES[granularidade]
+        keys = ["cod_mun", *period]
+        # recorte de anos pelo ano do período (na temporada, o ano da temporada)
+        sih, sisagua, inmet, inmet_m = sih_all, sisagua_all, inmet_all, inmet_mun
+        if anos:
+            sih, sisagua, inmet, inmet_m = (
+                frame[frame[period[0]].isin(anos)] for frame in (sih_all, sisagua_all, inmet_all, inmet_mun)
+            )
+        sih_g = rollup(sih, keys, {col: "sum" for col in SIH_SUM_COLS})
+        sisagua_g = finalize_sisagua(sisagua, period)
+        clima_g = finalize_inmet(inmet, period, mapping)
+
+        base = pd.concat([sih_g[keys], sisagua_g[keys], clima_g[keys]], ignore_index=True).drop_duplicates()
+        base = base.sort_values(keys).reset_index(drop=True)
+        base.insert(1, "municipio", base["cod_mun"].map(names))
+        base = base.merge(months_covered([sih, sisagua, inmet_m], keys), on=keys, how="left")
+        base["n_meses"] = base["n_meses"].fillna(0).astype(int)
+        if granularidade == "temporada":
+            partial = base["n_meses"] < SEASON_MONTHS
+            if partial.any():
+                print(f"[WARN] {int(partial.sum())} temporadas incompletas (< {SEASON_MONTHS} meses) descartadas")
+            base = base[~partial].reset_index(drop=True)
+        pop_keys = ["cod_mun", "ano_temporada" if granularidade == "temporada" else "ano"]
+        data = (
+            base
+            .merge(population_for(populacao, granularidade), on=pop_keys, how="left")
+            .merge(sisagua_g, on=keys, how="left")
+            .merge(clima_g, on=keys, how="left")
+            .merge(sih_g, on=keys, how="left")
+        )
+        tables[granularidade] = add_derived_columns(data)
+    return tables
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Lista de municípios alvo")
+    parser.add_argument(
+        "--granularidades",
+        default=",".join(GRANULARIDADES),
+        help=f"Granularidades separadas por vírgula ({', '.join(GRANULARIDADES)})",
+    )
+    parser.add_argument("--anos", help="Anos a incluir, ex.: 2018-2022 (padrão: todos)")
+    parser.add_argument("--cod-mun", help="Códigos IBGE separados por vírgula (padrão: todos do registro)")
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_OUT_DIR, help="Diretório dos Parquet por granularidade")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    granularidades = [item.strip() for item in args.granularidades.split(",") if item.strip()]
+    invalid = sorted(set(granularidades) - set(GRANULARIDADES))
+    if invalid:
+        raise SystemExit(f"Granularidades inválidas: {invalid} (use {', '.join(GRANULARIDADES)})")
+    municipios = [code.strip() for code in args.cod_mun.split(",")] if args.cod_mun else None
+
+    tables = build_rollups(granularidades, parse_anos(args.anos), municipios, args.municipios)
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for granularidade, table in tables.items():
+        path = args.out_dir / f"gold_{granularidade}.parquet"
+        table.to_parquet(path, index=False, compression="snappy")
+        print(f"[OK] Gold ({granularidade}): {len(table)} linhas → {path}")
+
+
+if __name__ == "__main__":
+    main()
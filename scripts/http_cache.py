@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Cache HTTP em disco (gravação/replay) compartilhado pelos coletores SIOPS, SIDRA e CKAN.
+
+Cada resposta é indexada por método + URL + parâmetros e guardada com o corpo
+comprimido (gzip). Entradas vencidas são revalidadas com ETag/Last-Modified
+quando o servidor oferece esses cabeçalhos; o TTL é definido por chamada
+(``ttl=None`` = nunca expira, usado para exercícios já fechados). No modo
+``offline`` nenhuma requisição sai da máquina: o que não estiver no cache gera
+:class:`CacheMiss`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional
+
+import requests
+
+DEFAULT_CACHE_DIR = Path("data/cache/http")
+CACHE_MODES = ("online", "refresh", "offline")
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Cabeçalhos preservados junto com o corpo
+KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class CacheMiss(RuntimeError):
+    """Requisição ausente do cache no modo offline."""
+
+
+def ano_fechado(ano: int, hoje: Optional[date] = None) -> bool:
+    """Exercícios anteriores ao ano passado não recebem mais retificações."""
+    hoje = hoje or date.today()
+    return int(ano) < hoje.year - 1
+
+
+def ttl_for_year(ano: int, open_ttl: Optional[float] = DAY) -> Optional[float]:
+    """TTL de uma consulta referente a ``ano``: ``None`` (eterno) se o ano já fechou."""
+    return None if ano_fechado(ano) else open_ttl
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    url: str
+    content: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    from_cache: bool = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} para {self.url}")
+
+
+class HttpCache:
+    def __init__(
+        self,
+        cache_dir: Path | str = DEFAULT_CACHE_DIR,
+        mode: str = "online",
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Modo de cache inválido: {mode} (use {', '.join(CACHE_MODES)})")
+        self.cache_dir = Path(cache_dir)
+        self.mode = mode
+        self.session = session or requests.Session()
+
+    # --- chaves e armazenamento ---
+    @staticmethod
+    def key(method: str, url: str, params: Optional[Mapping[str, object]] = None) -> str:
+        items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = json.dumps([method.upper(), url, items], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.json", folder / f"{key}.body.gz"
+
+    def _load(self, key: str) -> Optional[dict]:
+        meta_path, body_path = self._paths(key)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        meta["body_path"] = body_path
+        return meta
+
+    def _store(self, key: str, url: str, params, response: requests.Response) -> None:
+        meta_path, body_path = self._paths(key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        meta = {
+            "url": url,
+            "params": {str(k): str(v) for k, v in (params or {}).items()},
+            "status_code": response.status_code,
+            "headers": headers,
+            "stored_at": time.time(),
+        }
+        # corpo antes dos metadados: uma entrada só é válida quando ambos existem
+        tmp_body = body_path.with_name("." + body_path.name + ".tmp")
+        with gzip.open(tmp_body, "wb", compresslevel=6) as fh:
+            fh.write(response.content)
+        os.replace(tmp_body, body_path)
+        self._write_meta(meta_path, meta)
+
+    @staticmethod
+    def _write_meta(meta_path: Path, meta: dict) -> None:
+        tmp_meta = meta_path.with_name("." + meta_path.name + ".tmp")
+        tmp_meta.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_meta, meta_path)
+
+    def _from_entry(self, meta: dict) -> CachedResponse:
+        with gzip.open(meta["body_path"], "rb") as fh:
+            content = fh.read()
+        return CachedResponse(
+            status_code=int(meta["status_code"]),
+            url=meta["url"],
+            content=content,
+            headers=dict(meta.get("headers", {})),
+            from_cache=True,
+        )
+
+    def invalidate(self, url: str, params: Optional[Mapping[str, object]] = None, method: str = "GET") -> None:
+        for path in self._paths(self.key(method, url, params)):
+            path.unlink(missing_ok=True)
+
+    # --- consulta ---
+    @staticmethod
+    def _fresh(meta: dict, ttl: Optional[float]) -> bool:
+        if ttl is None:
+            return True
+        return time.time() - float(meta.get("stored_at", 0)) < ttl
+
+    @staticmethod
+    def _validators(meta: dict) -> Dict[str, str]:
+        headers = meta.get("headers", {})
+        conditional: Dict[str, str] = {}
+        if "etag" in headers:
+            conditional["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            conditional["If-Modified-Since"] = headers["last-modified"]
+        return conditional
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Mapping[str, object]] = None,
+        ttl: Optional[float] = DAY,
+        timeout: float = 60,
+        cache_status: Iterable[int] = (200,),
+    ) -> CachedResponse:
+        """GET com cache. ``ttl`` em segundos (``None`` = nunca expira)."""
+        key = self.key("GET", url, params)
+        meta = self._load(key)
+
+        if self.mode == "offline":
+            if meta is None:
+                raise CacheMiss(f"Sem resposta em cache para GET {url} {dict(params or {})}")
+            return self._from_entry(meta)
+
+        if meta is not None and self.mode == "online" and self._fresh(meta, ttl):
+            return self._from_entry(meta)
+
+        headers = self._validators(meta) if meta is not None else {}
+        response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and meta is not None:
+            meta_path, _ = self._paths(key)
+            meta["stored_at"] = time.time()
+            self._write_meta(meta_path, {k: v for k, v in meta.items() if k != "body_path"})
+            return self._from_entry(meta)
+
+        if response.status_code in set(cache_status):
+            self._store(key, url, params, response)
+
+        return CachedResponse(
+            status_code=response.status_code,
+            url=response.url or url,
+            content=response.content,
+            headers={name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+        )
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Diretório do cache HTTP")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--offline", action="store_true", help="Usa apenas respostas já gravadas no cache")
+    group.add_argument("--refresh", action="store_true", help="Ignora o TTL e revalida todas as respostas")
+
+
+def cache_from_args(args: argparse.Namespace) -> HttpCache:
+    mode = "offline" if args.offline else "refresh" if args.refresh else "online"
+    return HttpCache(args.cache_dir, mode=mode)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Contrato de chaves das tabelas Silver e Gold.
+
+``cod_mun`` é sempre o código IBGE de 7 dígitos em ``int32``; ``ano`` é ``int16``
+e ``mes`` é ``int8``. Os escritores aplicam o contrato na saída
+(:func:`enforce_keys`) e os leitores declaram os mesmos tipos para as chaves de
+partição Hive (:func:`hive_partitioning`). Assim as junções comparam inteiros
+pequenos e nenhuma camada precisa renormalizar códigos de 6/7 dígitos.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+KEY_TYPES: Dict[str, pa.DataType] = {
+    "cod_mun": pa.int32(),
+    "ano": pa.int16(),
+    "mes": pa.int8(),
+}
+PANDAS_KEY_TYPES: Dict[str, str] = {"cod_mun": "int32", "ano": "int16", "mes": "int8"}
+
+
+def ibge_check_digit(codes6: pd.Series) -> pd.Series:
+    """Dígito verificador IBGE (pesos 1,2,1,2,1,2; soma dos algarismos; complemento a 10).
+
+    Alguns poucos municípios têm DV fora da regra; o registro de municípios, quando
+    os contém, tem precedência sobre este cálculo.
+    """
+    digits = np.array([[int(ch) for ch in code] for code in codes6], dtype=np.int64).reshape(-1, 6)
+    products = digits * np.array([1, 2, 1, 2, 1, 2])
+    total = (products // 10 + products % 10).sum(axis=1)
+    return pd.Series(((10 - total % 10) % 10).astype(str), index=codes6.index)
+
+
+def to_ibge7(values: pd.Series | pa.Array | pa.ChunkedArray | Iterable) -> pa.Array:
+    """Códigos de 6 ou 7 dígitos (texto ou inteiro, com ou sem máscara) → ``int32`` IBGE-7.
+
+    Resolve cada valor distinto uma vez; códigos de 6 dígitos ganham o DV
+    calculado, valores com mais de 7 dígitos são truncados e o resto vira nulo.
+    """
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = values.to_pandas()
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    digits = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.replace(r"\.0$", "", regex=True)
+    digits = digits.str.replace(r"\D", "", regex=True)
+
+    resolved = digits.str[:7].where(digits.str.len() >= 7)
+    six = digits[digits.str.len() == 6]
+    if not six.empty:
+        resolved[six.index] = six + ibge_check_digit(six)
+    lookup = pd.to_numeric(resolved, errors="coerce").to_numpy(dtype=float)
+    lookup = np.append(lookup, np.nan)  # posição do sentinela de ausentes
+
+    out = lookup[np.where(codes >= 0, codes, len(lookup) - 1)]
+    valid = ~np.isnan(out)
+    return pa.array(np.where(valid, out, 0).astype(np.int32), pa.int32(), mask=~valid)
+
+
+def key_field(name: str) -> pa.Field:
+    return pa.field(name, KEY_TYPES[name])
+
+
+def enforce_keys(table: pa.Table) -> pa.Table:
+    """Converte as colunas-chave presentes em ``table`` para os tipos do contrato."""
+    changed = False
+    for name, dtype in KEY_TYPES.items():
+        if name not in table.column_names:
+            continue
+        idx = table.schema.get_field_index(name)
+        column = table[name]
+        if column.type == dtype:
+            continue
+        if name == "cod_mun":
+            column = to_ibge7(column)
+        else:
+            column = pc.cast(column, dtype)
+        table = table.set_column(idx, key_field(name), column)
+        changed = True
+    # metadados pandas antigos descreveriam as chaves com os tipos anteriores
+    return table.replace_schema_metadata(None) if changed else table
+
+
+def enforce_key_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Versão pandas de :func:`enforce_keys` (colunas sem nulos)."""
+    df = df.copy()
+    for name, dtype in PANDAS_KEY_TYPES.items():
+        if name not in df.columns:
+            continue
+        if name == "cod_mun" and df[name].dtype != dtype:
+            df[name] = to_ibge7(df[name]).to_numpy(zero_copy_only=False)
+        df[name] = df[name].astype(dtype)
+    return df
+
+
+def hive_partitioning(*names: str) -> ds.Partitioning:
+    """Partição Hive com os tipos do contrato (ex.: ``hive_partitioning("ano", "mes")``)."""
+    return ds.partitioning(pa.schema([key_field(name) for name in names]), flavor="hive")
@@ -9,6 +9,17 @@ import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+from br_numeric import DEFAULT_SENTINELS, parse_br_numbers
+from ibge_keys import enforce_keys
+
+# Colunas numéricas padronizadas; -9999 é o marcador de ausência das estações
+NUMERIC_COLS = [
+    "chuva_mm", "temp_c", "umid_rel_pct",
+    "vento_vel_ms", "vento_dir_graus", "vento_rajada_ms",
+    "pressao_atm_mb", "radiacao_global_kj_m2",
+]
+INMET_SENTINELS = DEFAULT_SENTINELS | {"-9999", "-9999.0", "-9999,0"}
+
 
 def slugify(text: str) -> str:
     """Cria um slug de um texto, removendo caracteres especiais e normalizando."""
@@ -67,21 +78,25 @@ def get_column_mapping(header_row: pd.Series) -> dict[str, str]:
 def process_inmet_csv(file_path: Path, station_code: str) -> pd.DataFrame | None:
     """Lê, limpa e padroniza um único arquivo CSV do INMET."""
     try:
-        # Lê os dados, tratando valores nulos e diferentes formatos
+        # Lê tudo como texto; a conversão numérica fica a cargo de parse_br_numbers
         df = pd.read_csv(
             file_path,
             sep=";",
             encoding="latin1",
             skiprows=8,
             header=0, # A primeira linha após pular 8 é o cabeçalho
-            decimal=",",
-            na_values=["-9999", "-9999.0", ""],
-            keep_default_na=True,
+            dtype=str,
+            keep_default_na=False,
         )
 
         # Renomeia as colunas usando o mapeamento robusto
         df = df.rename(columns=get_column_mapping(df.columns))
 
+        # Converte as medições (vírgula decimal, sentinelas -9999 e células vazias → NaN)
+        for col in NUMERIC_COLS:
+            if col in df.columns:
+                df[col], _ = parse_br_numbers(df[col], sentinels=INMET_SENTINELS)
+
         # Remove colunas totalmente vazias que podem surgir do parsing
         df = df.loc[:, ~df.columns.str.contains('^unnamed')]
 
@@ -103,12 +118,7 @@ def process_inmet_csv(file_path: Path, station_code: str) -> pd.DataFrame | None
         df["estacao"] = station_code
 
         # Seleciona e reordena colunas úteis
-        final_cols = [
-            "timestamp_utc", "ano", "mes", "estacao",
-            "chuva_mm", "temp_c", "umid_rel_pct",
-            "vento_vel_ms", "vento_dir_graus", "vento_rajada_ms",
-            "pressao_atm_mb", "radiacao_global_kj_m2"
-        ]
+        final_cols = ["timestamp_utc", "ano", "mes", "estacao", *NUMERIC_COLS]
         
         # Garante que todas as colunas existam, preenchendo com NaN se não existirem
         for col in final_cols:
@@ -165,8 +175,8 @@ def main():
     for col in ["chuva_mm", "temp_c", "umid_rel_pct", "vento_vel_ms", "vento_dir_graus", "vento_rajada_ms", "pressao_atm_mb", "radiacao_global_kj_m2"]:
         final_df[col] = pd.to_numeric(final_df[col], errors="coerce")
 
-    # Escreve o dataset particionado
-    table = pa.Table.from_pandas(final_df)
+    # Escreve o dataset particionado (ano int16 e mes int8, conforme o contrato de chaves)
+    table = enforce_keys(pa.Table.from_pandas(final_df))
     pq.write_to_dataset(
         table,
         root_path=output_path,
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Teste de carga local do serviço de previsão (``prediction_service.py``).
+
+Dispara consultas aleatórias (município × ano × deltas) a partir de várias
+threads, cada uma com conexão HTTP persistente. Parte das consultas repete um
+conjunto pequeno de combinações, para exercitar o cache LRU. No fim mede
+latência (p50/p95/p99/máx.) e vazão. Com ``--iniciar`` o próprio script sobe o
+serviço numa porta livre antes do teste.
+
+Exemplos::
+
+    python scripts/load_test_prediction.py --iniciar --requisicoes 5000 --concorrencia 16
+    python scripts/load_test_prediction.py --url http://127.0.0.1:8765 --limite-p99-ms 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from analysis_features import DEFAULT_CACHE_DIR, DEFAULT_GOLD, DEFAULT_MUNICIPIOS, DEFAULT_SNIS_V2
+from train_models import DEFAULT_MODEL_PATH
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+DELTA_CHOICES = (-10.0, -5.0, -1.0, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_json(conn: http.client.HTTPConnection, path: str):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    return json.loads(response.read())
+
+
+def make_queries(
+    keys: List[Dict[str, object]], features: List[str], total: int, repeat: float, seed: int = 42
+) -> List[bytes]:
+    """Corpos JSON das consultas; uma fração ``repeat`` sai de 20 combinações fixas."""
+    rng = random.Random(seed)
+
+    def random_query() -> bytes:
+        key = rng.choice(keys)
+        chosen = rng.sample(features, k=min(len(features), rng.randint(1, 3)))
+        deltas = {feature: rng.choice(DELTA_CHOICES) for feature in chosen}
+        return json.dumps({"cod_mun": key["cod_mun"], "ano": key["ano"], "deltas": deltas}).encode("utf-8")
+
+    hot = [random_query() for _ in range(20)]
+    return [rng.choice(hot) if rng.random() < repeat else random_query() for _ in range(total)]
+
+
+def worker(
+    host: str, port: int, bodies: List[bytes], latencies: List[float], errors: List[str], lock: threading.Lock
+) -> None:
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    local: List[float] = []
+    headers = {"Content-Type": "application/json"}
+    for body in bodies:
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/prever", body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            if response.status != 200:
+                with lock:
+                    errors.append(f"{response.status}: {payload[:200]!r}")
+        except (OSError, http.client.HTTPException) as exc:
+            with lock:
+                errors.append(repr(exc))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        local.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+        latencies.extend(local)
+
+
+def run_load_test(
+    url: str, total: int, concurrency: int, repeat: float, warmup: int = 50
+) -> Tuple[Dict[str, float], Dict[str, object]]:
+    parsed = urlparse(url)
+    host, port = parsed.hostname or "127.0.0.1", parsed.port or 80
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    status = get_json(conn, "/saude")
+    keys = get_json(conn, "/chaves")
+    conn.close()
+    if not keys:
+        raise SystemExit("Serviço sem município-anos carregados.")
+
+    bodies = make_queries(keys, list(status["features"]), warmup + total, repeat)
+    # aquecimento fora da medição (conexões, caches de CPU)
+    worker(host, port, bodies[:warmup], [], [], threading.Lock())
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    chunks = [bodies[warmup + i :: concurrency] for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(host, port, chunk, latencies, errors, lock)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000
+    stats = {
+        "requisicoes": float(len(ms)),
+        "erros": float(len(errors)),
+        "vazao_rps": len(ms) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(ms, 50)) if len(ms) else np.nan,
+        "p95_ms": float(np.percentile(ms, 95)) if len(ms) else np.nan,
+        "p99_ms": float(np.percentile(ms, 99)) if len(ms) else np.nan,
+        "max_ms": float(ms.max()) if len(ms) else np.nan,
+    }
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    final_status = get_json(conn, "/saude")
+    conn.close()
+    if errors:
+        print(f"[WARN] {len(errors)} erros; primeiro: {errors[0]}")
+    return stats, final_status
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=DEFAULT_URL, help="Endereço do serviço já em execução")
+    parser.add_argument("--iniciar", action="store_true", help="Sobe o serviço neste processo (porta livre) antes do teste")
+    parser.add_argument("--modelo", type=Path, default=DEFAULT_MODEL_PATH, help="Modelo usado com --iniciar")
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD, help="Gold usado com --iniciar")
+    parser.add_argument("--snis", type=Path, default=DEFAULT_SNIS_V2, help="SNIS v2 usado com --iniciar")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios usado com --iniciar")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Cache do analysis_df usado com --iniciar")
+    parser.add_argument("--requisicoes", type=int, default=2000, help="Total de consultas medidas")
+    parser.add_argument("--concorrencia", type=int, default=4, help="Threads clientes simultâneas")
+    parser.add_argument("--repeticao", type=float, default=0.5, help="Fração de consultas repetidas (acertos no LRU)")
+    parser.add_argument("--limite-p99-ms", type=float, default=10.0, help="p99 máximo aceito (ms)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    url = args.url
+    server = None
+    if args.iniciar:
+        from prediction_service import load_service, serve
+
+        try:
+            service = load_service(args.modelo, args.gold, args.snis, args.municipios, args.cache_dir)
+        except FileNotFoundError as exc:
+            raise SystemExit(str(exc))
+        server = serve(service, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        stats, status = run_load_test(url, args.requisicoes, args.concorrencia, args.repeticao)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print(
+        f"{int(stats['requisicoes'])} requisições, {args.concorrencia} clientes: {stats['vazao_rps']:.0f} req/s | "
+        f"p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, máx. {stats['max_ms']:.2f} ms"
+    )
+    print(
+        f"cache LRU: {status['cache_acertos']} acertos / {status['cache_faltas']} faltas | "
+        f"{status['lotes']} lotes (média {status['tamanho_medio_lote']:.1f} linhas) | representação {status['representacao']}"
+    )
+    if stats["erros"] or stats["p99_ms"] > args.limite_p99_ms:
+        print(f"[WARN] p99 acima de {args.limite_p99_ms:.0f} ms ou requisições com erro")
+        raise SystemExit(1)
+    print(f"[OK] p99 dentro de {args.limite_p99_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Serviço HTTP local de previsão para a página "Priorizar & Simular".
+
+Responde "município, ano, deltas de features → taxa prevista de internações
+hídricas por 10 mil hab.". Na inicialização carrega o modelo salvo por
+``train_models.py`` e o ``analysis_df`` (cache) e monta uma representação compacta:
+
+- pré-processamento (mediana + escala) reduzido a três vetores numpy;
+- Random Forest achatada em arrays únicos (feature, limiar, filhos, valor), com
+  todas as árvores percorridas juntas em numpy; modelos lineares viram um produto
+  escalar. Outros estimadores usam o ``predict`` do pipeline;
+- features base de cada município × ano e a previsão base já calculadas.
+
+Consultas repetidas saem de um cache LRU. Requisições simultâneas são agrupadas
+por um *micro-batcher* numa única chamada de previsão. Os deltas seguem a regra
+de ``scenario_engine`` (indicadores percentuais limitados a 0–100).
+
+Exemplo::
+
+    python scripts/prediction_service.py --porta 8765
+    curl -s localhost:8765/prever -d '{"cod_mun": 1501402, "ano": 2025, "deltas": {"idx_atend_agua_total": 5}}'
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from analysis_features import DEFAULT_CACHE_DIR, DEFAULT_GOLD, DEFAULT_MUNICIPIOS, DEFAULT_SNIS_V2, load_analysis_df
+from forest_intervals import CompactModel
+from scenario_engine import BOUNDED_PREFIXES
+from train_models import DEFAULT_MODEL_PATH
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_LRU_SIZE = 4096
+DEFAULT_MAX_BATCH = 64
+REQUEST_TIMEOUT = 5.0
+
+
+class QueryError(ValueError):
+    """Consulta inválida (município/ano inexistente ou feature desconhecida)."""
+
+
+# --- cache e micro-batching ---
+class LRUCache:
+    def __init__(self, capacity: int = DEFAULT_LRU_SIZE) -> None:
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: float) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+
+class MicroBatcher:
+    """Agrupa as linhas pendentes numa única chamada de ``predict``.
+
+    O lote é tudo o que estiver na fila quando o worker fica livre (até
+    ``max_batch``). Sob carga, as requisições que chegam durante uma previsão
+    formam o lote seguinte. ``max_wait`` (s) pode segurar o lote um pouco mais.
+    """
+
+    def __init__(self, predict, max_batch: int = DEFAULT_MAX_BATCH, max_wait: float = 0.0) -> None:
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.rows = 0
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, row: np.ndarray) -> Future:
+        future: Future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    if time.perf_counter() >= deadline:
+                        break
+                    time.sleep(self.max_wait / 10)
+            try:
+                predicted = self.predict(np.vstack([row for row, _ in batch]))
+            except Exception as exc:  # erro de previsão volta para cada requisição do lote
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), value in zip(batch, predicted):
+                future.set_result(float(value))
+
+
+# --- serviço ---
+class PredictionService:
+    def __init__(
+        self,
+        bundle: Mapping[str, object],
+        analysis_df: pd.DataFrame,
+        lru_size: int = DEFAULT_LRU_SIZE,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait: float = 0.0,
+    ) -> None:
+        self.features: List[str] = list(bundle["features"])
+        self.model_name = str(bundle.get("model", ""))
+        self.model = CompactModel(bundle["pipeline"], self.features)
+        self.bounded = np.array([feature.startswith(BOUNDED_PREFIXES) for feature in self.features])
+        self.position = {feature: i for i, feature in enumerate(self.features)}
+
+        base = analysis_df.reset_index(drop=True)
+        self.keys = base[["cod_mun", "municipio", "ano"]].copy()
+        self.X = base[self.features].to_numpy(dtype=float)
+        self.baseline = self.model.predict(self.X)
+        self.index: Dict[Tuple[str, int], int] = {}
+        for i, (cod, ano) in enumerate(zip(base["cod_mun"].astype(str).str.zfill(7), base["ano"].astype(int))):
+            self.index[(cod, ano)] = i
+            self.index.setdefault((cod[:6], ano), i)
+
+        self.cache = LRUCache(lru_size)
+        self.batcher = MicroBatcher(self.model.predict, max_batch, max_wait)
+        self.requests = 0
+
+    def locate(self, cod_mun: object, ano: object) -> int:
+        cod = str(cod_mun).strip()
+        cod = cod.zfill(7) if len(cod) > 6 else cod
+        try:
+            year = float(ano)
+        except (ValueError, TypeError):
+            raise QueryError(f"Município/ano sem dados: {cod_mun}/{ano}") from None
+        if not np.isfinite(year) or not year.is_integer():
+            raise QueryError(f"ano deve ser inteiro: {ano}")
+        try:
+            return self.index[(cod, int(year))]
+        except KeyError:
+            raise QueryError(f"Município/ano sem dados: {cod_mun}/{ano}") from None
+
+    def perturbed_row(self, i: int, deltas: Mapping[str, float]) -> np.ndarray:
+        row = self.X[i].copy()
+        for feature, delta in deltas.items():
+            j = self.position[feature]
+            row[j] = row[j] + delta
+            if self.bounded[j]:
+                row[j] = min(max(row[j], 0.0), 100.0)
+        return row
+
+    def submit(self, query: Mapping[str, object]) -> Tuple[Dict[str, object], Optional[Future]]:
+        """Resposta parcial da consulta e o ``Future`` da previsão (``None`` se veio do cache)."""
+        if not isinstance(query, Mapping):
+            raise QueryError("cada consulta deve ser um objeto {cod_mun, ano, deltas}")
+        i = self.locate(query.get("cod_mun"), query.get("ano"))
+        deltas_raw = query.get("deltas") or {}
+        if not isinstance(deltas_raw, Mapping):
+            raise QueryError("deltas deve ser um objeto {feature: delta}")
+        unknown = sorted(set(deltas_raw) - set(self.position))
+        if unknown:
+            raise QueryError(f"Features fora do modelo: {unknown}")
+        try:
+            deltas = {str(feature): float(value) for feature, value in deltas_raw.items() if float(value) != 0.0}
+        except (TypeError, ValueError):
+            raise QueryError("deltas devem ser numéricos") from None
+        invalid = sorted(feature for feature, value in deltas.items() if not np.isfinite(value))
+        if invalid:
+            raise QueryError(f"deltas devem ser finitos (NaN/Infinity em {invalid})")
+
+        response: Dict[str, object] = {
+            "cod_mun": str(self.keys.at[i, "cod_mun"]),
+            "municipio": str(self.keys.at[i, "municipio"]),
+            "ano": int(self.keys.at[i, "ano"]),
+            "deltas": deltas,
+            "taxa_base": float(self.baseline[i]),
+        }
+        if not deltas:
+            response["taxa_prevista"] = float(self.baseline[i])
+            return response, None
+        key = (i, tuple(sorted(deltas.items())))
+        cached = self.cache.get(key)
+        if cached is not None:
+            response["taxa_prevista"] = cached
+            return response, None
+        response["_chave"] = key
+        return response, self.batcher.submit(self.perturbed_row(i, deltas))
+
+    def predict(self, queries: Sequence[Mapping[str, object]]) -> List[Dict[str, object]]:
+        """Várias consultas: todas entram na fila antes de esperar (caem no mesmo lote)."""
+        self.requests += len(queries)
+        pending = [self.submit(query) for query in queries]
+        results = []
+        for response, future in pending:
+            if future is not None:
+                response["taxa_prevista"] = future.result(timeout=REQUEST_TIMEOUT)
+                self.cache.put(response.pop("_chave"), response["taxa_prevista"])
+            response["impacto"] = response["taxa_prevista"] - response["taxa_base"]
+            results.append(response)
+        return results
+
+    def keys_list(self) -> List[Dict[str, object]]:
+        return [
+            {"cod_mun": str(cod), "municipio": str(nome), "ano": int(ano)}
+            for cod, nome, ano in self.keys.itertuples(index=False, name=None)
+        ]
+
+    def status(self) -> Dict[str, object]:
+        batches = self.batcher.batches
+        return {
+            "modelo": self.model_name,
+            "representacao": self.model.kind,
+            "features": self.features,
+            "linhas": len(self.X),
+            "requisicoes": self.requests,
+            "cache_acertos": self.cache.hits,
+            "cache_faltas": self.cache.misses,
+            "lotes": batches,
+            "tamanho_medio_lote": self.batcher.rows / batches if batches else 0.0,
+        }
+
+
+def make_handler(service: PredictionService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # cabeçalho e corpo saem em escritas separadas; com Nagle + ACK atrasado isso custa ~40 ms
+        disable_nagle_algorithm = True
+
+        def _send(self, status: int, payload: object) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802 (nome exigido por BaseHTTPRequestHandler)
+            path = self.path.rstrip("/")
+            if path == "/saude":
+                self._send(200, service.status())
+            elif path == "/chaves":
+                self._send(200, service.keys_list())
+            else:
+                self._send(404, {"erro": "use POST /prever, GET /saude ou GET /chaves"})
+
+        def do_POST(self) -> None:  # noqa: N802
+            if self.path.rstrip("/") != "/prever":
+                self._send(404, {"erro": "use POST /prever, GET /saude ou GET /chaves"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self._send(400, {"erro": "Content-Length inválido"})
+                self.close_connection = True  # o corpo não lido inutiliza a conexão
+                return
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                queries = payload if isinstance(payload, list) else [payload]
+                results = service.predict(queries)
+            except QueryError as exc:
+                self._send(400, {"erro": str(exc)})
+                return
+            except json.JSONDecodeError:
+                self._send(400, {"erro": "corpo JSON inválido"})
+                return
+            except FutureTimeout:
+                self._send(500, {"erro": f"previsão não concluída em {REQUEST_TIMEOUT:g} s"})
+                return
+            except Exception as exc:  # erro do modelo no lote: responde em vez de derrubar a conexão
+                self._send(500, {"erro": f"falha na previsão: {exc}"})
+                return
+            self._send(200, results if isinstance(payload, list) else results[0])
+
+        def log_message(self, format: str, *args) -> None:  # silencioso: cada log custaria latência
+            return
+
+    return Handler
+
+
+def serve(service: PredictionService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Servidor pronto (ainda sem ``serve_forever``); ``port=0`` escolhe uma porta livre."""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def load_service(
+    model_path: Path = DEFAULT_MODEL_PATH,
+    gold_path: Path = DEFAULT_GOLD,
+    snis_path: Optional[Path] = DEFAULT_SNIS_V2,
+    municipios_path: Path = DEFAULT_MUNICIPIOS,
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    lru_size: int = DEFAULT_LRU_SIZE,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    max_wait: float = 0.0,
+) -> PredictionService:
+    if not model_path.exists():
+        raise FileNotFoundError(f"Modelo não encontrado em {model_path}; rode scripts/train_models.py antes.")
+    analysis_df = load_analysis_df(gold_path, snis_path, municipios_path, cache_dir=cache_dir)
+    return PredictionService(joblib.load(model_path), analysis_df, lru_size, max_batch, max_wait)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modelo", type=Path, default=DEFAULT_MODEL_PATH, help="Pipeline salvo por train_models.py")
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD, help="Parquet do Gold anual")
+    parser.add_argument("--snis", type=Path, default=DEFAULT_SNIS_V2, help="SNIS v2 usado para completar indicadores de serviço")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Cache do analysis_df (Parquet)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Endereço de escuta (padrão: só local)")
+    parser.add_argument("--porta", type=int, default=DEFAULT_PORT, help="Porta HTTP")
+    parser.add_argument("--cache-lru", type=int, default=DEFAULT_LRU_SIZE, help="Consultas guardadas no cache LRU")
+    parser.add_argument("--lote-max", type=int, default=DEFAULT_MAX_BATCH, help="Máximo de linhas por chamada de previsão")
+    parser.add_argument("--espera-ms", type=float, default=0.0, help="Espera extra para formar lotes (ms)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    try:
+        service = load_service(
+            args.modelo, args.gold, args.snis, args.municipios, args.cache_dir, args.cache_lru, args.lote_max, args.espera_ms / 1000
+        )
+    except FileNotFoundError as exc:
+        raise SystemExit(str(exc))
+    server = serve(service, args.host, args.porta)
+    print(f"[OK] Modelo {service.model_name} ({service.model.kind}), {len(service.X)} município-anos")
+    print(f"[OK] Servindo em http://{args.host}:{server.server_address[1]} (POST /prever, GET /saude, GET /chaves)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
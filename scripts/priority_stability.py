@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Estabilidade do ``score_priorizacao`` sob ruído nos insumos (réplicas vetorizadas).
+
+As categorias Estável/Atenção/Crítico saem de um único cálculo determinístico.
+Aqui sorteamos milhares de réplicas plausíveis dos indicadores de entrada:
+
+- taxa hídrica: contagem de internações ~ Poisson e população com erro relativo
+  (``--ruido-populacao``, 2% por padrão);
+- alerta de qualidade: amostras conformes do SISAGUA ~ Binomial(amostras, % conformes);
+- atendimento, tratamento e perdas (SNIS): ruído normal aditivo em pontos
+  percentuais (``--ruido-snis``, 2 p.p. por padrão), com os mesmos recortes 0–100.
+
+Cada componente é uma matriz réplicas × linhas. O score (normalização min-max
+com o mínimo e a amplitude fixos do ``analysis_df`` base, a escala em que as
+categorias são definidas), o ranking por ano e as categorias são
+recalculados para todas as réplicas de uma vez, por broadcasting. Só as linhas
+dos anos avaliados são perturbadas, e as réplicas são processadas em blocos para
+limitar a memória. Sem ruído, o score reproduz
+exatamente ``score_priorizacao``.
+
+Saídas (somente quando o conteúdo muda):
+
+- ``estabilidade_prioridade.csv``: por município × ano, ranking base, mediana e
+  intervalo de 90% do ranking e do score, probabilidade de cada categoria e de
+  manter a categoria atual;
+- ``estabilidade_prioridade_ranks.csv``: distribuição completa do ranking
+  (``cod_mun``, ``ano``, ``rank``, ``prob``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis_features import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_EXPORT_DIR,
+    DEFAULT_GOLD,
+    DEFAULT_MUNICIPIOS,
+    DEFAULT_SNIS_V2,
+    PRIORITY_BINS,
+    PRIORITY_LABELS,
+    SCORE_WEIGHTS,
+    load_analysis_df,
+    parse_bins,
+    parse_weights,
+    write_extracts,
+)
+from silver_to_gold_features import parse_anos
+
+DEFAULT_REPLICATES = 10_000
+DEFAULT_POPULATION_NOISE = 0.02
+DEFAULT_SNIS_NOISE_PP = 2.0
+# células (réplicas × linhas) por bloco de réplicas
+CHUNK_CELLS = 2_000_000
+CATEGORY_COLS = ("prob_estavel", "prob_atencao", "prob_critico")
+
+# componente do score → indicador SNIS de origem (déficit = 100 - indicador)
+SNIS_DEFICITS = {
+    "deficit_atendimento": "idx_atend_agua_total",
+    "deficit_tratamento": "idx_tratamento_esgoto",
+}
+
+
+def _values(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+
+def perturb_components(
+    df: pd.DataFrame,
+    components: Sequence[str],
+    n_rep: int,
+    rng: np.random.Generator,
+    population_noise: float = DEFAULT_POPULATION_NOISE,
+    snis_noise: float = DEFAULT_SNIS_NOISE_PP,
+) -> Dict[str, np.ndarray]:
+    """Uma matriz réplicas × linhas por componente do score.
+
+    Linhas sem contagens de origem (internações, amostras) mantêm o valor do
+    ``analysis_df`` nesse componente.
+    """
+    n = len(df)
+    out: Dict[str, np.ndarray] = {}
+    for comp in components:
+        base = _values(df, comp)
+        if comp == "internacoes_hidricas_10k":
+            counts = _values(df, "internacoes_hidricas")
+            valid = np.isfinite(counts) & (counts > 0)
+            ratio = np.ones((n_rep, n))
+            lam = np.where(valid, counts, 0.0)
+            ratio[:, valid] = rng.poisson(lam[valid], size=(n_rep, int(valid.sum()))) / counts[valid]
+            population = 1.0 + population_noise * rng.standard_normal((n_rep, n)) if population_noise else 1.0
+            out[comp] = base * ratio / population
+        elif comp == "alerta_qualidade":
+            samples = _values(df, "sisagua_amostras_total")
+            conform = np.clip(_values(df, "pct_conformes_global"), 0, 100)
+            valid = np.isfinite(samples) & (samples > 0) & np.isfinite(conform)
+            pct = np.broadcast_to(conform, (n_rep, n)).copy()
+            totals = samples[valid].astype(np.int64)
+            pct[:, valid] = rng.binomial(totals, conform[valid] / 100, size=(n_rep, len(totals))) / totals * 100
+            out[comp] = np.where(np.isfinite(base), np.clip(100 - pct, 0, 100), np.nan)
+        elif comp in SNIS_DEFICITS:
+            source = np.clip(_values(df, SNIS_DEFICITS[comp]), 0, 100)
+            noisy = np.clip(source + snis_noise * rng.standard_normal((n_rep, n)), 0, 100)
+            out[comp] = np.clip(100 - noisy, 0, 100)
+        elif comp == "perdas_excesso":
+            source = _values(df, "idx_perdas_distribuicao")
+            out[comp] = np.clip(source + snis_noise * rng.standard_normal((n_rep, n)), 0, None)
+        else:
+            out[comp] = np.broadcast_to(base, (n_rep, n))
+    return out
+
+
+def base_scale(values: np.ndarray) -> Tuple[float, float, float]:
+    """``(mediana, mínimo, amplitude)`` de ``minmax_norm`` sobre o componente base."""
+    if not np.isfinite(values).any():
+        return np.nan, np.nan, np.nan
+    fill = float(np.nanmedian(values))
+    values = np.where(np.isnan(values), fill, values)
+    return fill, float(values.min()), float(values.max() - values.min())
+
+
+def minmax_rows(matrix: np.ndarray, scale: Tuple[float, float, float]) -> np.ndarray:
+    """Normaliza as réplicas com a escala fixa do ``analysis_df`` base (``base_scale``).
+
+    Uma escala própria por réplica seria alargada pelo ruído e encolheria todos os
+    scores; as categorias são definidas na escala determinística.
+    """
+    fill, low, span = scale
+    matrix = np.where(np.isnan(matrix), fill, matrix)
+    if span == 0 or np.isclose(span, 0):
+        return np.zeros_like(matrix)
+    return (matrix - low) / span
+
+
+def replicate_scores(
+    components: Dict[str, np.ndarray], weights: Dict[str, float], scales: Dict[str, Tuple[float, float, float]]
+) -> np.ndarray:
+    score = 0.0
+    for comp, weight in weights.items():
+        score = score + weight * minmax_rows(components[comp], scales[comp])
+    return np.asarray(score)
+
+
+def rank_rows(scores: np.ndarray) -> np.ndarray:
+    """Ranking decrescente por réplica (1 = maior score); empates ficam na ordem das colunas."""
+    order = np.argsort(-scores, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[1] + 1), axis=1)
+    return ranks
+
+
+def categorize(scores: np.ndarray, bins: Sequence[float]) -> np.ndarray:
+    """Índice em PRIORITY_LABELS com a regra de ``pd.cut`` (intervalos fechados à direita)."""
+    return np.searchsorted(np.asarray(bins, dtype=float), scores, side="left")
+
+
+def run_stability(
+    analysis_df: pd.DataFrame,
+    anos: Optional[Sequence[int]] = None,
+    n_rep: int = DEFAULT_REPLICATES,
+    weights: Dict[str, float] = SCORE_WEIGHTS,
+    bins: Sequence[float] = PRIORITY_BINS,
+    population_noise: float = DEFAULT_POPULATION_NOISE,
+    snis_noise: float = DEFAULT_SNIS_NOISE_PP,
+    seed: int = 42,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Resumo por município × ano e distribuição do ranking para os ``anos`` (padrão: último)."""
+    df = analysis_df.reset_index(drop=True)
+    anos = list(anos) if anos else [int(df["ano"].max())]
+    groups: List[np.ndarray] = [np.flatnonzero(df["ano"].to_numpy() == ano) for ano in anos]
+    groups = [cols for cols in groups if len(cols)]
+    if not groups:
+        raise ValueError(f"Sem linhas no analysis_df para os anos {anos}")
+    target = np.concatenate(groups)
+
+    base_components = {comp: _values(df, comp)[None, :] for comp in weights}
+    scales = {comp: base_scale(values[0]) for comp, values in base_components.items()}
+
+    # com a escala fixa, só as linhas dos anos avaliados precisam ser perturbadas
+    subset = df.loc[target].reset_index(drop=True)
+    bounds = np.cumsum([0, *(len(cols) for cols in groups)])
+    local_groups = [np.arange(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, CHUNK_CELLS // len(target))
+    scores: List[np.ndarray] = []
+    ranks: List[np.ndarray] = []
+    for start in range(0, n_rep, chunk):
+        size = min(chunk, n_rep - start)
+        components = perturb_components(subset, list(weights), size, rng, population_noise, snis_noise)
+        score = replicate_scores(components, weights, scales)
+        scores.append(score)
+        ranks.append(np.concatenate([rank_rows(score[:, cols]) for cols in local_groups], axis=1))
+    score_rep = np.concatenate(scores)
+    rank_rep = np.concatenate(ranks)
+
+    base_score = replicate_scores(base_components, weights, scales)
+    base_rank = np.concatenate([rank_rows(base_score[:, cols]) for cols in groups], axis=1)[0]
+    base_cat = categorize(base_score[0, target], bins)
+
+    cats = categorize(score_rep, bins)
+    n_cols = len(target)
+    cat_counts = np.bincount((np.arange(n_cols) * len(PRIORITY_LABELS) + cats).ravel(), minlength=n_cols * len(PRIORITY_LABELS))
+    cat_prob = cat_counts.reshape(n_cols, len(PRIORITY_LABELS)) / n_rep
+
+    summary = df.loc[target, ["cod_mun", "municipio", "ano", "score_priorizacao", "prioridade_categoria"]].reset_index(drop=True)
+    summary["rank_base"] = base_rank
+    summary["rank_mediana"] = np.median(rank_rep, axis=0)
+    summary["rank_p05"] = np.quantile(rank_rep, 0.05, axis=0)
+    summary["rank_p95"] = np.quantile(rank_rep, 0.95, axis=0)
+    summary["score_p05"] = np.quantile(score_rep, 0.05, axis=0)
+    summary["score_p95"] = np.quantile(score_rep, 0.95, axis=0)
+    for i, col in enumerate(CATEGORY_COLS):
+        summary[col] = cat_prob[:, i]
+    summary["prob_mesma_categoria"] = cat_prob[np.arange(n_cols), base_cat]
+    summary = summary.sort_values(["ano", "rank_base"]).reset_index(drop=True)
+
+    max_rank = int(rank_rep.max())
+    rank_counts = np.bincount((np.arange(n_cols) * (max_rank + 1) + rank_rep).ravel(), minlength=n_cols * (max_rank + 1))
+    rank_counts = rank_counts.reshape(n_cols, max_rank + 1)
+    col_idx, rank = np.nonzero(rank_counts)
+    keys = df.loc[target, ["cod_mun", "municipio", "ano"]].reset_index(drop=True)
+    distribution = keys.iloc[col_idx].reset_index(drop=True)
+    distribution["rank"] = rank
+    distribution["prob"] = rank_counts[col_idx, rank] / n_rep
+    distribution = distribution.sort_values(["ano", "cod_mun", "rank"]).reset_index(drop=True)
+    return summary, distribution
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD, help="Parquet do Gold anual")
+    parser.add_argument("--snis", type=Path, default=DEFAULT_SNIS_V2, help="SNIS v2 usado para completar indicadores de serviço")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Cache do analysis_df (Parquet)")
+    parser.add_argument("--pesos", default=None, help="Pesos do score, ex.: internacoes_hidricas_10k=0.4,deficit_tratamento=0.2,...")
+    parser.add_argument("--limiares", default=None, help="Limiares Estável/Atenção/Crítico do score (padrão: 0.33,0.66)")
+    parser.add_argument("--anos", default=None, help="Anos avaliados (ex.: 2025 ou 2018-2025; padrão: último ano)")
+    parser.add_argument("--replicas", type=int, default=DEFAULT_REPLICATES, help="Número de réplicas perturbadas")
+    parser.add_argument(
+        "--ruido-populacao", type=float, default=DEFAULT_POPULATION_NOISE, help="Erro relativo da população (desvio-padrão)"
+    )
+    parser.add_argument(
+        "--ruido-snis", type=float, default=DEFAULT_SNIS_NOISE_PP, help="Ruído dos indicadores SNIS (desvio-padrão, p.p.)"
+    )
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador aleatório")
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_EXPORT_DIR, help="Diretório dos CSVs do dashboard")
+    parser.add_argument("--forcar", action="store_true", help="Regrava os CSVs mesmo sem mudança de conteúdo")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.replicas < 1:
+        raise SystemExit("--replicas deve ser >= 1")
+    weights, bins = parse_weights(args.pesos), parse_bins(args.limiares)
+    analysis_df = load_analysis_df(args.gold, args.snis, args.municipios, weights, bins, cache_dir=args.cache_dir)
+
+    start = time.perf_counter()
+    try:
+        summary, distribution = run_stability(
+            analysis_df,
+            parse_anos(args.anos),
+            args.replicas,
+            weights,
+            bins,
+            args.ruido_populacao,
+            args.ruido_snis,
+            args.semente,
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    print(f"[OK] {args.replicas} réplicas em {time.perf_counter() - start:.2f} s")
+    cols = ["municipio", "ano", "rank_base", "rank_p05", "rank_p95", *CATEGORY_COLS, "prob_mesma_categoria"]
+    print(summary[cols].to_string(index=False))
+
+    extracts = {"estabilidade_prioridade": summary, "estabilidade_prioridade_ranks": distribution}
+    written = write_extracts(extracts, args.out_dir, args.forcar)
+    for name in extracts:
+        status = "atualizado" if name in written else "sem mudança"
+        print(f"[OK] {name}.csv ({status}) → {args.out_dir / (name + '.csv')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Camada de consulta SQL embarcada (DuckDB) sobre os Parquet Silver e Gold.
+
+Cada conjunto vira uma *view* lida direto dos arquivos. Nada é carregado na
+memória até a consulta rodar, e os filtros por ``ano`` descartam partições
+``ano=YYYY`` inteiras (*partition pruning*). Os resultados saem como tabelas
+Arrow, que o DuckDB entrega sem conversão intermediária. ``to_pandas()`` só é
+chamado quando necessário.
+
+Exemplos::
+
+    python scripts/query_layer.py --listar
+    python scripts/query_layer.py --indicadores internacoes_hidricas_10k,idx_coleta_esgoto --anos 2019-2022
+    python scripts/query_layer.py --sql "SELECT ano, SUM(internacoes_hidricas) FROM sih GROUP BY ano ORDER BY ano"
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from ibge_keys import to_ibge7
+from silver_to_gold_features import DEFAULT_OUT_DIR, DEFAULT_OUT_PARQUET, SILVER_INPUTS, parse_anos
+
+ROLLUPS_DIR = Path("data/gold/rollups")
+
+# Views registradas: nome → (caminho relativo à raiz do projeto, "hive" | "file")
+VIEWS: Dict[str, Tuple[Path, str]] = {
+    **SILVER_INPUTS,
+    "siops_subfuncao": (Path("data/silver/siops/subfuncao"), "hive"),
+    "gold": (DEFAULT_OUT_DIR, "hive"),
+    **{
+        f"gold_{granularidade}": (ROLLUPS_DIR / f"gold_{granularidade}.parquet", "file")
+        for granularidade in ("mes", "trimestre", "ano", "temporada")
+    },
+}
+# Sem as partições anuais, a view "gold" lê o Parquet único
+FALLBACKS: Dict[str, Tuple[Path, str]] = {"gold": (DEFAULT_OUT_PARQUET, "file")}
+
+# Chaves de município e período (anuais, rollups por trimestre/mês e por temporada)
+KEY_COLUMNS = ("cod_mun", "municipio", "ano", "ano_temporada", "temporada", "trimestre", "mes")
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as exc:  # dependência opcional: só a camada de consulta precisa dela
+        raise ImportError("A camada de consulta requer o pacote duckdb (pip install duckdb).") from exc
+    return duckdb
+
+
+def _to_arrow(result) -> pa.Table:
+    fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+    return fetch()
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_path(path: Path) -> str:
+    return "'" + path.as_posix().replace("'", "''") + "'"
+
+
+def view_source(path: Path, kind: str) -> str:
+    """Expressão ``read_parquet`` da view; datasets Hive expõem as chaves de partição como colunas."""
+    if kind == "hive":
+        return f"read_parquet({_sql_path(path / '**' / '*.parquet')}, hive_partitioning = true, union_by_name = true)"
+    return f"read_parquet({_sql_path(path)})"
+
+
+def resolve_views(root: Path) -> Dict[str, Tuple[Path, str]]:
+    """Views com dados presentes sob ``root`` (cai no Parquet único quando não há partições)."""
+    available: Dict[str, Tuple[Path, str]] = {}
+    for name, (path, kind) in VIEWS.items():
+        candidates = [(path, kind)]
+        if name in FALLBACKS:
+            candidates.append(FALLBACKS[name])
+        for cand_path, cand_kind in candidates:
+            full = root / cand_path
+            if (cand_kind == "hive" and any(full.rglob("*.parquet"))) or (cand_kind == "file" and full.is_file()):
+                available[name] = (full, cand_kind)
+                break
+    return available
+
+
+def connect(root: Path | str = ".", database: str = ":memory:", threads: Optional[int] = None):
+    """Conexão DuckDB com uma view por conjunto Silver/Gold encontrado sob ``root``."""
+    duckdb = _duckdb()
+    con = duckdb.connect(database)
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    for name, (path, kind) in resolve_views(Path(root)).items():
+        con.execute(f"CREATE OR REPLACE VIEW {quote_ident(name)} AS SELECT * FROM {view_source(path, kind)}")
+    return con
+
+
+def view_columns(con, view: str) -> List[str]:
+    """Colunas de uma view (só lê metadados dos arquivos)."""
+    return [row[0] for row in con.execute(f"DESCRIBE {quote_ident(view)}").fetchall()]
+
+
+def view_names(con) -> List[str]:
+    return [row[0] for row in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name").fetchall()]
+
+
+def list_views(con) -> Dict[str, List[str]]:
+    """Views registradas e suas colunas."""
+    return {name: view_columns(con, name) for name in view_names(con)}
+
+
+def query(con, sql: str, params: Optional[Sequence[object]] = None) -> pa.Table:
+    """Executa SQL arbitrário (com parâmetros ``?``) e devolve Arrow."""
+    return _to_arrow(con.execute(sql, list(params or [])))
+
+
+def indicator_slice(
+    con,
+    indicadores: Sequence[str],
+    cod_mun: Optional[Sequence[str]] = None,
+    anos: Optional[Sequence[int]] = None,
+    view: str = "gold",
+    longo: bool = False,
+) -> pa.Table:
+    """Recorte município × ano × indicador de uma view.
+
+    ``cod_mun`` aceita códigos IBGE de 6 ou 7 dígitos. O filtro de ``anos`` é
+    empurrado para a leitura e poda as partições (em ``gold_temporada`` vale o
+    ano da temporada). Com ``longo=True`` o resultado
+    vem empilhado em ``(cod_mun, municipio, ano, indicador, valor)``.
+    """
+    if view not in view_names(con):
+        raise KeyError(f"View inexistente: {view}")
+    columns = view_columns(con, view)
+    missing = [ind for ind in indicadores if ind not in columns]
+    if missing:
+        raise KeyError(f"Indicadores ausentes da view {view}: {missing}")
+
+    keys = [col for col in KEY_COLUMNS if col in columns]
+    select = ", ".join(quote_ident(col) for col in [*keys, *indicadores])
+    where: List[str] = []
+    params: List[object] = []
+    year_col = "ano" if "ano" in columns else "ano_temporada"
+    if anos and year_col in columns:
+        where.append(f"{year_col} IN ({', '.join('?' for _ in anos)})")
+        params.extend(int(ano) for ano in anos)
+    if cod_mun:
+        codes = sorted({code for code in to_ibge7(list(cod_mun)).to_pylist() if code is not None})
+        if not codes:
+            raise KeyError(f"Nenhum código IBGE válido em cod_mun: {list(cod_mun)}")
+        where.append(f"cod_mun IN ({', '.join('?' for _ in codes)})")
+        params.extend(codes)
+
+    sql = f"SELECT {select} FROM {quote_ident(view)}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if longo:
+        # valores heterogêneos (inteiros/decimais) empilhados como DOUBLE
+        casts = ", ".join(f"CAST({quote_ident(ind)} AS DOUBLE) AS {quote_ident(ind)}" for ind in indicadores)
+        key_sql = ", ".join(quote_ident(col) for col in keys)
+        sql = (
+            f"UNPIVOT (SELECT {key_sql}, {casts} FROM ({sql})) "
+            f"ON {', '.join(quote_ident(ind) for ind in indicadores)} INTO NAME indicador VALUE valor"
+        )
+        sql = f"SELECT * FROM ({sql})"
+    order = [quote_ident(col) for col in keys if col != "municipio"] + (["indicador"] if longo else [])
+    if order:
+        sql += " ORDER BY " + ", ".join(order)
+    return query(con, sql, params)
+
+
+def write_table(table: pa.Table, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".csv":
+        pacsv.write_csv(table, path)
+    else:
+        pq.write_table(table, path, compression="snappy")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raiz", type=Path, default=Path("."), help="Raiz do projeto (onde ficam data/silver e data/gold)")
+    parser.add_argument("--listar", action="store_true", help="Lista as views registradas e suas colunas")
+    parser.add_argument("--sql", default=None, help="Consulta SQL sobre as views (ex.: SELECT * FROM gold WHERE ano = 2022)")
+    parser.add_argument("--view", default="gold", help="View usada por --indicadores (padrão: gold)")
+    parser.add_argument("--indicadores", default=None, help="Colunas separadas por vírgula para o recorte município × ano")
+    parser.add_argument("--anos", default=None, help="Anos (ex.: 2019,2021 ou 2018-2022)")
+    parser.add_argument("--cod-mun", default=None, help="Códigos IBGE separados por vírgula (6 ou 7 dígitos)")
+    parser.add_argument("--longo", action="store_true", help="Devolve o recorte em formato longo (indicador, valor)")
+    parser.add_argument("--out", type=Path, default=None, help="Grava o resultado em .parquet ou .csv em vez de imprimir")
+    parser.add_argument("--threads", type=int, default=None, help="Limite de threads do DuckDB")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    try:
+        con = connect(args.raiz, threads=args.threads)
+    except ImportError as exc:
+        raise SystemExit(str(exc))
+
+    if args.listar:
+        for name, columns in list_views(con).items():
+            print(f"{name}: {', '.join(columns)}")
+        return
+
+    if args.sql:
+        table = query(con, args.sql)
+    elif args.indicadores:
+        indicadores = [item.strip() for item in args.indicadores.split(",") if item.strip()]
+        municipios = [code.strip() for code in args.cod_mun.split(",")] if args.cod_mun else None
+        try:
+            table = indicator_slice(con, indicadores, municipios, parse_anos(args.anos), args.view, args.longo)
+        except KeyError as exc:
+            raise SystemExit(exc.args[0])
+    else:
+        raise SystemExit("Informe --listar, --sql ou --indicadores.")
+
+    if args.out:
+        write_table(table, args.out)
+        print(f"[OK] {table.num_rows} linhas → {args.out}")
+    else:
+        print(table.to_pandas().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
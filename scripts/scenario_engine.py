@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Cenários "e se" em lote sobre o modelo final (``modelagem_cenarios.csv``).
+
+Recebe uma grade de deltas para várias features ao mesmo tempo, por exemplo
+``idx_atend_agua_total=-10:10:1`` ou ``pct_conformes_global=5``. A base
+município × ano é replicada uma vez por cenário, o delta de cada cenário é
+aplicado em bloco e todas as matrizes são empilhadas para **uma única** chamada
+de ``predict`` (a base entra no mesmo lote). Indicadores percentuais
+(``idx_``, ``pct_``, ``deficit``, ``alerta``, ``perdas``) continuam limitados a
+0–100, como no notebook.
+
+Saídas:
+
+- ``modelagem_cenarios.csv``: uma linha por feature × delta, com o mesmo esquema
+  de antes (``impacto_medio_taxa``, ``impacto_min_taxa``, ``impacto_max_taxa``);
+- ``modelagem_cenarios_municipios.csv``: impacto por município × ano × cenário
+  (a distribuição por trás do resumo). Com Random Forest, cada linha perturbada
+  traz também o intervalo por quantis das árvores (``taxa_cenario_p05``/``p95``) e a
+  probabilidade de passar do limiar Crítico antes e depois do cenário
+  (``prob_critico_base``, ``prob_critico_cenario``), na mesma passada pela floresta.
+  A taxa prevista é a média das árvores dessa passada; o ``predict`` do pipeline só
+  é chamado para modelos que não são florestas.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from analysis_features import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_EXPORT_DIR,
+    DEFAULT_GOLD,
+    DEFAULT_MUNICIPIOS,
+    DEFAULT_SNIS_V2,
+    critical_rate_threshold,
+    load_analysis_df,
+    write_extracts,
+)
+from forest_intervals import DEFAULT_QUANTILES, CompactModel, forest_intervals, parse_quantiles
+from silver_to_gold_features import parse_anos
+from train_models import DEFAULT_MODEL_PATH
+
+# Passos acionáveis do notebook de modelagem: feature → deltas
+ACTIONABLE_STEPS: Dict[str, Tuple[float, ...]] = {
+    "idx_atend_agua_total": (5.0,),
+    "idx_tratamento_esgoto": (5.0,),
+    "pct_conformes_global": (5.0,),
+    "pct_despesa_investimentos_saude": (0.5,),
+    "pct_receita_propria_asps": (0.5,),
+    "pct_transferencias_sus_recursos": (0.5,),
+}
+BOUNDED_PREFIXES = ("idx_", "pct_", "deficit", "alerta", "perdas")
+SCENARIO_KEYS = ("cod_mun", "municipio", "ano")
+SUMMARY_COLS = ("feature", "delta_aplicado", "impacto_medio_taxa", "impacto_min_taxa", "impacto_max_taxa")
+
+
+def scenario_grid(
+    steps: Dict[str, Sequence[float]], features: Sequence[str]
+) -> Tuple[List[str], np.ndarray]:
+    """Pares (feature, delta) na ordem da grade; features fora do modelo são ignoradas."""
+    names: List[str] = []
+    deltas: List[float] = []
+    for feature, values in steps.items():
+        if feature not in features:
+            continue
+        for delta in values:
+            names.append(feature)
+            deltas.append(float(delta))
+    return names, np.asarray(deltas, dtype=float)
+
+
+def stack_scenarios(base: np.ndarray, columns: np.ndarray, deltas: np.ndarray, bounded: np.ndarray) -> np.ndarray:
+    """Matriz ``(1 + cenários) × linhas × features``: bloco 0 é a base, o bloco ``s`` soma ``deltas[s]`` na coluna ``columns[s]``."""
+    n_scen = len(deltas)
+    stacked = np.broadcast_to(base, (n_scen + 1, *base.shape)).copy()
+    blocks = np.arange(1, n_scen + 1)
+    shifted = stacked[blocks, :, columns] + deltas[:, None]
+    clipped = np.clip(shifted, 0, 100)
+    stacked[blocks, :, columns] = np.where(bounded[:, None], clipped, shifted)
+    return stacked
+
+
+def run_scenarios(
+    pipeline,
+    base: pd.DataFrame,
+    features: Sequence[str],
+    steps: Dict[str, Sequence[float]] = ACTIONABLE_STEPS,
+    thresholds: Optional[np.ndarray] = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+) -> pd.DataFrame:
+    """Impacto de cada cenário em cada linha de ``base`` (formato longo), com um único ``predict``.
+
+    ``thresholds`` é o limiar Crítico da taxa de cada linha de ``base`` (ver
+    ``critical_rate_threshold``).
+    """
+    features = list(features)
+    names, deltas = scenario_grid(steps, features)
+    if not names:
+        raise ValueError("Nenhuma feature da grade de cenários está no modelo.")
+    columns = np.array([features.index(name) for name in names])
+    bounded = np.array([name.startswith(BOUNDED_PREFIXES) for name in names])
+
+    X = base[features].to_numpy(dtype=float)
+    stacked = stack_scenarios(X, columns, deltas, bounded)
+    flat = stacked.reshape(-1, len(features))
+    limits = np.tile(np.full(len(base), np.nan) if thresholds is None else thresholds, len(deltas) + 1)
+    model = CompactModel(pipeline, features)
+    forest = model.kind == "floresta"
+    # floresta: a previsão pontual é a média da mesma matriz por árvore dos intervalos (uma passada)
+    intervals = forest_intervals(
+        model, flat, limits, quantiles, prefix="taxa_cenario", mean_col="taxa_cenario" if forest else None
+    )
+    if forest:
+        predicted = intervals.pop("taxa_cenario").to_numpy()
+    else:
+        predicted = np.asarray(pipeline.predict(pd.DataFrame(flat, columns=features)), dtype=float)
+    predicted = predicted.reshape(len(deltas) + 1, len(base))
+    prob = intervals.pop("prob_critico").to_numpy().reshape(len(deltas) + 1, len(base))
+
+    baseline = predicted[0]
+    n_rows = len(base)
+    keys = base[[col for col in SCENARIO_KEYS if col in base.columns]].reset_index(drop=True)
+    detail = keys.iloc[np.tile(np.arange(n_rows), len(deltas))].reset_index(drop=True)
+    detail["feature"] = np.repeat(names, n_rows)
+    detail["delta_aplicado"] = np.repeat(deltas, n_rows)
+    detail["taxa_base"] = np.tile(baseline, len(deltas))
+    detail["taxa_cenario"] = predicted[1:].ravel()
+    detail["impacto_taxa"] = detail["taxa_cenario"] - detail["taxa_base"]
+    for col in intervals.columns:
+        detail[col] = intervals[col].to_numpy()[n_rows:]
+    detail["prob_critico_base"] = np.tile(prob[0], len(deltas))
+    detail["prob_critico_cenario"] = prob[1:].ravel()
+    return detail
+
+
+def summarize_scenarios(detail: pd.DataFrame) -> pd.DataFrame:
+    """Resumo por feature × delta no esquema de ``modelagem_cenarios.csv``."""
+    summary = (
+        detail.groupby(["feature", "delta_aplicado"], sort=False)["impacto_taxa"]
+        .agg(impacto_medio_taxa="mean", impacto_min_taxa="min", impacto_max_taxa="max")
+        .reset_index()
+    )
+    return summary[list(SUMMARY_COLS)]
+
+
+def parse_steps(text: Optional[str]) -> Dict[str, Tuple[float, ...]]:
+    """``feature=5`` | ``feature=1/2.5/5`` | ``feature=-10:10:2`` (início:fim:passo, inclusivo), separados por vírgula."""
+    if not text:
+        return dict(ACTIONABLE_STEPS)
+    steps: Dict[str, Tuple[float, ...]] = {}
+    for item in text.split(","):
+        feature, _, spec = item.partition("=")
+        feature, spec = feature.strip(), spec.strip()
+        try:
+            if ":" in spec:
+                start, stop, step = (float(part) for part in spec.split(":"))
+                if step <= 0:
+                    raise ValueError
+                values = tuple(np.round(np.arange(start, stop + step / 2, step), 10).tolist())
+            else:
+                values = tuple(float(part) for part in spec.split("/"))
+        except ValueError:
+            raise SystemExit(f"Cenário inválido: {item!r} (use feature=5, feature=1/2/5 ou feature=-10:10:2)")
+        if not feature or not values:
+            raise SystemExit(f"Cenário inválido: {item!r}")
+        steps[feature] = values
+    return steps
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD, help="Parquet do Gold anual")
+    parser.add_argument("--snis", type=Path, default=DEFAULT_SNIS_V2, help="SNIS v2 usado para completar indicadores de serviço")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Cache do analysis_df (Parquet)")
+    parser.add_argument("--modelo", type=Path, default=DEFAULT_MODEL_PATH, help="Pipeline salvo por train_models.py")
+    parser.add_argument("--anos", default=None, help="Anos da base dos cenários (ex.: 2025 ou 2018-2025; padrão: último ano)")
+    parser.add_argument(
+        "--cenarios",
+        default=None,
+        help="Grade de deltas, ex.: idx_atend_agua_total=-10:10:1,pct_conformes_global=5 (padrão: passos do notebook)",
+    )
+    parser.add_argument("--quantis", default=None, help="Quantis do intervalo por árvore (padrão: 0.05,0.95)")
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_EXPORT_DIR, help="Diretório dos CSVs do dashboard")
+    parser.add_argument("--forcar", action="store_true", help="Regrava os CSVs mesmo sem mudança de conteúdo")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.modelo.exists():
+        raise SystemExit(f"Modelo não encontrado em {args.modelo}; rode scripts/train_models.py antes.")
+    bundle = joblib.load(args.modelo)
+
+    analysis_df = load_analysis_df(args.gold, args.snis, args.municipios, cache_dir=args.cache_dir)
+    anos = parse_anos(args.anos) or [int(analysis_df["ano"].max())]
+    selected = analysis_df["ano"].isin(anos).to_numpy()
+    base = analysis_df[selected].reset_index(drop=True)
+    if base.empty:
+        raise SystemExit(f"Sem linhas no analysis_df para os anos {anos}")
+    thresholds = critical_rate_threshold(analysis_df).to_numpy()[selected]
+
+    try:
+        detail = run_scenarios(
+            bundle["pipeline"],
+            base,
+            bundle["features"],
+            parse_steps(args.cenarios),
+            thresholds,
+            parse_quantiles(args.quantis),
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    summary = summarize_scenarios(detail)
+    print(summary.to_string(index=False))
+
+    extracts = {"modelagem_cenarios": summary, "modelagem_cenarios_municipios": detail}
+    written = write_extracts(extracts, args.out_dir, args.forcar)
+    for name in extracts:
+        status = "atualizado" if name in written else "sem mudança"
+        print(f"[OK] {name}.csv ({status}) → {args.out_dir / (name + '.csv')}")
+
+
+if __name__ == "__main__":
+    main()
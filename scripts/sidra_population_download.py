@@ -1,63 +1,153 @@
 #!/usr/bin/env python3
-"""Baixa população municipal (SIDRA tabela 6579) para a RMB, gerando um CSV por ano."""
+"""Baixa população municipal (SIDRA tabela 6579) em lotes, gerando um único Parquet tipado (Bronze).
+
+Os anos são pedidos como faixas (``/p/2018-2021``) e os municípios em listas
+agrupadas, respeitando o limite de valores por consulta da API. Também aceita
+todos os municípios do Pará (``n6/in n3 15``) ou do Brasil (``n6/all``) numa
+única consulta por faixa de anos. As respostas passam pelo cache HTTP local.
+"""
 
 import argparse
-import csv
 import os
 import re
-from typing import Iterable
+from typing import Iterable, List, Sequence, Tuple
 
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
 
+from http_cache import DAY, CacheMiss, add_cache_arguments, cache_from_args, ttl_for_year
+
 RMB_CODES = [1501402, 1500800, 1504422, 1501501, 1506351, 1506500, 1502400, 1501303]
 VARIABLE_CODE = "9324"  # População residente estimada
 SIDRA_BASE = "https://apisidra.ibge.gov.br/values/t/6579/n6/{codes}/v/{variable}/p/{period}"
 
+# Seletores de território aceitos pelo SIDRA além da lista explícita de códigos
+ABRANGENCIAS = {
+    "rmb": None,
+    "pa": "in n3 15",
+    "brasil": "all",
+}
+UF_MUNICIPIOS = {"pa": 144, "brasil": 5570}  # ordem de grandeza, usada só para dimensionar lotes
+
+# A API recusa consultas acima de 100 mil valores; margem para variações
+MAX_VALUES = 50_000
+MAX_CODES_PER_URL = 300
+# status devolvido pelo SIDRA para período ainda não publicado na tabela
+UNPUBLISHED_STATUS = 400
+
+OUTPUT_NAME = "sidra6579_populacao.parquet"
+SCHEMA = pa.schema(
+    [
+        ("municipio_codigo", pa.int32()),
+        ("municipio_nome", pa.string()),
+        ("ano", pa.int32()),
+        ("variavel_codigo", pa.string()),
+        ("variavel_nome", pa.string()),
+        ("unidade_codigo", pa.string()),
+        ("unidade_nome", pa.string()),
+        ("valor", pa.int64()),
+    ]
+)
+
 
 def build_code_string(codes: Iterable[int]) -> str:
     return ",".join(str(code) for code in codes)
 
 
-def dump_csv(data: list[dict], output_path: str) -> bool:
-    fieldnames = [
-        "municipio_codigo",
-        "municipio_nome",
-        "ano",
-        "variavel_codigo",
-        "variavel_nome",
-        "unidade_codigo",
-        "unidade_nome",
-        "valor",
+def chunked(items: Sequence, size: int) -> List[Sequence]:
+    return [items[idx: idx + size] for idx in range(0, len(items), size)]
+
+
+def year_batches(start_year: int, end_year: int, n_municipios: int) -> List[Tuple[int, int]]:
+    """Faixas contíguas de anos tais que municípios × anos fique abaixo de ``MAX_VALUES``."""
+    per_batch = max(1, MAX_VALUES // max(1, n_municipios))
+    return [
+        (first, min(first + per_batch - 1, end_year))
+        for first in range(start_year, end_year + 1, per_batch)
     ]
-    with open(output_path, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        if len(data) <= 1:
-            return False
-
-        rows = []
-        for entry in data[1:]:
-            rows.append(
-                {
-                    "municipio_codigo": entry.get("D1C"),
-                    "municipio_nome": entry.get("D1N"),
-                    "ano": entry.get("D3C"),
-                    "variavel_codigo": entry.get("D2C"),
-                    "variavel_nome": entry.get("D2N"),
-                    "unidade_codigo": entry.get("MC"),
-                    "unidade_nome": entry.get("MN"),
-                    "valor": entry.get("V"),
-                }
-            )
-        writer.writerows(rows)
-        return True
+
+
+def period_string(first: int, last: int) -> str:
+    return str(first) if first == last else f"{first}-{last}"
+
+
+def batch_ttl(first: int, last: int):
+    """Uma faixa só é eterna no cache se todos os seus anos já fecharam."""
+    ttls = [ttl_for_year(year) for year in range(first, last + 1)]
+    return None if all(ttl is None for ttl in ttls) else DAY
+
+
+def parse_rows(data: list[dict]) -> pd.DataFrame:
+    """Converte a resposta JSON do SIDRA (primeira linha = cabeçalho) em linhas tipadas."""
+    if len(data) <= 1:
+        return pd.DataFrame(columns=SCHEMA.names)
+    df = pd.DataFrame(data[1:])
+    df = df.rename(
+        columns={
+            "D1C": "municipio_codigo",
+            "D1N": "municipio_nome",
+            "D3C": "ano",
+            "D2C": "variavel_codigo",
+            "D2N": "variavel_nome",
+            "MC": "unidade_codigo",
+            "MN": "unidade_nome",
+            "V": "valor",
+        }
+    )
+    df = df.reindex(columns=SCHEMA.names)
+    # valores não numéricos do SIDRA ("-", "...", "X") viram nulos
+    df["valor"] = pd.to_numeric(df["valor"], errors="coerce").astype("Int64")
+    df["municipio_codigo"] = pd.to_numeric(df["municipio_codigo"], errors="coerce").astype("Int32")
+    df["ano"] = pd.to_numeric(df["ano"], errors="coerce").astype("Int32")
+    return df
+
+
+def fetch_batch(cache, territory: str, first: int, last: int) -> pd.DataFrame:
+    url = SIDRA_BASE.format(codes=territory, variable=VARIABLE_CODE, period=period_string(first, last))
+    response = cache.get(url, ttl=batch_ttl(first, last), timeout=120)
+    if response.status_code == UNPUBLISHED_STATUS and first != last:
+        # faixa com ano inexistente na tabela: divide ao meio até isolar o ano recusado
+        mid = (first + last) // 2
+        parts = [fetch_batch(cache, territory, first, mid), fetch_batch(cache, territory, mid + 1, last)]
+        return pd.concat(parts, ignore_index=True)
+    if response.status_code == UNPUBLISHED_STATUS:
+        # ano sem publicação; o aviso é dado ao final, junto dos demais anos ausentes
+        return pd.DataFrame(columns=SCHEMA.names)
+    # 429/5xx e demais erros são falhas reais do serviço, não anos ausentes
+    response.raise_for_status()
+    return parse_rows(response.json())
+
+
+def territories(abrangencia: str, codes: Sequence[int]) -> List[Tuple[str, int]]:
+    """Seletores ``n6`` a consultar e quantos municípios cada um cobre."""
+    selector = ABRANGENCIAS[abrangencia]
+    if selector is not None:
+        return [(selector, UF_MUNICIPIOS[abrangencia])]
+    return [(build_code_string(chunk), len(chunk)) for chunk in chunked(list(codes), MAX_CODES_PER_URL)]
+
+
+def write_table(df: pd.DataFrame, output_path: str) -> None:
+    table = pa.Table.from_pandas(df.reindex(columns=SCHEMA.names), schema=SCHEMA, preserve_index=False)
+    tmp = os.path.join(os.path.dirname(output_path), "." + os.path.basename(output_path) + ".tmp")
+    pq.write_table(table, tmp, compression="snappy")
+    os.replace(tmp, output_path)
 
 
 def main() -> int:
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--out", required=True, help="Diretório de saída")
     parser.add_argument("--years", required=True, help="Faixa de anos, ex.: 2001-2025")
+    parser.add_argument(
+        "--abrangencia",
+        choices=sorted(ABRANGENCIAS),
+        default="rmb",
+        help="rmb: lista fixa de códigos; pa: todos os municípios do Pará; brasil: todos do país",
+    )
+    add_cache_arguments(parser)
     args = parser.parse_args()
+    cache = cache_from_args(args)
     os.makedirs(args.out, exist_ok=True)
 
     match = re.match(r"^(\d{4})-(\d{4})$", args.years)
@@ -65,16 +155,33 @@ def main() -> int:
         raise SystemExit("Parâmetro --years inválido. Use ex.: 2001-2025")
     start_year, end_year = map(int, match.groups())
 
-    code_str = build_code_string(RMB_CODES)
+    frames: List[pd.DataFrame] = []
+    lotes = 0
+    for territory, n_municipios in territories(args.abrangencia, RMB_CODES):
+        for first, last in year_batches(start_year, end_year, n_municipios):
+            try:
+                frame = fetch_batch(cache, territory, first, last)
+            except requests.RequestException as exc:
+                raise SystemExit(f"Falha ao consultar o SIDRA ({first}-{last}): {exc}")
+            except CacheMiss as exc:
+                raise SystemExit(f"SIDRA fora do cache no modo offline ({first}-{last}): {exc}")
+            lotes += 1
+            if not frame.empty:
+                frames.append(frame)
+
+    if not frames:
+        raise SystemExit("Nenhum registro de população retornado pelo SIDRA.")
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=["municipio_codigo", "ano"])
+    df = df.sort_values(["municipio_codigo", "ano"]).reset_index(drop=True)
+
+    anos = set(df["ano"].dropna().astype(int))
     for year in range(start_year, end_year + 1):
-        url = SIDRA_BASE.format(codes=code_str, variable=VARIABLE_CODE, period=year)
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
-        output_path = os.path.join(args.out, f"sidra6579_pop_{year}.csv")
-        has_data = dump_csv(response.json(), output_path)
-        if not has_data:
+        if year not in anos:
             print(f"[WARN] Sem registros publicados para {year}.")
-    print("[OK] População baixada.")
+
+    output_path = os.path.join(args.out, OUTPUT_NAME)
+    write_table(df, output_path)
+    print(f"[OK] População baixada: {len(df)} linhas em {lotes} lotes → {output_path}")
     return 0
 
 
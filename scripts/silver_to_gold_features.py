@@ -4,18 +4,44 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ibge_keys import PANDAS_KEY_TYPES, enforce_keys, hive_partitioning, key_field, to_ibge7
 
 DEFAULT_MUNICIPIOS = Path("config/rmb_municipios.csv")
 DEFAULT_OUT_PARQUET = Path("data/gold/gold_features_ano.parquet")
 DEFAULT_OUT_CSV = Path("data/gold/gold_features_ano.csv")
+DEFAULT_OUT_DIR = Path("data/gold/gold_features_ano")
+
+# Incrementar quando a lógica do Gold mudar (invalida todas as partições no modo incremental)
+GOLD_VERSION = 2
+MANIFEST_NAME = "_manifest.json"
+
+# Entradas Silver de cada fonte: "hive" = particionado com ``ano=YYYY``; "file" = arquivo único com coluna ``ano``
+SILVER_INPUTS: Dict[str, Tuple[Path, str]] = {
+    "sih": (Path("data/silver/sih"), "hive"),
+    "sisagua": (Path("data/silver/sisagua"), "hive"),
+    "clima": (Path("data/silver/inmet"), "hive"),
+    "siops": (Path("data/silver/siops/indicadores"), "hive"),
+    "snis": (Path("data/silver/snis/indicadores.parquet"), "file"),
+    "populacao": (Path("data/silver/ibge_populacao/populacao.parquet"), "file"),
+}
 
 QUALITY_PARAMS = (
     "cloro_residual_livre",
@@ -29,100 +55,182 @@ QUALITY_PARAMS = (
 
 # Atribui cada estação meteorológica INMET aos municípios da RMB mais próximos.
 STATION_TO_MUNICIPALITIES = {
-    "A201": ("1501402", "1500800", "1504422", "1501501"),  # Belém + eixo Ananindeua/Marituba/Benevides
-    "A202": ("1502400", "1506500", "1506351"),              # Castanhal + Santa Izabel + Santa Bárbara
-    "A227": ("1501303",),                                      # Soure como proxy para Barcarena
+    "A201": (1501402, 1500800, 1504422, 1501501),  # Belém + eixo Ananindeua/Marituba/Benevides
+    "A202": (1502400, 1506500, 1506351),           # Castanhal + Santa Izabel + Santa Bárbara
+    "A227": (1501303,),                            # Soure como proxy para Barcarena
 }
 
 
 @dataclass(frozen=True)
 class Municipio:
-    code: str
+    code: int
     name: str
 
 
-def load_municipios(path: Path) -> Dict[str, Municipio]:
+def load_municipios(path: Path) -> Dict[int, Municipio]:
+    """Registro de municípios da RMB indexado pelo código IBGE-7 (``int``, contrato de chaves)."""
     df = pd.read_csv(path, dtype={"ibge_code": "string"})
     df = df[df["is_rmb"] == 1]
-    df["ibge_code"] = df["ibge_code"].str.zfill(7)
-
-    mapping: Dict[str, Municipio] = {}
-    for _, row in df.iterrows():
-        code7 = row["ibge_code"]
-        code6 = code7[:-1]
-        muni = Municipio(code=code7, name=row["name"].upper())
-        mapping[code7] = muni
-        mapping[code6] = muni
-    return mapping
-
-
-def normalize_cod_mun(series: Iterable, mapping: Dict[str, Municipio]) -> pd.Series:
-    def _normalize(value: object) -> Optional[str]:
-        if value is None or (isinstance(value, float) and np.isnan(value)):
-            return None
-        text = str(value).strip()
-        if not text:
-            return None
-        digits = "".join(ch for ch in text if ch.isdigit())
-        if not digits:
-            return None
-        if digits in mapping:
-            return mapping[digits].code
-        if len(digits) > 7:
-            digits = digits[:7]
-            if digits in mapping:
-                return mapping[digits].code
-        digits6 = digits[:6]
-        if digits6 in mapping:
-            return mapping[digits6].code
-        padded = digits.zfill(7)
-        return padded if padded in mapping else None
-
-    normalized = pd.Series(series, dtype="object").map(_normalize)
-    return normalized
-
-
-def aggregate_sih(mapping: Dict[str, Municipio]) -> pd.DataFrame:
-    dataset = ds.dataset("data/silver/sih", format="parquet", partitioning="hive")
-    df = dataset.to_table().to_pandas()
-    df["cod_mun"] = normalize_cod_mun(df["cod_mun"], mapping)
-    df = df.dropna(subset=["cod_mun"]).copy()
-    df["ano"] = df["ano"].astype(int)
-
-    agg = (
-        df.groupby(["cod_mun", "ano"], as_index=False)
-        .agg(
-            internacoes_total=("internacoes_total", "sum"),
-            internacoes_hidricas=("internacoes_hidricas", "sum"),
-            dias_perm_total=("dias_perm_total", "sum"),
-            dias_perm_hidricas=("dias_perm_hidricas", "sum"),
-            valor_total=("valor_total", "sum"),
-            valor_hidricas=("valor_hidricas", "sum"),
-        )
+    codes = to_ibge7(df["ibge_code"]).to_pylist()
+    return {code: Municipio(code=code, name=name.upper()) for code, name in zip(codes, df["name"]) if code is not None}
+
+
+def parse_anos(text: Optional[str]) -> Optional[List[int]]:
+    """``2018-2022`` e/ou ``2018,2020`` → lista de anos (``None`` = todos)."""
+    if not text:
+        return None
+    anos: set = set()
+    for part in text.split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = (int(value) for value in part.split("-", 1))
+            anos.update(range(first, last + 1))
+        elif part:
+            anos.add(int(part))
+    return sorted(anos)
+
+
+def restrict_mapping(mapping: Dict[int, Municipio], municipios: Optional[Collection[str]]) -> Dict[int, Municipio]:
+    """Recorta o registro aos códigos informados (6 ou 7 dígitos)."""
+    if not municipios:
+        return mapping
+    wanted = set(to_ibge7(list(municipios)).to_pylist()) & set(mapping)
+    if not wanted:
+        raise SystemExit(f"Nenhum dos municípios informados está no registro: {sorted(municipios)}")
+    return {code: muni for code, muni in mapping.items() if code in wanted}
+
+
+def source_filter(
+    dataset: ds.Dataset,
+    mapping: Dict[int, Municipio],
+    anos: Optional[Sequence[int]] = None,
+    cod_col: Optional[str] = "cod_mun",
+) -> Optional[ds.Expression]:
+    """Filtro empurrado para a leitura: anos (partição ``ano``) e códigos IBGE-7 do registro."""
+    expr: Optional[ds.Expression] = None
+    names = dataset.schema.names
+    if anos is not None and "ano" in names:
+        expr = ds.field("ano").isin(pa.array([int(ano) for ano in anos], dataset.schema.field("ano").type))
+    if cod_col and cod_col in names:
+        field_type = dataset.schema.field(cod_col).type
+        if pa.types.is_integer(field_type):
+            values = pa.array(sorted(mapping), field_type)
+        else:
+            # Silver anterior ao contrato de chaves (texto com 6 ou 7 dígitos)
+            values = pa.array(sorted({text for code in mapping for text in (str(code), str(code)[:6])}), field_type)
+        cod_expr = ds.field(cod_col).isin(values)
+        expr = cod_expr if expr is None else expr & cod_expr
+    return expr
+
+
+def read_source(
+    path: str,
+    columns: Optional[Sequence[str]],
+    mapping: Dict[int, Municipio],
+    anos: Optional[Sequence[int]] = None,
+    partitioning: Optional[ds.Partitioning] = None,
+) -> pa.Table:
+    """Lê uma fonte Silver com filtros empurrados; as chaves já seguem o contrato (``enforce_keys`` é no-op)."""
+    try:
+        dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    except pa.ArrowTypeError:
+        # Silver anterior ao contrato (ano/mes int32/int64 dentro dos arquivos)
+        dataset = ds.dataset(path, format="parquet", partitioning="hive" if partitioning is not None else None)
+    table = dataset.to_table(columns=list(columns) if columns else None, filter=source_filter(dataset, mapping, anos))
+    table = enforce_keys(table)
+    if "cod_mun" in table.column_names and not pa.types.is_integer(dataset.schema.field("cod_mun").type):
+        table = table.filter(pc.is_in(table["cod_mun"], pa.array(sorted(mapping), key_field("cod_mun").type)))
+    return table
+
+
+def nan_to_null(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    column = column.cast(pa.float64())
+    return pc.if_else(pc.is_nan(column), pa.scalar(None, pa.float64()), column)
+
+
+CLIMA_COLUMNS = (
+    "chuva_total_mm",
+    "chuva_media_mm",
+    "temp_media_c",
+    "temp_max_c",
+    "temp_min_c",
+    "umid_rel_media_pct",
+    "vento_vel_media_ms",
+    "dias_calor_extremo",
+)
+
+SNIS_COLUMNS = (
+    "idx_atend_agua_total",
+    "idx_atend_agua_urbano",
+    "idx_coleta_esgoto",
+    "idx_tratamento_esgoto",
+    "idx_hidrometracao",
+    "idx_perdas_distribuicao",
+    "idx_perdas_lineares",
+    "idx_perdas_por_ligacao",
+    "tarifa_media_agua",
+    "tarifa_media_esgoto",
+)
+
+SISAGUA_GLOBAL_COLUMNS = (
+    "sisagua_amostras_total",
+    "sisagua_amostras_conformes",
+    "sisagua_amostras_nao_conformes",
+    "pct_conformes_global",
+)
+
+DERIVED_COLUMNS = (
+    "internacoes_total_10k",
+    "internacoes_hidricas_10k",
+    "pct_internacoes_hidricas",
+    "valor_medio_internacao",
+)
+
+SIH_SUM_COLS = (
+    "internacoes_total",
+    "internacoes_hidricas",
+    "dias_perm_total",
+    "dias_perm_hidricas",
+    "valor_total",
+    "valor_hidricas",
+)
+
+
+def aggregate_sih(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    table = read_source("data/silver/sih", ["cod_mun", "ano", *SIH_SUM_COLS], mapping, anos, hive_partitioning("ano", "mes"))
+    agg = table.group_by(["cod_mun", "ano"]).aggregate([(col, "sum") for col in SIH_SUM_COLS])
+    agg = agg.rename_columns([name.removesuffix("_sum") for name in agg.column_names])
+    df = agg.to_pandas()
+    return df.sort_values(["cod_mun", "ano"]).reset_index(drop=True)[["cod_mun", "ano", *SIH_SUM_COLS]]
+
+
+SISAGUA_SUM_COLS = ("amostras_total", "amostras_conformes", "amostras_nao_conformes")
+
+
+def aggregate_sisagua(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    table = read_source(
+        "data/silver/sisagua",
+        ["cod_mun", "ano", "parametro", *SISAGUA_SUM_COLS, "percentil_95"],
+        mapping,
+        anos,
+        hive_partitioning("ano", "mes"),
     )
-    return agg
-
-
-def aggregate_sisagua(mapping: Dict[str, Municipio]) -> pd.DataFrame:
-    dataset = ds.dataset("data/silver/sisagua", format="parquet", partitioning="hive")
-    df = dataset.to_table().to_pandas()
-    df["cod_mun"] = normalize_cod_mun(df["cod_mun"], mapping)
-    df = df.dropna(subset=["cod_mun"]).copy()
-    df["ano"] = df["ano"].astype(int)
-    df["amostras_total"] = df["amostras_total"].fillna(0.0)
-    df["amostras_conformes"] = df["amostras_conformes"].fillna(0.0)
-    df["amostras_nao_conformes"] = df["amostras_nao_conformes"].fillna(0.0)
-    df["percentil_95"] = df["percentil_95"].astype(float)
-
-    grouped = (
-        df.groupby(["cod_mun", "ano", "parametro"], as_index=False)
-        .agg(
-            amostras_total=("amostras_total", "sum"),
-            amostras_conformes=("amostras_conformes", "sum"),
-            amostras_nao_conformes=("amostras_nao_conformes", "sum"),
-            percentil_95=("percentil_95", "mean"),
-        )
+    for col in SISAGUA_SUM_COLS:
+        table = table.set_column(table.schema.get_field_index(col), col, pc.fill_null(nan_to_null(table[col]), 0.0))
+    table = table.set_column(table.schema.get_field_index("percentil_95"), "percentil_95", nan_to_null(table["percentil_95"]))
+
+    agg = table.group_by(["cod_mun", "ano", "parametro"]).aggregate(
+        [(col, "sum") for col in SISAGUA_SUM_COLS] + [("percentil_95", "mean")]
     )
+    agg = agg.rename_columns([name.removesuffix("_sum").removesuffix("_mean") for name in agg.column_names])
+    grouped = agg.to_pandas()
+    grouped = grouped.sort_values(["cod_mun", "ano", "parametro"]).reset_index(drop=True)
+    return sisagua_wide(grouped)
+
+
+def sisagua_wide(grouped: pd.DataFrame, keys: Sequence[str] = ("cod_mun", "ano")) -> pd.DataFrame:
+    """Do agregado por (chaves, parâmetro) às colunas Gold: totais, % de conformidade e percentis 95."""
+    keys = list(keys)
     grouped["pct_conformes_param"] = np.where(
         grouped["amostras_total"] > 0,
         grouped["amostras_conformes"] / grouped["amostras_total"] * 100,
@@ -131,7 +239,7 @@ def aggregate_sisagua(mapping: Dict[str, Municipio]) -> pd.DataFrame:
 
     # Agregados globais (todas as variáveis)
     global_agg = (
-        grouped.groupby(["cod_mun", "ano"], as_index=False)
+        grouped.groupby(keys, as_index=False)
         .agg(
             sisagua_amostras_total=("amostras_total", "sum"),
             sisagua_amostras_conformes=("amostras_conformes", "sum"),
@@ -148,7 +256,7 @@ def aggregate_sisagua(mapping: Dict[str, Municipio]) -> pd.DataFrame:
     param_pct = (
         grouped[grouped["parametro"].isin(QUALITY_PARAMS)]
         .pivot_table(
-            index=["cod_mun", "ano"],
+            index=keys,
             columns="parametro",
             values="pct_conformes_param",
             aggfunc="first",
@@ -159,7 +267,7 @@ def aggregate_sisagua(mapping: Dict[str, Municipio]) -> pd.DataFrame:
     percentil = (
         grouped[grouped["parametro"].isin({"turbidez", "cloro_residual_livre", "ph", "fluoreto"})]
         .pivot_table(
-            index=["cod_mun", "ano"],
+            index=keys,
             columns="parametro",
             values="percentil_95",
             aggfunc="first",
@@ -168,7 +276,7 @@ def aggregate_sisagua(mapping: Dict[str, Municipio]) -> pd.DataFrame:
     percentil.columns = [f"percentil95_{param}" for param in percentil.columns]
 
     result = (
-        global_agg.set_index(["cod_mun", "ano"])
+        global_agg.set_index(keys)
         .join(param_pct, how="left")
         .join(percentil, how="left")
         .reset_index()
@@ -176,47 +284,73 @@ def aggregate_sisagua(mapping: Dict[str, Municipio]) -> pd.DataFrame:
     return result
 
 
-def aggregate_inmet(mapping: Dict[str, Municipio]) -> pd.DataFrame:
-    dataset = ds.dataset("data/silver/inmet", format="parquet", partitioning="hive")
-    columns = ["estacao", "ano", "timestamp_utc", "chuva_mm", "temp_c", "umid_rel_pct", "vento_vel_ms"]
-    df = dataset.to_table(columns=columns).to_pandas()
-    df["timestamp_utc"] = pd.to_datetime(df["timestamp_utc"], utc=False)
-    df["chuva_mm"] = df["chuva_mm"].fillna(0.0)
-    df["temp_c"] = df["temp_c"].astype(float)
-    df["umid_rel_pct"] = df["umid_rel_pct"].astype(float)
-    df["vento_vel_ms"] = df["vento_vel_ms"].astype(float)
+INMET_PARTITIONING = ds.partitioning(pa.schema([("estacao", pa.string()), key_field("ano")]), flavor="hive")
 
-    df = df.dropna(subset=["estacao", "ano"])
-    df["ano"] = df["ano"].astype(int)
 
-    # Dias com temperatura extrema (>= 32ºC)
-    daily_max = (
-        df.dropna(subset=["temp_c"])
-        .assign(data=df["timestamp_utc"].dt.date)
-        .groupby(["estacao", "ano", "data"], as_index=False)["temp_c"].max()
+def aggregate_inmet(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    dataset = ds.dataset("data/silver/inmet", format="parquet", partitioning=INMET_PARTITIONING)
+    columns = ["estacao", "ano", "timestamp_utc", "chuva_mm", "temp_c", "umid_rel_pct", "vento_vel_ms"]
+    # Só as estações que atendem algum município selecionado (partição ``estacao``)
+    estacoes = sorted(
+        station for station, codes in STATION_TO_MUNICIPALITIES.items() if any(code in mapping for code in codes)
     )
-    heat_days = (
-        daily_max[daily_max["temp_c"] >= 32]
-        .groupby(["estacao", "ano"])
-        .size()
-        .to_dict()
+    expr = ds.field("estacao").isin(estacoes)
+    year_filter = source_filter(dataset, mapping, anos, cod_col=None)
+    if year_filter is not None:
+        expr = expr & year_filter
+    table = dataset.to_table(columns=columns, filter=expr)
+    table = table.filter(pc.and_(pc.is_valid(table["estacao"]), pc.is_valid(table["ano"])))
+
+    chuva = pc.fill_null(nan_to_null(table["chuva_mm"]), 0.0)
+    temp = nan_to_null(table["temp_c"])
+    table = pa.table(
+        {
+            "estacao": table["estacao"].cast(pa.string()),
+            "ano": table["ano"],
+            "data": table["timestamp_utc"].cast(pa.timestamp("s")).cast(pa.date32()),
+            "chuva_mm": chuva,
+            "temp_c": temp,
+            "umid_rel_pct": nan_to_null(table["umid_rel_pct"]),
+            "vento_vel_ms": nan_to_null(table["vento_vel_ms"]),
+        }
     )
 
+    # Dias com temperatura extrema (>= 32ºC)
+    daily_max = table.group_by(["estacao", "ano", "data"]).aggregate([("temp_c", "max")])
+    hot = daily_max.filter(pc.greater_equal(daily_max["temp_c_max"], 32))
+    heat = hot.group_by(["estacao", "ano"]).aggregate([("data", "count")]).to_pandas()
+    heat_days = {(row.estacao, int(row.ano)): int(row.data_count) for row in heat.itertuples(index=False)}
+
     station_year = (
-        df.groupby(["estacao", "ano"], as_index=False)
-        .agg(
-            chuva_total_mm=("chuva_mm", "sum"),
-            chuva_media_mm=("chuva_mm", "mean"),
-            temp_media_c=("temp_c", "mean"),
-            temp_max_c=("temp_c", "max"),
-            temp_min_c=("temp_c", "min"),
-            umid_rel_media_pct=("umid_rel_pct", "mean"),
-            vento_vel_media_ms=("vento_vel_ms", "mean"),
+        table.group_by(["estacao", "ano"])
+        .aggregate(
+            [
+                ("chuva_mm", "sum"),
+                ("chuva_mm", "mean"),
+                ("temp_c", "mean"),
+                ("temp_c", "max"),
+                ("temp_c", "min"),
+                ("umid_rel_pct", "mean"),
+                ("vento_vel_ms", "mean"),
+            ]
         )
+        .to_pandas()
+        .rename(
+            columns={
+                "chuva_mm_sum": "chuva_total_mm",
+                "chuva_mm_mean": "chuva_media_mm",
+                "temp_c_mean": "temp_media_c",
+                "temp_c_max": "temp_max_c",
+                "temp_c_min": "temp_min_c",
+                "umid_rel_pct_mean": "umid_rel_media_pct",
+                "vento_vel_ms_mean": "vento_vel_media_ms",
+            }
+        )
+        .sort_values(["estacao", "ano"])
     )
-    station_year["dias_calor_extremo"] = station_year.apply(
-        lambda row: heat_days.get((row["estacao"], row["ano"]), 0), axis=1
-    )
+    station_year["dias_calor_extremo"] = [
+        heat_days.get((estacao, int(ano)), 0) for estacao, ano in zip(station_year["estacao"], station_year["ano"])
+    ]
 
     records: List[Dict[str, object]] = []
     for row in station_year.itertuples(index=False):
@@ -240,96 +374,139 @@ def aggregate_inmet(mapping: Dict[str, Municipio]) -> pd.DataFrame:
                     "dias_calor_extremo": int(row.dias_calor_extremo),
                 }
             )
-    clima_df = pd.DataFrame.from_records(records)
-    return clima_df
+    clima_df = pd.DataFrame.from_records(records, columns=["cod_mun", "ano", *CLIMA_COLUMNS])
+    return clima_df.astype({"cod_mun": PANDAS_KEY_TYPES["cod_mun"], "ano": PANDAS_KEY_TYPES["ano"]})
 
 
-def aggregate_siops(mapping: Dict[str, Municipio]) -> pd.DataFrame:
-    df = pd.read_parquet("data/silver/siops/indicadores.parquet")
-    df["cod_mun"] = normalize_cod_mun(df["cod_mun"], mapping)
-    df = df.dropna(subset=["cod_mun"]).copy()
-    df["ano"] = df["ano"].astype(int)
-    df = df.drop(columns=["municipio"], errors="ignore")
-    return df
+def aggregate_siops(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    table = read_source("data/silver/siops/indicadores", None, mapping, anos, hive_partitioning("ano"))
+    return table.to_pandas().drop(columns=["municipio"], errors="ignore")
 
 
-def aggregate_snis(mapping: Dict[str, Municipio]) -> pd.DataFrame:
-    df = pd.read_csv("data/gold/snis_rmb_indicadores_v2.csv")
-    df["cod_mun"] = normalize_cod_mun(df["cod_mun"], mapping)
-    df = df.dropna(subset=["cod_mun"]).copy()
-    df["ano"] = df["ano"].astype(int)
-    rename = {
-        "idx_atend_agua_total": "idx_atend_agua_total",
-        "idx_atend_agua_urbano": "idx_atend_agua_urbano",
-        "idx_coleta_esgoto": "idx_coleta_esgoto",
-        "idx_tratamento_esgoto": "idx_tratamento_esgoto",
-        "idx_hidrometracao": "idx_hidrometracao",
-        "idx_perdas_distribuicao": "idx_perdas_distribuicao",
-        "idx_perdas_lineares": "idx_perdas_lineares",
-        "idx_perdas_por_ligacao": "idx_perdas_por_ligacao",
-        "tarifa_media_agua": "tarifa_media_agua",
-        "tarifa_media_esgoto": "tarifa_media_esgoto",
-    }
-    keep_cols = ["cod_mun", "ano"] + [col for col in rename if col in df.columns]
+def aggregate_snis(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    df = read_source("data/silver/snis/indicadores.parquet", None, mapping, anos).to_pandas()
+    keep_cols = ["cod_mun", "ano"] + [col for col in SNIS_COLUMNS if col in df.columns]
     return df[keep_cols]
 
 
-def load_populacao(mapping: Dict[str, Municipio]) -> pd.DataFrame:
-    df = pd.read_parquet("data/silver/ibge_populacao/populacao.parquet")
-    df["cod_mun"] = normalize_cod_mun(df["cod_mun"], mapping)
-    df = df.dropna(subset=["cod_mun"]).copy()
-    df["ano"] = df["ano"].astype(int)
+def load_populacao(mapping: Dict[int, Municipio], anos: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    df = read_source("data/silver/ibge_populacao/populacao.parquet", ["cod_mun", "ano", "populacao"], mapping, anos).to_pandas()
     df["populacao"] = df["populacao"].astype(float)
     return df
 
 
-def build_base_frame(mapping: Dict[str, Municipio], anos: Sequence[int]) -> pd.DataFrame:
-    municipios_unicos = sorted({municipio.code for municipio in mapping.values()})
-    municipios_unicos = [code for code in municipios_unicos if len(code) == 7]
-    index = pd.MultiIndex.from_product([municipios_unicos, anos], names=["cod_mun", "ano"])
-    base = index.to_frame(index=False)
-    base["municipio"] = base["cod_mun"].map(lambda code: mapping[code].name if code in mapping else np.nan)
-    return base
+GRID_KEYS = ["cod_mun", "ano"]
+# Ordem dos blocos de colunas no Gold
+GRID_ORDER = ("populacao", "snis", "sisagua", "clima", "siops", "sih")
+
 
+def build_base_frame(mapping: Dict[int, Municipio], anos: Sequence[int]) -> pd.DataFrame:
+    """Grade completa (município × ano) já na ordem final do Gold."""
+    codes = np.array(sorted(mapping), dtype=PANDAS_KEY_TYPES["cod_mun"])
+    anos_arr = np.array(sorted(anos), dtype=PANDAS_KEY_TYPES["ano"])
+    return pd.DataFrame(
+        {
+            "cod_mun": np.repeat(codes, len(anos_arr)),
+            "municipio": np.repeat([mapping[int(code)].name for code in codes], len(anos_arr)),
+            "ano": np.tile(anos_arr, len(codes)),
+        }
+    )
 
-def merge_all() -> pd.DataFrame:
-    mapping = load_municipios(DEFAULT_MUNICIPIOS)
 
-    sih = aggregate_sih(mapping)
-    sisagua = aggregate_sisagua(mapping)
-    clima = aggregate_inmet(mapping)
-    siops = aggregate_siops(mapping)
-    snis = aggregate_snis(mapping)
-    populacao = load_populacao(mapping)
+def align_to_grid(frame: pd.DataFrame, codes: np.ndarray, anos: np.ndarray, name: str = "") -> pd.DataFrame:
+    """Posiciona as linhas de uma fonte na grade por aritmética de índices (sem junção por hash).
+
+    A linha (município i, ano j) ocupa a posição ``i * len(anos) + j``; células sem
+    dado ficam nulas, como num ``merge(how="left")``.
+    """
+    size = len(codes) * len(anos)
+    values = frame.drop(columns=GRID_KEYS)
+    if frame.empty:
+        return values.reindex(pd.RangeIndex(size))
+    cod = frame["cod_mun"].to_numpy()
+    ano = frame["ano"].to_numpy()
+    mun_pos = np.minimum(np.searchsorted(codes, cod), len(codes) - 1)
+    ano_pos = np.minimum(np.searchsorted(anos, ano), len(anos) - 1)
+    inside = (codes[mun_pos] == cod) & (anos[ano_pos] == ano)
+    positions = mun_pos[inside].astype(np.int64) * len(anos) + ano_pos[inside]
+    filled = np.zeros(size, dtype=bool)
+    filled[positions] = True
+    if filled.sum() != len(positions):
+        raise ValueError(f"Fonte {name or '?'} com mais de uma linha por (cod_mun, ano)")
+
+    columns: Dict[str, np.ndarray] = {}
+    for col in values.columns:
+        source = values[col].to_numpy()[inside]
+        if source.dtype.kind in "biuf":
+            # como no merge(how="left") com lacunas: numéricos saem sempre float com NaN,
+            # para que o dtype não dependa de quais anos entraram no recorte
+            out, source = np.full(size, np.nan), source.astype(float)
+        elif filled.all():
+            out = np.empty(size, dtype=source.dtype)
+        else:
+            out = np.full(size, np.nan, dtype=object)
+        out[positions] = source
+        columns[col] = out
+    return pd.DataFrame(columns, index=pd.RangeIndex(size))
+
+
+# Fontes independentes do Gold (leem datasets Silver disjuntos)
+SOURCE_LOADERS = {
+    "sih": aggregate_sih,
+    "sisagua": aggregate_sisagua,
+    "clima": aggregate_inmet,
+    "siops": aggregate_siops,
+    "snis": aggregate_snis,
+    "populacao": load_populacao,
+}
+DEFAULT_WORKERS = min(len(SOURCE_LOADERS), os.cpu_count() or 1)
+
+
+def load_sources(
+    mapping: Dict[int, Municipio],
+    anos: Optional[Sequence[int]] = None,
+    workers: int = DEFAULT_WORKERS,
+) -> Dict[str, pd.DataFrame]:
+    """Executa as agregações em threads (E/S Parquet e Arrow liberam o GIL) e coleta conforme terminam."""
+    if workers <= 1:
+        return {name: loader(mapping, anos) for name, loader in SOURCE_LOADERS.items()}
+    results: Dict[str, pd.DataFrame] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gold") as pool:
+        futures = {pool.submit(loader, mapping, anos): name for name, loader in SOURCE_LOADERS.items()}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def merge_all(
+    anos: Optional[Sequence[int]] = None,
+    municipios: Optional[Collection[str]] = None,
+    workers: int = DEFAULT_WORKERS,
+) -> pd.DataFrame:
+    mapping = restrict_mapping(load_municipios(DEFAULT_MUNICIPIOS), municipios)
+
+    sources = load_sources(mapping, anos, workers)
 
     anos = sorted({
-        *sih.get("ano", pd.Series(dtype=int)).unique().tolist(),
-        *sisagua.get("ano", pd.Series(dtype=int)).unique().tolist(),
-        *clima.get("ano", pd.Series(dtype=int)).unique().tolist(),
-        *siops.get("ano", pd.Series(dtype=int)).unique().tolist(),
-        *snis.get("ano", pd.Series(dtype=int)).unique().tolist(),
-        *populacao.get("ano", pd.Series(dtype=int)).unique().tolist(),
+        int(ano)
+        for frame in sources.values()
+        for ano in frame.get("ano", pd.Series(dtype=int)).unique().tolist()
+        if pd.notna(ano)
     })
-    anos = [int(a) for a in anos if pd.notna(a)]
-    base = build_base_frame(mapping, sorted(anos))
-
-    data = (
-        base
-        .merge(populacao, on=["cod_mun", "ano"], how="left")
-        .merge(snis, on=["cod_mun", "ano"], how="left")
-        .merge(sisagua, on=["cod_mun", "ano"], how="left")
-        .merge(clima, on=["cod_mun", "ano"], how="left")
-        .merge(siops, on=["cod_mun", "ano"], how="left")
-        .merge(sih, on=["cod_mun", "ano"], how="left")
-        .sort_values(["cod_mun", "ano"])
-    )
+    base = build_base_frame(mapping, anos)
+    codes = base["cod_mun"].unique()
+    anos_arr = np.array(anos, dtype=PANDAS_KEY_TYPES["ano"])
+
+    # Junções alinhadas à grade: cada fonte vira um bloco de colunas na mesma ordem de linhas
+    blocks = [align_to_grid(sources[name], codes, anos_arr, name) for name in GRID_ORDER]
+    data = pd.concat([base, *blocks], axis=1)
+    data = data[order_columns([data])]
 
-    data = data.rename(columns={"municipio": "municipio"})
+    return add_derived_columns(data)
 
-    cols = ["cod_mun", "municipio", "ano"] + [col for col in data.columns if col not in {"cod_mun", "municipio", "ano"}]
-    data = data[cols]
 
-    # Derivados
+def add_derived_columns(data: pd.DataFrame) -> pd.DataFrame:
+    """Taxas por 10 mil habitantes, % de internações hídricas e valor médio (qualquer granularidade)."""
     data["internacoes_total_10k"] = np.where(
         data["populacao"] > 0,
         data["internacoes_total"] / data["populacao"] * 10000,
@@ -350,10 +527,172 @@ def merge_all() -> pd.DataFrame:
         data["valor_total"] / data["internacoes_total"],
         np.nan,
     )
-
     return data
 
 
+def column_rank(column: str) -> Tuple[int, str]:
+    """Posição de uma coluna no layout do Gold (mesma ordem dos merges de ``merge_all``).
+
+    Colunas desconhecidas são os indicadores do SIOPS (vêm do schema Silver); a
+    ordem entre elas é resolvida pela primeira aparição em ``order_columns``.
+    """
+    fixed = [
+        ("cod_mun", "municipio", "ano"),
+        ("populacao",),
+        SNIS_COLUMNS,
+        SISAGUA_GLOBAL_COLUMNS,
+    ]
+    for block, columns in enumerate(fixed):
+        if column in columns:
+            return block, f"{columns.index(column):03d}"
+    if column.startswith("pct_conformes_"):
+        return 4, column
+    if column.startswith("percentil95_"):
+        return 5, column
+    if column in CLIMA_COLUMNS:
+        return 6, f"{CLIMA_COLUMNS.index(column):03d}"
+    if column in SIH_SUM_COLS:
+        return 8, f"{SIH_SUM_COLS.index(column):03d}"
+    if column in DERIVED_COLUMNS:
+        return 9, f"{DERIVED_COLUMNS.index(column):03d}"
+    return 7, ""
+
+
+def order_columns(frames: Sequence[pd.DataFrame]) -> List[str]:
+    """União das colunas de vários recortes do Gold, na ordem de um build completo."""
+    seen: Dict[str, int] = {}
+    for frame in frames:
+        for column in frame.columns:
+            seen.setdefault(column, len(seen))
+    return sorted(seen, key=lambda column: (*column_rank(column), seen[column]))
+
+
+# --- Gold particionado por ano e reconstrução incremental ---
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def silver_year_fingerprints() -> Dict[int, Dict[str, str]]:
+    """Impressão digital, por ano, de cada fonte Silver que alimenta o Gold.
+
+    Fontes particionadas: hash do conteúdo dos arquivos sob ``ano=YYYY`` (reescrever
+    um arquivo idêntico não invalida o ano). Arquivos únicos: hash das linhas do ano.
+    """
+    fingerprints: Dict[int, Dict[str, str]] = defaultdict(dict)
+    for source, (path, kind) in SILVER_INPUTS.items():
+        if not path.exists():
+            continue
+        if kind == "hive":
+            per_year: Dict[int, List[str]] = defaultdict(list)
+            for file in sorted(path.rglob("*.parquet")):
+                match = re.search(r"(?:^|/)ano=(\d+)(?:/|$)", file.relative_to(path).as_posix())
+                if match:
+                    per_year[int(match.group(1))].append(f"{file.relative_to(path).as_posix()}:{_sha256_file(file)}")
+            for ano, entries in per_year.items():
+                fingerprints[ano][source] = hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+        else:
+            df = pq.read_table(path).to_pandas()
+            for ano, part in df.groupby("ano"):
+                part = part.reset_index(drop=True)
+                digest = hashlib.sha256(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+                digest.update(repr(list(part.columns)).encode("utf-8"))
+                fingerprints[int(ano)][source] = digest.hexdigest()
+    return dict(fingerprints)
+
+
+def year_fingerprint(sources: Dict[str, str], config_hash: str) -> str:
+    payload = json.dumps({"versao": GOLD_VERSION, "config": config_hash, "fontes": sources}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def config_fingerprint(municipios_path: Path) -> str:
+    """Registro de municípios e mapeamento estação → município também afetam todos os anos."""
+    payload = _sha256_file(municipios_path) + repr(sorted(STATION_TO_MUNICIPALITIES.items()))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_manifest(out_dir: Path) -> Dict[str, str]:
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    return dict(manifest.get("anos", {}))
+
+
+def write_manifest(out_dir: Path, anos: Dict[str, str]) -> None:
+    path = out_dir / MANIFEST_NAME
+    tmp = path.with_name("." + path.name + ".tmp")
+    tmp.write_text(json.dumps({"versao": GOLD_VERSION, "anos": dict(sorted(anos.items()))}, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def partition_path(out_dir: Path, ano: int) -> Path:
+    return out_dir / f"ano={int(ano)}" / "data.parquet"
+
+
+def write_year_partitions(df: pd.DataFrame, out_dir: Path, anos: Iterable[int]) -> None:
+    for ano in anos:
+        target = partition_path(out_dir, ano)
+        part = df[df["ano"] == ano]
+        if part.empty:
+            shutil.rmtree(target.parent, ignore_errors=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name("." + target.name + ".tmp")
+        part.to_parquet(tmp, index=False, compression="snappy")
+        os.replace(tmp, target)
+
+
+def read_year_partitions(out_dir: Path) -> pd.DataFrame:
+    frames = [pd.read_parquet(path) for path in sorted(out_dir.glob("ano=*/data.parquet"))]
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames, ignore_index=True)
+    data = data[order_columns(frames)]
+    return data.sort_values(["cod_mun", "ano"]).reset_index(drop=True)
+
+
+def build_gold(
+    out_dir: Path,
+    municipios_path: Path,
+    incremental: bool = False,
+    workers: int = DEFAULT_WORKERS,
+) -> Tuple[pd.DataFrame, List[int]]:
+    """Atualiza ``out_dir/ano=YYYY`` e devolve o Gold completo + anos recalculados.
+
+    No modo incremental só os anos cuja impressão digital mudou (ou que surgiram)
+    são recalculados; anos que sumiram das fontes são removidos.
+    """
+    config_hash = config_fingerprint(municipios_path)
+    current = {
+        str(ano): year_fingerprint(sources, config_hash)
+        for ano, sources in silver_year_fingerprints().items()
+    }
+    previous = load_manifest(out_dir) if incremental else {}
+    if incremental:
+        stale = {ano for ano, digest in current.items() if previous.get(ano) != digest}
+        stale |= {ano for ano in current if not partition_path(out_dir, int(ano)).exists()}
+    else:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        stale = set(current)
+
+    for ano in set(previous) - set(current):
+        shutil.rmtree(partition_path(out_dir, int(ano)).parent, ignore_errors=True)
+
+    anos = sorted(int(ano) for ano in stale)
+    if anos:
+        data = merge_all(anos=anos, workers=workers)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_year_partitions(data, out_dir, anos)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    write_manifest(out_dir, current)
+    return read_year_partitions(out_dir), anos
+
+
 def save_outputs(df: pd.DataFrame, parquet_path: Path, csv_path: Path) -> None:
     parquet_path.parent.mkdir(parents=True, exist_ok=True)
     csv_path.parent.mkdir(parents=True, exist_ok=True)
@@ -364,8 +703,32 @@ def save_outputs(df: pd.DataFrame, parquet_path: Path, csv_path: Path) -> None:
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Lista de municípios alvo")
-    parser.add_argument("--out-parquet", type=Path, default=DEFAULT_OUT_PARQUET, help="Arquivo parquet de saída")
-    parser.add_argument("--out-csv", type=Path, default=DEFAULT_OUT_CSV, help="Arquivo CSV de saída")
+    parser.add_argument(
+        "--out-parquet",
+        type=Path,
+        default=None,
+        help=f"Arquivo parquet de saída (padrão: {DEFAULT_OUT_PARQUET}; obrigatório com --anos/--cod-mun)",
+    )
+    parser.add_argument(
+        "--out-csv",
+        type=Path,
+        default=None,
+        help=f"Arquivo CSV de saída (padrão: {DEFAULT_OUT_CSV}; obrigatório com --anos/--cod-mun)",
+    )
+    parser.add_argument("--anos", help="Anos a incluir, ex.: 2018-2022 ou 2019,2021 (padrão: todos)")
+    parser.add_argument("--cod-mun", help="Códigos IBGE separados por vírgula (padrão: todos do registro)")
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_OUT_DIR, help="Gold particionado por ano (com manifesto)")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Recalcula apenas os anos cujas partições Silver mudaram desde o último build",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Threads para agregar as fontes Silver em paralelo (1 = sequencial)",
+    )
     return parser.parse_args()
 
 
@@ -373,7 +736,30 @@ def main() -> None:
     args = parse_args()
     global DEFAULT_MUNICIPIOS
     DEFAULT_MUNICIPIOS = args.municipios
-    df = merge_all()
+    municipios = [code.strip() for code in args.cod_mun.split(",")] if args.cod_mun else None
+    anos = parse_anos(args.anos)
+
+    if anos is not None or municipios is not None:
+        # recorte avulso: não mexe no Gold particionado, no manifesto nem no Gold canônico
+        if args.incremental:
+            raise SystemExit("--incremental não pode ser combinado com --anos/--cod-mun")
+        if args.out_parquet is None or args.out_csv is None:
+            raise SystemExit(
+                "--anos/--cod-mun exigem --out-parquet e --out-csv explícitos "
+                f"(o recorte não pode sobrescrever {DEFAULT_OUT_PARQUET} / {DEFAULT_OUT_CSV})"
+            )
+        if {args.out_parquet.resolve(), args.out_csv.resolve()} & {
+            DEFAULT_OUT_PARQUET.resolve(),
+            DEFAULT_OUT_CSV.resolve(),
+        }:
+            raise SystemExit(f"O recorte deve ir para outro caminho que não {DEFAULT_OUT_PARQUET} / {DEFAULT_OUT_CSV}")
+        df = merge_all(anos, municipios, args.workers)
+    else:
+        df, recalculados = build_gold(args.out_dir, args.municipios, args.incremental, args.workers)
+        print(f"[OK] Partições Gold recalculadas: {recalculados or 'nenhuma'} → {args.out_dir}")
+        args.out_parquet = args.out_parquet or DEFAULT_OUT_PARQUET
+        args.out_csv = args.out_csv or DEFAULT_OUT_CSV
+
     save_outputs(df, args.out_parquet, args.out_csv)
     print(
         f"[OK] Dataset Gold anual gerado com {len(df)} linhas → {args.out_parquet} / {args.out_csv}"
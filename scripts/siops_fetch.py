@@ -4,28 +4,37 @@ from urllib.parse import urljoin
 import unicodedata
 
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from tqdm import tqdm
 
+from http_cache import DAY, HttpCache, add_cache_arguments, cache_from_args, ttl_for_year
+
 BASE = "https://siops-consulta-publica-api.saude.gov.br/"
 API_PREFIX = "v1"
 
+# cache HTTP compartilhado (substituído em __main__ conforme --cache-dir/--offline/--refresh)
+HTTP = HttpCache()
+
 
 def api_path(*segments) -> str:
     parts = [API_PREFIX.strip("/")]
     parts.extend(str(seg).strip("/") for seg in segments)
     return "/".join(parts)
 
-# --- util: chamada segura com backoff ---
-def get_json(path, params=None, sleep=0.5, allow_not_found=False):
+# --- util: chamada segura com backoff (via cache HTTP) ---
+def get_json(path, params=None, sleep=0.5, allow_not_found=False, ttl=DAY):
     url = urljoin(BASE, path)
+    cache_status = (200, 404) if allow_not_found else (200,)
     for i in range(5):
-        r = requests.get(url, params=params, timeout=60)
+        r = HTTP.get(url, params=params, ttl=ttl, timeout=60, cache_status=cache_status)
         if r.status_code == 200:
             try:
                 return r.json()
             except Exception:
-                # Alguns endpoints podem devolver texto; tenta novamente
+                # Alguns endpoints podem devolver texto; descarta do cache e tenta novamente
+                HTTP.invalidate(url, params)
                 time.sleep(sleep); continue
         if allow_not_found and r.status_code == 404:
             return []
@@ -58,7 +67,7 @@ RMB8_NORMALIZED = {normalize_name(name) for name in RMB8}
 
 def fetch_municipios_pa():
     # conforme metadados: endpoint 'v1/ente/municipal/{estado}'
-    js = get_json(api_path("ente", "municipal", "15"))
+    js = get_json(api_path("ente", "municipal", "15"), ttl=30 * DAY)
     df = pd.DataFrame(js)
     # normaliza maiúsculas sem acento para bater com nosso set
     df["no_municipio_norm"] = df["no_municipio"].apply(normalize_name)
@@ -73,7 +82,7 @@ def fetch_indicadores_municipais(cod_mun, ano, periodo, indicadores):
     # endpoint 'v1/indicador/municipal/{municipio}/{ano}/{periodo}'
     rows = []
     path = api_path("indicador", "municipal", cod_mun, ano, periodo)
-    js = get_json(path, allow_not_found=True)
+    js = get_json(path, allow_not_found=True, ttl=ttl_for_year(ano))
     df = pd.DataFrame(js)
     if df.empty:
         return rows
@@ -95,7 +104,7 @@ def fetch_indicadores_municipais(cod_mun, ano, periodo, indicadores):
 def fetch_subfuncao(cod_mun, ano, periodo):
     # endpoint 'v1/despesas-por-subfuncao/{uf}/{municipio}/{ano}/{periodo}' (vide metadados)
     path = api_path("despesas-por-subfuncao", "15", cod_mun, ano, periodo)
-    js = get_json(path, allow_not_found=True)
+    js = get_json(path, allow_not_found=True, ttl=ttl_for_year(ano))
     df = pd.DataFrame(js)
     if df.empty:
         return []
@@ -110,31 +119,131 @@ def fetch_subfuncao(cod_mun, ano, periodo):
             df[c] = None
     return df[keep].to_dict(orient="records")
 
-def main(outdir, ano_ini, ano_fim, anual=True, coletar_subfuncao=True):
-    periodo = 2 if anual else 14  # padrão: anual
-    indicadores = ["1.3","1.6","2.1","2.2","2.3","2.4","2.5","2.6","3.1","3.2"]
+# --- checkpoints: uma unidade (cod_mun, ano, periodo, endpoint) = um arquivo parquet ---
+ENDPOINT_INDICADORES = "indicadores"
+ENDPOINT_SUBFUNCAO = "subfuncao"
+
+VALOR_COLS = [f"valor{i}" for i in range(1, 11)]
+
+STORE_SCHEMAS = {
+    ENDPOINT_INDICADORES: pa.schema([
+        ("cod_mun", pa.string()),
+        ("ano", pa.int32()),
+        ("periodo", pa.int32()),
+        ("numero_indicador", pa.string()),
+        ("ds_indicador", pa.string()),
+        ("numerador", pa.float64()),
+        ("denominador", pa.float64()),
+        ("valor", pa.float64()),
+    ]),
+    ENDPOINT_SUBFUNCAO: pa.schema(
+        [
+            ("cod_mun", pa.string()),
+            ("ano", pa.int32()),
+            ("periodo", pa.int32()),
+            ("quadro", pa.string()),
+            ("grupo", pa.string()),
+            ("ordem", pa.string()),
+            ("descricao", pa.string()),
+        ]
+        + [(c, pa.float64()) for c in VALOR_COLS]
+    ),
+}
+
+
+def checkpoint_path(store_dir, endpoint, cod_mun, ano, periodo):
+    return os.path.join(store_dir, endpoint, f"ano={ano}", f"{cod_mun}_p{periodo}.parquet")
+
+
+def unit_done(store_dir, endpoint, cod_mun, ano, periodo):
+    return os.path.exists(checkpoint_path(store_dir, endpoint, cod_mun, ano, periodo))
+
 
-    rmb = fetch_municipios_pa()
-    print("Municípios RMB via API:")
-    print(rmb.to_string(index=False))
+def rows_to_table(rows, endpoint):
+    schema = STORE_SCHEMAS[endpoint]
+    df = pd.DataFrame(rows, columns=schema.names)
+    for field in schema:
+        if pa.types.is_floating(field.type):
+            df[field.name] = pd.to_numeric(df[field.name], errors="coerce")
+        elif pa.types.is_string(field.type):
+            df[field.name] = df[field.name].map(lambda x: None if pd.isna(x) else str(x))
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False, safe=False)
 
-    ind_rows, sub_rows = [], []
-    anos = list(range(ano_ini, ano_fim+1))
-    for _, m in rmb.iterrows():
-        for ano in tqdm(anos, desc=f"{m['municipio']}"):
-            ind_rows += fetch_indicadores_municipais(m["cod_mun"], ano, periodo, indicadores)
-            if coletar_subfuncao:
-                sub_rows += fetch_subfuncao(m["cod_mun"], ano, periodo)
-            time.sleep(0.25)  # politeness
 
-    ind = pd.DataFrame(ind_rows)
-    sub = pd.DataFrame(sub_rows)
+def write_checkpoint(store_dir, endpoint, cod_mun, ano, periodo, rows):
+    """Grava a unidade de forma atômica; unidades sem dados viram arquivos vazios (marcam conclusão)."""
+    path = checkpoint_path(store_dir, endpoint, cod_mun, ano, periodo)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # prefixo "." mantém arquivos temporários fora da leitura do dataset
+    tmp = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".tmp")
+    pq.write_table(rows_to_table(rows, endpoint), tmp, compression="snappy")
+    os.replace(tmp, path)
 
+
+def read_store(store_dir, endpoint, ano_ini=None, ano_fim=None):
+    """Lê todos os checkpoints de um endpoint como uma única tabela Arrow."""
+    root = os.path.join(store_dir, endpoint)
+    schema = STORE_SCHEMAS[endpoint]
+    if not os.path.isdir(root):
+        return schema.empty_table()
+    dataset = ds.dataset(root, format="parquet", schema=schema)
+    flt = None
+    if ano_ini is not None:
+        flt = ds.field("ano") >= ano_ini
+    if ano_fim is not None:
+        cond = ds.field("ano") <= ano_fim
+        flt = cond if flt is None else flt & cond
+    return dataset.to_table(filter=flt)
+
+
+def compact_store(store_dir, outdir, ano_ini, ano_fim, coletar_subfuncao=True):
+    """Consolida os checkpoints nos arquivos Bronze finais (CSV, mesmo layout de antes)."""
     outdir = outdir.rstrip("/")
     os.makedirs(outdir, exist_ok=True)
-    ind.to_csv(f"{outdir}/siops_indicadores_rmb_{ano_ini}_{ano_fim}.csv", index=False)
+    endpoints = [(ENDPOINT_INDICADORES, "siops_indicadores_rmb")]
     if coletar_subfuncao:
-        sub.to_csv(f"{outdir}/siops_subfuncao_rmb_{ano_ini}_{ano_fim}.csv", index=False)
+        endpoints.append((ENDPOINT_SUBFUNCAO, "siops_subfuncao_rmb"))
+    for endpoint, prefix in endpoints:
+        df = read_store(store_dir, endpoint, ano_ini, ano_fim).to_pandas()
+        df = df.sort_values(["cod_mun", "ano", "periodo"], kind="stable")
+        df.to_csv(f"{outdir}/{prefix}_{ano_ini}_{ano_fim}.csv", index=False)
+
+
+def main(outdir, ano_ini, ano_fim, anual=True, coletar_subfuncao=True, store_dir=None, so_compactar=False):
+    periodo = 2 if anual else 14  # padrão: anual
+    indicadores = ["1.3","1.6","2.1","2.2","2.3","2.4","2.5","2.6","3.1","3.2"]
+    store_dir = store_dir or os.path.join(outdir, "_checkpoints")
+
+    if not so_compactar:
+        rmb = fetch_municipios_pa()
+        print("Municípios RMB via API:")
+        print(rmb.to_string(index=False))
+
+        anos = list(range(ano_ini, ano_fim+1))
+        pulados = 0
+        for _, m in rmb.iterrows():
+            cod_mun = str(m["cod_mun"])
+            for ano in tqdm(anos, desc=f"{m['municipio']}"):
+                requisitou = False
+                if unit_done(store_dir, ENDPOINT_INDICADORES, cod_mun, ano, periodo):
+                    pulados += 1
+                else:
+                    rows = fetch_indicadores_municipais(cod_mun, ano, periodo, indicadores)
+                    write_checkpoint(store_dir, ENDPOINT_INDICADORES, cod_mun, ano, periodo, rows)
+                    requisitou = True
+                if coletar_subfuncao:
+                    if unit_done(store_dir, ENDPOINT_SUBFUNCAO, cod_mun, ano, periodo):
+                        pulados += 1
+                    else:
+                        rows = fetch_subfuncao(cod_mun, ano, periodo)
+                        write_checkpoint(store_dir, ENDPOINT_SUBFUNCAO, cod_mun, ano, periodo, rows)
+                        requisitou = True
+                if requisitou and HTTP.mode != "offline":
+                    time.sleep(0.25)  # politeness
+        if pulados:
+            print(f"Retomada: {pulados} unidades já presentes em {store_dir} foram puladas.")
+
+    compact_store(store_dir, outdir, ano_ini, ano_fim, coletar_subfuncao)
     print("Pronto.")
 
 if __name__ == "__main__":
@@ -144,5 +253,13 @@ if __name__ == "__main__":
     ap.add_argument("--year-end", type=int, default=2025)
     ap.add_argument("--periodo-anual", action="store_true", default=True)
     ap.add_argument("--sem-subfuncao", action="store_true")
+    ap.add_argument("--checkpoints", default=None, help="store de checkpoints (padrão: <out>/_checkpoints)")
+    ap.add_argument("--so-compactar", action="store_true", help="apenas consolida os checkpoints nos CSVs Bronze")
+    add_cache_arguments(ap)
     args = ap.parse_args()
-    main(args.out, args.year_start, args.year_end, anual=args.periodo_anual, coletar_subfuncao=not args.sem_subfuncao)
+    HTTP = cache_from_args(args)
+    main(
+        args.out, args.year_start, args.year_end,
+        anual=args.periodo_anual, coletar_subfuncao=not args.sem_subfuncao,
+        store_dir=args.checkpoints, so_compactar=args.so_compactar,
+    )
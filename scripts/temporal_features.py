@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Features temporais declarativas sobre o painel município × período.
+
+Cada feature é descrita por ``coluna:operação[n]``:
+
+- ``lag1`` / ``lead1``: valor ``n`` períodos antes / depois;
+- ``media3`` / ``soma3``: média / soma móvel de ``n`` períodos (terminando no atual);
+- ``delta1``: diferença em relação a ``n`` períodos antes (ano contra ano no painel anual);
+- ``acum``: soma acumulada desde o primeiro período do município.
+
+O painel é anual (``cod_mun``, ``ano``) ou mensal (``cod_mun``, ``ano``, ``mes``).
+As colunas de origem são espalhadas numa grade completa município × período, na
+mesma ideia de ``align_to_grid`` do Gold. Anos ou meses ausentes viram lacunas
+(``NaN``), e um ``lag1`` nunca pula um ano faltante. Todas as features saem de
+operações numpy sobre a grade inteira, sem laço por município. A mesma lista de
+especificações serve ao treino e ao escore; no escore, o quadro precisa conter
+o histórico exigido pelas defasagens.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+OPERATIONS = ("lag", "lead", "media", "soma", "delta", "acum")
+SPEC_PATTERN = re.compile(r"^(?P<column>\w+):(?P<op>[a-z]+)(?P<n>\d*)$")
+
+
+@dataclass(frozen=True)
+class TemporalFeature:
+    column: str
+    op: str
+    n: int = 1
+    # mínimo de valores presentes na janela de media/soma (padrão: janela cheia)
+    min_periods: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.column}_acum" if self.op == "acum" else f"{self.column}_{self.op}{self.n}"
+
+
+def parse_spec(spec: str | TemporalFeature) -> TemporalFeature:
+    """``"chuva_total_mm:lag1"`` → :class:`TemporalFeature`."""
+    if isinstance(spec, TemporalFeature):
+        feature = spec
+    else:
+        match = SPEC_PATTERN.match(spec.strip())
+        if not match:
+            raise ValueError(f"Especificação inválida: {spec!r} (use coluna:operação[n], ex.: chuva_total_mm:lag1)")
+        n = int(match.group("n")) if match.group("n") else 1
+        feature = TemporalFeature(match.group("column"), match.group("op"), n)
+    if feature.op not in OPERATIONS:
+        raise ValueError(f"Operação desconhecida: {feature.op} (use {', '.join(OPERATIONS)})")
+    if feature.n < 1:
+        raise ValueError(f"n deve ser >= 1: {feature}")
+    return feature
+
+
+def parse_specs(specs: Sequence[str | TemporalFeature]) -> List[TemporalFeature]:
+    return [parse_spec(spec) for spec in specs]
+
+
+def panel_positions(df: pd.DataFrame) -> Tuple[np.ndarray, int, int]:
+    """Posição achatada de cada linha na grade: ``(posição, n_municípios, n_períodos)``.
+
+    O período é o ano ou, com coluna ``mes``, ``ano * 12 + mes - 1``; a grade vai
+    do menor ao maior período do quadro.
+    """
+    mun_idx, codes = pd.factorize(df["cod_mun"], sort=True)
+    if (mun_idx < 0).any():
+        raise ValueError("cod_mun nulo no painel")
+    period = df["ano"].to_numpy(dtype=np.int64)
+    if "mes" in df.columns:
+        period = period * 12 + df["mes"].to_numpy(dtype=np.int64) - 1
+    per_idx = period - period.min() if len(period) else period
+    n_per = int(per_idx.max()) + 1 if len(per_idx) else 0
+
+    flat = mun_idx * n_per + per_idx
+    if len(flat) and np.bincount(flat, minlength=len(codes) * n_per).max() > 1:
+        raise ValueError("Chaves (cod_mun, período) duplicadas no painel")
+    return flat, len(codes), n_per
+
+
+def _shift(matrix: np.ndarray, n: int) -> np.ndarray:
+    """Desloca ao longo dos períodos: ``n > 0`` traz o passado, ``n < 0`` o futuro."""
+    out = np.full_like(matrix, np.nan)
+    if n > 0:
+        out[:, n:] = matrix[:, :-n]
+    else:
+        out[:, :n] = matrix[:, -n:]
+    return out
+
+
+def _rolling(matrix: np.ndarray, window: int, min_periods: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Soma e contagem de valores presentes nas janelas que terminam em cada período."""
+    present = ~np.isnan(matrix)
+    pad = np.zeros((matrix.shape[0], 1))
+    sums = np.concatenate([pad, np.cumsum(np.where(present, matrix, 0.0), axis=1)], axis=1)
+    counts = np.concatenate([pad, np.cumsum(present, axis=1)], axis=1)
+    start = np.maximum(np.arange(matrix.shape[1]) + 1 - window, 0)
+    end = np.arange(1, matrix.shape[1] + 1)
+    total = sums[:, end] - sums[:, start]
+    count = counts[:, end] - counts[:, start]
+    return np.where(count >= min_periods, total, np.nan), count
+
+
+def compute_feature(matrix: np.ndarray, feature: TemporalFeature) -> np.ndarray:
+    if feature.op == "lag":
+        return _shift(matrix, feature.n)
+    if feature.op == "lead":
+        return _shift(matrix, -feature.n)
+    if feature.op == "delta":
+        return matrix - _shift(matrix, feature.n)
+    if feature.op == "acum":
+        return np.where(np.isnan(matrix), np.nan, np.nancumsum(matrix, axis=1))
+    total, count = _rolling(matrix, feature.n, feature.min_periods or feature.n)
+    if feature.op == "soma":
+        return total
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
+
+
+def add_temporal_features(df: pd.DataFrame, specs: Sequence[str | TemporalFeature]) -> pd.DataFrame:
+    """Devolve ``df`` (mesma ordem e índice) com uma coluna por especificação."""
+    features = parse_specs(specs)
+    if not features:
+        return df
+    missing = sorted({feature.column for feature in features} - set(df.columns))
+    if missing:
+        raise KeyError(f"Colunas ausentes do painel: {missing}")
+
+    flat, n_mun, n_per = panel_positions(df)
+    matrices: Dict[str, np.ndarray] = {}
+    for column in dict.fromkeys(feature.column for feature in features):
+        values = np.full(n_mun * n_per, np.nan)
+        values[flat] = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        matrices[column] = values.reshape(n_mun, n_per)
+
+    new_columns = {
+        feature.name: compute_feature(matrices[feature.column], feature).ravel()[flat]
+        for feature in features
+    }
+    out = df.drop(columns=[name for name in new_columns if name in df.columns])
+    return pd.concat([out, pd.DataFrame(new_columns, index=df.index)], axis=1)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entrada", type=Path, default=Path("data/gold/gold_features_ano.parquet"), help="Painel em Parquet")
+    parser.add_argument(
+        "--features",
+        required=True,
+        help="Especificações separadas por vírgula, ex.: chuva_total_mm:lag1,internacoes_hidricas_10k:media3",
+    )
+    parser.add_argument("--out", type=Path, required=True, help="Parquet de saída com as colunas novas")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    specs = [item.strip() for item in args.features.split(",") if item.strip()]
+    try:
+        features = parse_specs(specs)
+        df = add_temporal_features(pd.read_parquet(args.entrada), features)
+    except (KeyError, ValueError) as exc:
+        raise SystemExit(exc.args[0])
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(args.out, index=False)
+    print(f"[OK] {len(features)} features temporais → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""Treino e avaliação dos modelos de taxa de internações hídricas (linha de comando).
+
+Mesma comparação do notebook ``modelagem_IA2A`` (Regressão Linear, Lasso e Random
+Forest com ``SimpleImputer`` + ``StandardScaler``), com estas diferenças:
+
+- o pré-processamento é ajustado uma vez por dobra e reaproveitado por todos os
+  modelos (o resultado é o mesmo de um ``Pipeline`` por modelo);
+- dobras × modelos rodam em paralelo (joblib, um processo por núcleo);
+- além do GroupKFold por município, há a validação temporal "anos futuros"
+  (treina com ``ano < corte`` e testa no ano de corte, para os últimos anos antes
+  do holdout);
+- com ``--busca``, uma etapa de *successive halving* ajusta os hiperparâmetros da
+  Random Forest antes da comparação. O orçamento é o número de árvores ou de
+  dobras, e cada rodada mantém o melhor terço dos candidatos. O modelo ajustado
+  entra como ``RandomForestAjustado`` e todas as tentativas ficam registradas
+  num Parquet. A busca usa as dobras do primeiro esquema de validação, então as
+  métricas desse esquema são otimistas para o modelo ajustado. Por isso, com
+  busca, o melhor modelo é escolhido pelo segundo esquema (ver ``selection_scheme``).
+
+Grava ``modelagem_metricas.csv`` e ``modelagem_previsoes.csv`` no mesmo esquema do
+notebook. As previsões ganham ainda um intervalo por quantis das árvores
+(``taxa_p05``/``taxa_p95``), o limiar Crítico da taxa e ``prob_critico`` (ver
+``forest_intervals.py``). Os arquivos só são regravados quando o conteúdo muda. O
+pipeline final é salvo com joblib para reuso no escore.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import Lasso, LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import GroupKFold, ParameterGrid
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from analysis_features import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_EXPORT_DIR,
+    DEFAULT_GOLD,
+    DEFAULT_MUNICIPIOS,
+    DEFAULT_SNIS_V2,
+    critical_rate_threshold,
+    load_analysis_df,
+    write_extracts,
+)
+from forest_intervals import DEFAULT_QUANTILES, CompactModel, forest_intervals, parse_quantiles
+
+DEFAULT_MODEL_PATH = Path("data/gold/modelos/modelagem_final.joblib")
+DEFAULT_SEARCH_LOG = Path("data/gold/modelos/busca_hiperparametros.parquet")
+
+TARGET = "internacoes_hidricas_10k"
+FEATURE_CANDIDATES = (
+    "idx_atend_agua_total",
+    "idx_tratamento_esgoto",
+    "idx_coleta_esgoto",
+    "pct_conformes_global",
+    "idx_perdas_distribuicao",
+    "deficit_atendimento",
+    "deficit_tratamento",
+    "alerta_qualidade",
+    "perdas_excesso",
+    "chuva_total_mm",
+    "chuva_total_mm_lag1",
+    "temp_media_c",
+    "umid_rel_media_pct",
+    "despesa_saude_pc",
+    "pct_despesa_investimentos_saude",
+    "pct_despesa_medicamentos_saude",
+    "pct_despesa_pessoal_saude",
+    "pct_transferencias_sus_recursos",
+    "pct_transferencias_sobre_despesa",
+    "pct_receita_propria_asps",
+    "populacao",
+)
+PREDICTION_COLS = ("cod_mun", "municipio", "ano", "populacao", "prioridade_categoria")
+
+# Esquemas de validação → rótulo da coluna ``dataset`` em modelagem_metricas.csv
+VALIDATION_SCHEMES = {"grupo": "GroupKFold", "temporal": "LeaveFutureYearsOut"}
+DEFAULT_SPLITS = 4
+DEFAULT_FUTURE_YEARS = 3
+
+# Busca de hiperparâmetros da Random Forest (36 candidatos)
+RF_PARAM_GRID: Dict[str, List[object]] = {
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 2, 4, 8],
+    "max_features": [1.0, 0.5, "sqrt"],
+}
+# Orçamento das rodadas: "arvores" (n_estimators) ou "dobras" (quantas dobras avaliam cada candidato)
+SEARCH_RESOURCES = ("arvores", "dobras")
+DEFAULT_HALVING_FACTOR = 3
+MIN_TREES = 50
+
+Fold = Tuple[str, np.ndarray, np.ndarray]
+# (esquema, dobra, X_treino, y_treino, X_teste, y_teste) já pré-processados
+PreparedFold = Tuple[str, str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def build_models(random_state: int = 42) -> Dict[str, object]:
+    """Modelos comparados. A Random Forest usa um núcleo: o paralelismo fica nas dobras."""
+    return {
+        "LinearRegression": LinearRegression(),
+        "Lasso": Lasso(alpha=0.001, max_iter=10000),
+        "RandomForest": RandomForestRegressor(
+            n_estimators=600, random_state=random_state, min_samples_leaf=2, n_jobs=1
+        ),
+    }
+
+
+def model_features(df: pd.DataFrame, candidates: Sequence[str] = FEATURE_CANDIDATES) -> List[str]:
+    features = [col for col in candidates if col in df.columns]
+    if not features:
+        raise ValueError("Nenhuma feature da lista está disponível no dataset Gold.")
+    return features
+
+
+def build_preprocessor(features: Sequence[str]) -> ColumnTransformer:
+    numeric_transformer = Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="median")),
+            ("scaler", StandardScaler()),
+        ]
+    )
+    return ColumnTransformer(transformers=[("num", numeric_transformer, list(features))], remainder="drop")
+
+
+def build_pipeline(estimator, features: Sequence[str]) -> Pipeline:
+    return Pipeline(steps=[("preprocess", build_preprocessor(features)), ("model", estimator)])
+
+
+def regression_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    return {
+        "mae": mean_absolute_error(y_true, y_pred),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "r2": r2_score(y_true, y_pred) if len(y_true) > 1 else np.nan,
+    }
+
+
+# --- dobras ---
+def group_folds(df: pd.DataFrame, n_splits: int = DEFAULT_SPLITS) -> List[Fold]:
+    """GroupKFold por município (k limitado ao número de municípios)."""
+    n_splits = min(n_splits, df["cod_mun"].nunique())
+    splitter = GroupKFold(n_splits=n_splits)
+    return [
+        (f"grupo_{i}", train_idx, test_idx)
+        for i, (train_idx, test_idx) in enumerate(splitter.split(df, groups=df["cod_mun"]))
+    ]
+
+
+def future_year_folds(df: pd.DataFrame, n_years: int = DEFAULT_FUTURE_YEARS, before: Optional[int] = None) -> List[Fold]:
+    """Janela expansiva: para cada um dos últimos ``n_years`` anos (anteriores a ``before``),
+    treina com os anos anteriores e testa no próprio ano."""
+    anos = df["ano"].to_numpy()
+    candidates = sorted(set(anos.tolist()))
+    if before is not None:
+        candidates = [ano for ano in candidates if ano < before]
+    folds: List[Fold] = []
+    for ano in candidates[1:][-n_years:]:
+        folds.append((f"temporal_{ano}", np.flatnonzero(anos < ano), np.flatnonzero(anos == ano)))
+    return folds
+
+
+def preprocess_fold(X: pd.DataFrame, train_idx: np.ndarray, test_idx: np.ndarray, features: Sequence[str]):
+    """Ajusta imputação + escala no treino da dobra e transforma treino e teste (uma vez por dobra)."""
+    preprocessor = build_preprocessor(features)
+    X_train = preprocessor.fit_transform(X.iloc[train_idx])
+    return X_train, preprocessor.transform(X.iloc[test_idx])
+
+
+def prepare_folds(df: pd.DataFrame, features: Sequence[str], folds: Dict[str, List[Fold]]) -> List[PreparedFold]:
+    X = df[list(features)]
+    y = df[TARGET].to_numpy(dtype=float)
+    prepared: List[PreparedFold] = []
+    for scheme, scheme_folds in folds.items():
+        for fold, train_idx, test_idx in scheme_folds:
+            X_train, X_test = preprocess_fold(X, train_idx, test_idx, features)
+            prepared.append((scheme, fold, X_train, y[train_idx], X_test, y[test_idx]))
+    return prepared
+
+
+def _fit_score(estimator, X_train, y_train, X_test, y_test) -> Dict[str, float]:
+    start = time.perf_counter()
+    model = clone(estimator).fit(X_train, y_train)
+    return {**regression_metrics(y_test, model.predict(X_test)), "segundos": time.perf_counter() - start}
+
+
+def score_models(prepared: Sequence[PreparedFold], models: Dict[str, object], jobs: int = -1) -> pd.DataFrame:
+    """Métricas por esquema × dobra × modelo; todas as combinações rodam num único lote paralelo."""
+    labels = [(scheme, fold, name) for scheme, fold, *_ in prepared for name in models]
+    scores = Parallel(n_jobs=jobs)(
+        delayed(_fit_score)(estimator, X_train, y_train, X_test, y_test)
+        for _, _, X_train, y_train, X_test, y_test in prepared
+        for estimator in models.values()
+    )
+    return pd.DataFrame(
+        [{"esquema": scheme, "dobra": fold, "model": name, **score} for (scheme, fold, name), score in zip(labels, scores)]
+    )
+
+
+def evaluate_models(
+    df: pd.DataFrame,
+    features: Sequence[str],
+    models: Dict[str, object],
+    folds: Dict[str, List[Fold]],
+    jobs: int = -1,
+) -> pd.DataFrame:
+    return score_models(prepare_folds(df, features, folds), models, jobs)
+
+
+# --- busca de hiperparâmetros (successive halving) ---
+def halving_schedule(min_resource: int, max_resource: int, factor: int = DEFAULT_HALVING_FACTOR) -> List[int]:
+    """Recurso de cada rodada, crescendo por ``factor`` até terminar em ``max_resource``."""
+    if min_resource >= max_resource:
+        return [max_resource]
+    n_rungs = int(math.floor(math.log(max_resource / min_resource, factor) + 1e-9)) + 1
+    return [max(min_resource, int(round(max_resource / factor ** (n_rungs - 1 - i)))) for i in range(n_rungs)]
+
+
+def successive_halving(
+    prepared: Sequence[PreparedFold],
+    base_estimator,
+    param_grid: Dict[str, List[object]] = RF_PARAM_GRID,
+    resource: str = "arvores",
+    factor: int = DEFAULT_HALVING_FACTOR,
+    jobs: int = -1,
+) -> Tuple[Dict[str, object], pd.DataFrame]:
+    """Avalia todos os candidatos com pouco recurso e promove o melhor ``1/factor`` (MAE médio) a cada rodada.
+
+    Com ``resource="arvores"`` cada rodada usa todas as dobras e mais árvores (até o
+    ``n_estimators`` do estimador base); com ``"dobras"`` usa o ``n_estimators`` base
+    e mais dobras. Retorna os melhores parâmetros e uma linha por candidato × rodada.
+    """
+    if resource not in SEARCH_RESOURCES:
+        raise ValueError(f"Recurso de busca inválido: {resource} (use {', '.join(SEARCH_RESOURCES)})")
+    candidates = list(ParameterGrid(param_grid))
+    if resource == "arvores":
+        schedule = halving_schedule(MIN_TREES, int(base_estimator.get_params()["n_estimators"]), factor)
+    else:
+        schedule = halving_schedule(1, len(prepared), factor)
+
+    alive = list(range(len(candidates)))
+    rows: List[Dict[str, object]] = []
+    for rung, amount in enumerate(schedule):
+        folds = list(prepared) if resource == "arvores" else list(prepared[:amount])
+        extra = {"n_estimators": amount} if resource == "arvores" else {}
+        tasks = [(idx, fold) for idx in alive for fold in folds]
+        scores = Parallel(n_jobs=jobs)(
+            delayed(_fit_score)(clone(base_estimator).set_params(**candidates[idx], **extra), X_tr, y_tr, X_te, y_te)
+            for idx, (_, _, X_tr, y_tr, X_te, y_te) in tasks
+        )
+        trials = pd.DataFrame([{"candidato": idx, **score} for (idx, _), score in zip(tasks, scores)])
+        summary = trials.groupby("candidato").agg(
+            mae=("mae", "mean"), mae_std=("mae", "std"), rmse=("rmse", "mean"), r2=("r2", "mean"), segundos=("segundos", "sum")
+        )
+        summary = summary.reset_index().sort_values(["mae", "candidato"]).reset_index(drop=True)
+        last = rung == len(schedule) - 1
+        keep = 1 if last else max(1, math.ceil(len(alive) / factor))
+        promoted = set(summary["candidato"].head(keep))
+        for record in summary.to_dict("records"):
+            idx = int(record["candidato"])
+            rows.append(
+                {
+                    "rodada": rung,
+                    "recurso": resource,
+                    "valor_recurso": amount,
+                    "candidato": idx,
+                    "parametros": json.dumps({**candidates[idx], **extra}, sort_keys=True),
+                    "n_dobras": len(folds),
+                    **{key: record[key] for key in ("mae", "mae_std", "rmse", "r2", "segundos")},
+                    "promovido": idx in promoted,
+                }
+            )
+        alive = sorted(promoted)
+
+    best = dict(candidates[alive[0]])
+    if resource == "arvores":
+        best["n_estimators"] = schedule[-1]
+    return best, pd.DataFrame(rows)
+
+
+def search_cost(trials: pd.DataFrame, n_candidates: int, n_folds: int, max_trees: int) -> Tuple[float, float]:
+    """Custo da busca vs. grade completa, em árvores ajustadas (proxy de tempo da Random Forest)."""
+    trees = np.where(trials["recurso"] == "arvores", trials["valor_recurso"], max_trees)
+    spent = float((trees * trials["n_dobras"]).sum())
+    return spent, float(n_candidates * n_folds * max_trees)
+
+
+def append_trials(trials: pd.DataFrame, path: Path) -> None:
+    """Acrescenta as tentativas ao log Parquet (uma ``execucao`` por rodada de busca)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        trials = pd.concat([pd.read_parquet(path), trials], ignore_index=True)
+    tmp = path.with_name("." + path.name + ".tmp")
+    trials.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def summarize_scores(fold_scores: pd.DataFrame) -> pd.DataFrame:
+    """Média das dobras por esquema e modelo (``dataset`` = rótulo do esquema), ordenada por MAE."""
+    summary = (
+        fold_scores.groupby(["esquema", "model"], sort=False)[["mae", "rmse", "r2"]]
+        .mean()
+        .reset_index()
+    )
+    order = {scheme: i for i, scheme in enumerate(fold_scores["esquema"].drop_duplicates())}
+    summary["_ordem"] = summary["esquema"].map(order)
+    summary = summary.sort_values(["_ordem", "mae"]).reset_index(drop=True)
+    summary["dataset"] = summary["esquema"].map(VALIDATION_SCHEMES)
+    return summary[["model", "dataset", "mae", "rmse", "r2"]]
+
+
+def evaluate_holdout(
+    df: pd.DataFrame, features: Sequence[str], name: str, estimator, year: int
+) -> Tuple[Dict[str, object], Pipeline]:
+    train_df = df[df["ano"] < year]
+    test_df = df[df["ano"] == year]
+    if test_df.empty:
+        raise ValueError("Não há dados para o ano de holdout definido.")
+    pipeline = build_pipeline(clone(estimator), features).fit(train_df[list(features)], train_df[TARGET])
+    metrics = regression_metrics(test_df[TARGET].to_numpy(), pipeline.predict(test_df[list(features)]))
+    return {"model": name, "dataset": f"Holdout_{year}", **metrics}, pipeline
+
+
+def prediction_intervals(
+    pipeline: Pipeline,
+    df: pd.DataFrame,
+    features: Sequence[str],
+    thresholds: np.ndarray,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+) -> pd.DataFrame:
+    """Quantis por árvore, limiar Crítico da taxa e ``prob_critico`` de cada linha de ``df``."""
+    X = df[list(features)].to_numpy(dtype=float)
+    intervals = forest_intervals(CompactModel(pipeline, features), X, thresholds, quantiles)
+    intervals.insert(len(intervals.columns) - 1, "taxa_limiar_critico", np.asarray(thresholds, dtype=float))
+    return intervals
+
+
+def build_predictions(
+    df: pd.DataFrame, predicted: np.ndarray, intervals: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """Esquema do notebook; com ``intervals``, acrescenta quantis, limiar Crítico e ``prob_critico``."""
+    out = df[list(PREDICTION_COLS) + [TARGET]].rename(columns={TARGET: "taxa_observada"})
+    out["taxa_prevista"] = predicted
+    out["erro_absoluto"] = (out["taxa_prevista"] - out["taxa_observada"]).abs()
+    out = out.reset_index(drop=True)
+    if intervals is not None:
+        out = pd.concat([out, intervals.reset_index(drop=True)], axis=1)
+    return out
+
+
+def save_model(path: Path, pipeline: Pipeline, model: str, features: Sequence[str], anos: Sequence[int]) -> None:
+    """Pipeline final + metadados (features, alvo, anos de treino) num único arquivo joblib."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    bundle = {
+        "pipeline": pipeline,
+        "model": model,
+        "features": list(features),
+        "target": TARGET,
+        "anos": sorted(int(ano) for ano in anos),
+        "treinado_em": datetime.now(timezone.utc).isoformat(),
+    }
+    tmp = path.with_name("." + path.name + ".tmp")
+    joblib.dump(bundle, tmp)
+    os.replace(tmp, path)
+
+
+def selection_scheme(schemes: Sequence[str], search: Optional[str] = None) -> str:
+    """Esquema que escolhe o melhor modelo: o que a busca de hiperparâmetros não viu, se houver."""
+    return schemes[1] if search and len(schemes) > 1 else schemes[0]
+
+
+def run_training(
+    analysis_df: pd.DataFrame,
+    schemes: Sequence[str] = ("grupo", "temporal"),
+    n_splits: int = DEFAULT_SPLITS,
+    future_years: int = DEFAULT_FUTURE_YEARS,
+    holdout_year: Optional[int] = None,
+    jobs: int = -1,
+    search: Optional[str] = None,
+    factor: int = DEFAULT_HALVING_FACTOR,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Pipeline, str, List[str], Optional[pd.DataFrame]]:
+    """Validação cruzada (com busca opcional) + holdout + ajuste final.
+
+    As dobras são pré-processadas uma vez e servem à busca e à comparação. A busca
+    (``search`` = "arvores" ou "dobras") usa as dobras do primeiro esquema. O melhor
+    modelo (menor MAE) sai de ``selection_scheme``: o primeiro esquema sem busca e
+    o segundo com busca. Com um único esquema e busca, a linha do
+    ``RandomForestAjustado`` nesse esquema tem viés otimista e a seleção o
+    favorece. Retorna ``(métricas, previsões,
+    pipeline final, modelo, features, tentativas da busca ou None)``. As previsões
+    trazem os ``quantiles`` das árvores e ``prob_critico`` (vazios fora da Random Forest).
+    """
+    has_target = analysis_df[TARGET].notna().to_numpy()
+    thresholds = critical_rate_threshold(analysis_df).to_numpy()[has_target]
+    model_df = analysis_df.dropna(subset=[TARGET]).reset_index(drop=True)
+    features = model_features(model_df)
+    models = build_models()
+    holdout_year = int(model_df["ano"].max()) if holdout_year is None else holdout_year
+
+    folds: Dict[str, List[Fold]] = {}
+    for scheme in schemes:
+        if scheme == "grupo":
+            folds[scheme] = group_folds(model_df, n_splits)
+        else:
+            folds[scheme] = future_year_folds(model_df, future_years, before=holdout_year)
+        if not folds[scheme]:
+            raise ValueError(f"Sem dobras para o esquema {scheme} (poucos anos ou municípios)")
+
+    prepared = prepare_folds(model_df, features, folds)
+    trials: Optional[pd.DataFrame] = None
+    if search:
+        primary = [fold for fold in prepared if fold[0] == schemes[0]]
+        params, trials = successive_halving(primary, models["RandomForest"], RF_PARAM_GRID, search, factor, jobs)
+        models["RandomForestAjustado"] = clone(models["RandomForest"]).set_params(**params)
+
+    summary = summarize_scores(score_models(prepared, models, jobs))
+    # as dobras da busca favorecem o modelo ajustado; a escolha usa outro esquema quando há
+    chosen_on = VALIDATION_SCHEMES[selection_scheme(schemes, search)]
+    best = str(summary.loc[summary["dataset"] == chosen_on].iloc[0]["model"])
+
+    holdout_metrics, _ = evaluate_holdout(model_df, features, best, models[best], holdout_year)
+    metrics = pd.concat([summary, pd.DataFrame([holdout_metrics])], ignore_index=True)
+
+    final = build_pipeline(clone(models[best]), features).fit(model_df[features], model_df[TARGET])
+    intervals = prediction_intervals(final, model_df, features, thresholds, quantiles)
+    predictions = build_predictions(model_df, final.predict(model_df[features]), intervals)
+    return metrics, predictions, final, best, features, trials
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD, help="Parquet do Gold anual")
+    parser.add_argument("--snis", type=Path, default=DEFAULT_SNIS_V2, help="SNIS v2 usado para completar indicadores de serviço")
+    parser.add_argument("--municipios", type=Path, default=DEFAULT_MUNICIPIOS, help="Registro de municípios")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Cache do analysis_df (Parquet)")
+    parser.add_argument(
+        "--validacao",
+        default="grupo,temporal",
+        help="Esquemas de validação, em ordem de prioridade para a seleção: grupo (GroupKFold), temporal (anos futuros)",
+    )
+    parser.add_argument("--dobras", type=int, default=DEFAULT_SPLITS, help="k do GroupKFold (padrão: 4)")
+    parser.add_argument("--anos-futuros", type=int, default=DEFAULT_FUTURE_YEARS, help="Anos de corte da validação temporal")
+    parser.add_argument("--holdout", type=int, default=None, help="Ano de holdout (padrão: último ano com alvo)")
+    parser.add_argument("--jobs", type=int, default=-1, help="Processos paralelos (-1 = todos os núcleos)")
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_EXPORT_DIR, help="Diretório dos CSVs do dashboard")
+    parser.add_argument("--modelo", type=Path, default=DEFAULT_MODEL_PATH, help="Arquivo joblib do pipeline final")
+    parser.add_argument("--forcar", action="store_true", help="Regrava os CSVs mesmo sem mudança de conteúdo")
+    parser.add_argument(
+        "--busca",
+        choices=SEARCH_RESOURCES,
+        default=None,
+        help="Busca de hiperparâmetros da Random Forest por successive halving (orçamento: arvores ou dobras)",
+    )
+    parser.add_argument("--fator", type=int, default=DEFAULT_HALVING_FACTOR, help="Fator de corte por rodada da busca")
+    parser.add_argument("--log-busca", type=Path, default=DEFAULT_SEARCH_LOG, help="Parquet com as tentativas da busca")
+    parser.add_argument("--quantis", default=None, help="Quantis do intervalo por árvore (padrão: 0.05,0.95)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    schemes = [item.strip() for item in args.validacao.split(",") if item.strip()]
+    unknown = [scheme for scheme in schemes if scheme not in VALIDATION_SCHEMES]
+    if not schemes or unknown:
+        raise SystemExit(f"Esquema de validação inválido: {unknown or args.validacao} (use {', '.join(VALIDATION_SCHEMES)})")
+
+    analysis_df = load_analysis_df(args.gold, args.snis, args.municipios, cache_dir=args.cache_dir)
+    try:
+        metrics, predictions, final, best, features, trials = run_training(
+            analysis_df,
+            schemes,
+            args.dobras,
+            args.anos_futuros,
+            args.holdout,
+            args.jobs,
+            args.busca,
+            args.fator,
+            parse_quantiles(args.quantis),
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
+    if trials is not None:
+        execucao = datetime.now(timezone.utc).isoformat()
+        append_trials(trials.assign(execucao=execucao), args.log_busca)
+        best_trial = trials[trials["promovido"] & (trials["rodada"] == trials["rodada"].max())].iloc[0]
+        spent, full = search_cost(
+            trials, len(ParameterGrid(RF_PARAM_GRID)), int(trials["n_dobras"].max()), int(build_models()["RandomForest"].n_estimators)
+        )
+        print(f"[OK] Busca: {trials['candidato'].nunique()} candidatos, {trials['rodada'].nunique()} rodadas → {best_trial['parametros']}")
+        print(f"[OK] Custo da busca: {spent / full:.0%} da grade completa (em árvores ajustadas) → {args.log_busca}")
+        if len(schemes) == 1:
+            print(
+                f"[WARN] Busca e seleção no mesmo esquema ({VALIDATION_SCHEMES[schemes[0]]}): "
+                "o MAE de RandomForestAjustado é otimista; use --validacao com dois esquemas"
+            )
+        else:
+            print(f"[OK] Melhor modelo escolhido em {VALIDATION_SCHEMES[selection_scheme(schemes, args.busca)]} (fora das dobras da busca)")
+
+    print(metrics.to_string(index=False))
+    if predictions.filter(regex=r"^taxa_p\d").isna().all().all():
+        print(f"[WARN] {best} não é uma floresta: intervalos e prob_critico ficam vazios")
+    written = write_extracts(
+        {"modelagem_metricas": metrics, "modelagem_previsoes": predictions}, args.out_dir, args.forcar
+    )
+    save_model(args.modelo, final, best, features, predictions["ano"].unique())
+    for name in ("modelagem_metricas", "modelagem_previsoes"):
+        status = "atualizado" if name in written else "sem mudança"
+        print(f"[OK] {name}.csv ({status}) → {args.out_dir / (name + '.csv')}")
+    print(f"[OK] Modelo {best} ({len(features)} features) → {args.modelo}")
+
+
+if __name__ == "__main__":
+    main()